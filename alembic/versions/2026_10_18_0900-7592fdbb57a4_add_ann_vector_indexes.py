@@ -0,0 +1,46 @@
+"""Add ANN vector indexes
+
+Revision ID: 7592fdbb57a4
+Revises: 0b0542d427f5
+Create Date: 2026-10-18 09:00:00.000000+03:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+import pgvector
+
+# revision identifiers, used by Alembic.
+revision: str = '7592fdbb57a4'
+down_revision: Union[str, None] = '0b0542d427f5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # HNSW indexes are built concurrently so existing tables stay writable
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_documents_description_vector_hnsw', 'documents', ['description_vector'],
+            unique=False,
+            postgresql_using='hnsw',
+            postgresql_with={'m': 16, 'ef_construction': 64},
+            postgresql_ops={'description_vector': 'vector_cosine_ops'},
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_document_contents_vector_hnsw', 'document_contents', ['vector'],
+            unique=False,
+            postgresql_using='hnsw',
+            postgresql_with={'m': 16, 'ef_construction': 64},
+            postgresql_ops={'vector': 'vector_cosine_ops'},
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_document_contents_vector_hnsw', table_name='document_contents', postgresql_concurrently=True)
+        op.drop_index('ix_documents_description_vector_hnsw', table_name='documents', postgresql_concurrently=True)
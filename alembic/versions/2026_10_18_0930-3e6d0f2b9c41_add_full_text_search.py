@@ -0,0 +1,51 @@
+"""Add full-text search columns and indexes
+
+Revision ID: 3e6d0f2b9c41
+Revises: 7592fdbb57a4
+Create Date: 2026-10-18 09:30:00.000000+03:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+import pgvector
+
+# revision identifiers, used by Alembic.
+revision: str = '3e6d0f2b9c41'
+down_revision: Union[str, None] = '7592fdbb57a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+DOCUMENT_SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('simple', coalesce(file_name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'B') || "
+    "setweight(jsonb_to_tsvector('simple', coalesce(document_metadata, '{}'::jsonb), '[\"string\", \"numeric\"]'), 'B')"
+)
+CONTENT_SEARCH_VECTOR_SQL = "setweight(to_tsvector('simple', left(raw_content, 500000)), 'C')"
+
+
+def upgrade() -> None:
+    op.add_column('documents', sa.Column('search_vector', postgresql.TSVECTOR(), sa.Computed(DOCUMENT_SEARCH_VECTOR_SQL, persisted=True), nullable=True))
+    op.add_column('document_contents', sa.Column('search_vector', postgresql.TSVECTOR(), sa.Computed(CONTENT_SEARCH_VECTOR_SQL, persisted=True), nullable=True))
+    with op.get_context().autocommit_block():
+        op.create_index('ix_documents_search_vector', 'documents', ['search_vector'], unique=False, postgresql_using='gin', postgresql_concurrently=True)
+        op.create_index('ix_document_contents_search_vector', 'document_contents', ['search_vector'], unique=False, postgresql_using='gin', postgresql_concurrently=True)
+        op.create_index(
+            'ix_documents_document_metadata', 'documents', ['document_metadata'],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_ops={'document_metadata': 'jsonb_path_ops'},
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_documents_document_metadata', table_name='documents', postgresql_concurrently=True)
+        op.drop_index('ix_document_contents_search_vector', table_name='document_contents', postgresql_concurrently=True)
+        op.drop_index('ix_documents_search_vector', table_name='documents', postgresql_concurrently=True)
+    op.drop_column('document_contents', 'search_vector')
+    op.drop_column('documents', 'search_vector')
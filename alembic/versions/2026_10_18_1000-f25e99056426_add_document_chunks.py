@@ -0,0 +1,49 @@
+"""Add document chunks
+
+Revision ID: f25e99056426
+Revises: 3e6d0f2b9c41
+Create Date: 2026-10-18 10:00:00.000000+03:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+import pgvector
+from pgvector.sqlalchemy import Vector
+
+# revision identifiers, used by Alembic.
+revision: str = 'f25e99056426'
+down_revision: Union[str, None] = '3e6d0f2b9c41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('document_chunks',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('document_id', sa.UUID(), nullable=False),
+    sa.Column('ordinal', sa.Integer(), nullable=False),
+    sa.Column('text', sa.Text(), nullable=False),
+    sa.Column('token_count', sa.Integer(), nullable=False),
+    sa.Column('page_start', sa.Integer(), nullable=False),
+    sa.Column('page_end', sa.Integer(), nullable=False),
+    sa.Column('vector', Vector(1536), nullable=True),
+    sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['document_id'], ['documents.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('document_id', 'ordinal', name='uq_document_chunks_document_id_ordinal')
+    )
+    op.create_index(
+        'ix_document_chunks_vector_hnsw', 'document_chunks', ['vector'],
+        unique=False,
+        postgresql_using='hnsw',
+        postgresql_with={'m': 16, 'ef_construction': 64},
+        postgresql_ops={'vector': 'vector_cosine_ops'},
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_document_chunks_vector_hnsw', table_name='document_chunks', postgresql_using='hnsw')
+    op.drop_table('document_chunks')
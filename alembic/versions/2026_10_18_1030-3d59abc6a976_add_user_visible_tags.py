@@ -0,0 +1,123 @@
+"""Add user visible tags maintained by triggers
+
+Revision ID: 3d59abc6a976
+Revises: f25e99056426
+Create Date: 2026-10-18 10:30:00.000000+03:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3d59abc6a976'
+down_revision: Union[str, None] = 'f25e99056426'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# A user belongs to exactly one group, so the tags a user sees are exactly the tags of that group.
+# Statement-level triggers with transition tables keep bulk user imports and tag reassignments to
+# one set-based statement each; group changes of a single user use a row-level trigger because
+# transition tables are not allowed together with an UPDATE OF column list.
+TRIGGERS_SQL = """
+CREATE FUNCTION user_visible_tags_users_inserted() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO user_visible_tags (user_id, tag_id)
+    SELECT u.id, ugt.tag_id
+    FROM new_users u
+    JOIN user_group_tags ugt ON ugt.user_group_id = u.user_group_id
+    ON CONFLICT DO NOTHING;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER user_visible_tags_users_insert
+AFTER INSERT ON users
+REFERENCING NEW TABLE AS new_users
+FOR EACH STATEMENT EXECUTE FUNCTION user_visible_tags_users_inserted();
+
+CREATE FUNCTION user_visible_tags_user_group_changed() RETURNS trigger AS $$
+BEGIN
+    DELETE FROM user_visible_tags WHERE user_id = NEW.id;
+    INSERT INTO user_visible_tags (user_id, tag_id)
+    SELECT NEW.id, ugt.tag_id
+    FROM user_group_tags ugt
+    WHERE ugt.user_group_id = NEW.user_group_id
+    ON CONFLICT DO NOTHING;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER user_visible_tags_users_update
+AFTER UPDATE OF user_group_id ON users
+FOR EACH ROW WHEN (OLD.user_group_id IS DISTINCT FROM NEW.user_group_id)
+EXECUTE FUNCTION user_visible_tags_user_group_changed();
+
+CREATE FUNCTION user_visible_tags_group_tags_inserted() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO user_visible_tags (user_id, tag_id)
+    SELECT u.id, t.tag_id
+    FROM new_group_tags t
+    JOIN users u ON u.user_group_id = t.user_group_id
+    ON CONFLICT DO NOTHING;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER user_visible_tags_group_tags_insert
+AFTER INSERT ON user_group_tags
+REFERENCING NEW TABLE AS new_group_tags
+FOR EACH STATEMENT EXECUTE FUNCTION user_visible_tags_group_tags_inserted();
+
+CREATE FUNCTION user_visible_tags_group_tags_deleted() RETURNS trigger AS $$
+BEGIN
+    DELETE FROM user_visible_tags uvt
+    USING old_group_tags t, users u
+    WHERE u.user_group_id = t.user_group_id
+      AND uvt.user_id = u.id
+      AND uvt.tag_id = t.tag_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER user_visible_tags_group_tags_delete
+AFTER DELETE ON user_group_tags
+REFERENCING OLD TABLE AS old_group_tags
+FOR EACH STATEMENT EXECUTE FUNCTION user_visible_tags_group_tags_deleted();
+"""
+
+DROP_TRIGGERS_SQL = """
+DROP TRIGGER IF EXISTS user_visible_tags_group_tags_delete ON user_group_tags;
+DROP TRIGGER IF EXISTS user_visible_tags_group_tags_insert ON user_group_tags;
+DROP TRIGGER IF EXISTS user_visible_tags_users_update ON users;
+DROP TRIGGER IF EXISTS user_visible_tags_users_insert ON users;
+DROP FUNCTION IF EXISTS user_visible_tags_group_tags_deleted();
+DROP FUNCTION IF EXISTS user_visible_tags_group_tags_inserted();
+DROP FUNCTION IF EXISTS user_visible_tags_user_group_changed();
+DROP FUNCTION IF EXISTS user_visible_tags_users_inserted();
+"""
+
+
+def upgrade() -> None:
+    op.create_table('user_visible_tags',
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('tag_id', sa.UUID(), nullable=False),
+    sa.ForeignKeyConstraint(['tag_id'], ['tags.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'tag_id')
+    )
+    op.create_index('ix_document_tags_tag_id_document_id', 'document_tags', ['tag_id', 'document_id'], unique=False)
+    op.execute(TRIGGERS_SQL)
+    op.execute(
+        "INSERT INTO user_visible_tags (user_id, tag_id) "
+        "SELECT u.id, ugt.tag_id FROM users u JOIN user_group_tags ugt ON ugt.user_group_id = u.user_group_id "
+        "ON CONFLICT DO NOTHING"
+    )
+
+
+def downgrade() -> None:
+    op.execute(DROP_TRIGGERS_SQL)
+    op.drop_index('ix_document_tags_tag_id_document_id', table_name='document_tags')
+    op.drop_table('user_visible_tags')
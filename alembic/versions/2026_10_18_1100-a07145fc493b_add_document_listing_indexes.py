@@ -0,0 +1,31 @@
+"""Add composite indexes for keyset-paginated document listing
+
+Revision ID: a07145fc493b
+Revises: 3d59abc6a976
+Create Date: 2026-10-18 11:00:00.000000+03:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a07145fc493b'
+down_revision: Union[str, None] = '3d59abc6a976'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Built concurrently so large documents tables stay writable during the migration
+    with op.get_context().autocommit_block():
+        op.create_index('ix_documents_created_at_id', 'documents', ['created_at', 'id'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_documents_file_name_id', 'documents', ['file_name', 'id'], unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_documents_file_name_id', table_name='documents', postgresql_concurrently=True)
+        op.drop_index('ix_documents_created_at_id', table_name='documents', postgresql_concurrently=True)
@@ -0,0 +1,42 @@
+"""Add document notifications and end date index
+
+Revision ID: c58040c85a71
+Revises: a07145fc493b
+Create Date: 2026-10-18 11:30:00.000000+03:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c58040c85a71'
+down_revision: Union[str, None] = 'a07145fc493b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('document_notifications',
+    sa.Column('document_id', sa.UUID(), nullable=False),
+    sa.Column('tag_id', sa.UUID(), nullable=False),
+    sa.Column('last_notified_at', sa.TIMESTAMP(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['document_id'], ['documents.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['tag_id'], ['tags.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('document_id', 'tag_id')
+    )
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_documents_end_date', 'documents', ['end_date'],
+            unique=False,
+            postgresql_where=sa.text('end_date IS NOT NULL'),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_documents_end_date', table_name='documents', postgresql_concurrently=True)
+    op.drop_table('document_notifications')
@@ -0,0 +1,42 @@
+"""Add MinHash signatures and LSH bands for near-duplicate detection
+
+Revision ID: 5b8e31d0f7a2
+Revises: c58040c85a71
+Create Date: 2026-10-18 12:00:00.000000+03:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b8e31d0f7a2'
+down_revision: Union[str, None] = 'c58040c85a71'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('document_signatures',
+    sa.Column('document_id', sa.UUID(), nullable=False),
+    sa.Column('signature', postgresql.ARRAY(sa.Integer()), nullable=False),
+    sa.ForeignKeyConstraint(['document_id'], ['documents.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('document_id')
+    )
+    op.create_table('document_lsh_bands',
+    sa.Column('band', sa.SmallInteger(), nullable=False),
+    sa.Column('bucket', sa.BigInteger(), nullable=False),
+    sa.Column('document_id', sa.UUID(), nullable=False),
+    sa.ForeignKeyConstraint(['document_id'], ['documents.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('band', 'bucket', 'document_id')
+    )
+    op.create_index('ix_document_lsh_bands_document_id', 'document_lsh_bands', ['document_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_document_lsh_bands_document_id', table_name='document_lsh_bands')
+    op.drop_table('document_lsh_bands')
+    op.drop_table('document_signatures')
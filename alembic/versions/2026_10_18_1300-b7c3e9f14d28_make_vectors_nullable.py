@@ -0,0 +1,31 @@
+"""Make description and content vectors nullable
+
+Documents are stored before they are embedded; the embedding backfill fills the
+vectors later and leaves those of blank texts NULL.
+
+Revision ID: b7c3e9f14d28
+Revises: 9e4d7c2a1b63
+Create Date: 2026-10-18 13:00:00.000000+03:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+from pgvector.sqlalchemy import Vector
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7c3e9f14d28'
+down_revision: Union[str, None] = '9e4d7c2a1b63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.alter_column('documents', 'description_vector', existing_type=Vector(1536), nullable=True)
+    op.alter_column('document_contents', 'vector', existing_type=Vector(1536), nullable=True)
+
+
+def downgrade() -> None:
+    op.alter_column('document_contents', 'vector', existing_type=Vector(1536), nullable=False)
+    op.alter_column('documents', 'description_vector', existing_type=Vector(1536), nullable=False)
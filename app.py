@@ -1,6 +1,10 @@
 import streamlit as st
 import config.config as cfg
 from services.auth_service import handle_authentication
+from utils.logger import get_logger
+from utils.query_counter import count_queries
+
+logger = get_logger(__name__)
 
 cfg.config_page()
 
@@ -26,4 +30,8 @@ pages = {
 }
 
 pg = st.navigation(pages)
-pg.run()
\ No newline at end of file
+with count_queries() as counter:
+    pg.run()
+logger.debug("Rendered '%s' with %s queries.", pg.title, counter.count)
+if cfg.QUERY_BUDGET_PER_RENDER and counter.count > cfg.QUERY_BUDGET_PER_RENDER:
+    logger.warning("Rendering '%s' took %s queries, over the budget of %s.", pg.title, counter.count, cfg.QUERY_BUDGET_PER_RENDER)
\ No newline at end of file
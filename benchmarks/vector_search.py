@@ -0,0 +1,142 @@
+"""
+Recall/latency benchmark for pgvector ANN search against exact search.
+
+Builds a synthetic corpus of random unit vectors in a scratch table, indexes it
+with HNSW or IVFFlat, then compares the ANN top-k with the exact top-k for a set
+of random queries at several ef_search / probes settings.
+
+Usage:
+    python -m benchmarks.vector_search --rows 1000000 --index hnsw --ef-search 20 40 80 160
+    python -m benchmarks.vector_search --index ivfflat --probes 1 10 40 --keep
+
+The scratch table is dropped at the end unless --keep is given, in which case a
+later run with --reuse skips the (slow) corpus generation and index build.
+"""
+
+import argparse
+import statistics
+import time
+from typing import List, Optional, Tuple
+import numpy as np
+from sqlalchemy import text
+from database.models import Document
+from database.session import get_db
+from services.search_service import SearchService
+
+TABLE = "bench_vectors"
+INSERT_BATCH = 10000
+
+
+def _vector_literal(vector: np.ndarray) -> str:
+    return "[" + ",".join(f"{value:.6f}" for value in vector) + "]"
+
+
+def build_corpus(rows: int, dimensions: int) -> None:
+    with get_db() as db:
+        db.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+        db.execute(text(f"CREATE TABLE {TABLE} (id bigint PRIMARY KEY, embedding vector({dimensions}) NOT NULL)"))
+        db.commit()
+        for start in range(1, rows + 1, INSERT_BATCH):
+            end = min(start + INSERT_BATCH - 1, rows)
+            # The reference to g keeps the array subquery correlated, so every row gets its own vector
+            db.execute(
+                text(
+                    f"INSERT INTO {TABLE} (id, embedding) "
+                    f"SELECT g, l2_normalize(ARRAY(SELECT random() - 0.5 + g * 0 FROM generate_series(1, :dimensions))::vector) "
+                    f"FROM generate_series(:start, :end) AS g"
+                ),
+                {"dimensions": dimensions, "start": start, "end": end},
+            )
+            db.commit()
+            print(f"\rgenerated {end}/{rows} vectors", end="", flush=True)
+        print()
+
+
+def build_index(index: str, m: int, ef_construction: int, lists: int) -> float:
+    started = time.monotonic()
+    with get_db() as db:
+        db.execute(text(f"DROP INDEX IF EXISTS {TABLE}_ann"))
+        if index == "hnsw":
+            db.execute(text(f"CREATE INDEX {TABLE}_ann ON {TABLE} USING hnsw (embedding vector_cosine_ops) WITH (m = {m}, ef_construction = {ef_construction})"))
+        else:
+            db.execute(text(f"CREATE INDEX {TABLE}_ann ON {TABLE} USING ivfflat (embedding vector_cosine_ops) WITH (lists = {lists})"))
+        db.execute(text(f"ANALYZE {TABLE}"))
+        db.commit()
+    return time.monotonic() - started
+
+
+def top_k(vector: np.ndarray, k: int, ef_search: Optional[int] = None, probes: Optional[int] = None, exact: bool = False) -> Tuple[List[int], float]:
+    with get_db() as db:
+        SearchService.apply_search_settings(db, ef_search, probes, exact)
+        started = time.perf_counter()
+        rows = db.execute(
+            text(f"SELECT id FROM {TABLE} ORDER BY embedding <=> CAST(:vector AS vector) LIMIT :k"),
+            {"vector": _vector_literal(vector), "k": k},
+        ).all()
+        elapsed = time.perf_counter() - started
+        db.rollback()
+    return [row.id for row in rows], elapsed
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark pgvector ANN recall and latency against exact search.")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--dimensions", type=int, default=Document.description_vector.type.dim)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--index", choices=("hnsw", "ivfflat"), default="hnsw")
+    parser.add_argument("--m", type=int, default=16)
+    parser.add_argument("--ef-construction", type=int, default=64)
+    parser.add_argument("--lists", type=int, default=1000)
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[20, 40, 80, 160])
+    parser.add_argument("--probes", type=int, nargs="+", default=[1, 10, 40])
+    parser.add_argument("--reuse", action="store_true", help="Reuse an existing corpus and index.")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch table afterwards.")
+    args = parser.parse_args()
+
+    if not args.reuse:
+        build_corpus(args.rows, args.dimensions)
+        print(f"{args.index} index built in {build_index(args.index, args.m, args.ef_construction, args.lists):.1f}s")
+
+    rng = np.random.default_rng(42)
+    queries = rng.random((args.queries, args.dimensions)) - 0.5
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    exact_results = []
+    exact_latencies = []
+    for vector in queries:
+        ids, elapsed = top_k(vector, args.k, exact=True)
+        exact_results.append(set(ids))
+        exact_latencies.append(elapsed)
+    print(f"exact: p50 {statistics.median(exact_latencies) * 1000:.1f} ms, p95 {percentile(exact_latencies, 0.95) * 1000:.1f} ms")
+
+    settings = args.ef_search if args.index == "hnsw" else args.probes
+    for setting in settings:
+        recalls = []
+        latencies = []
+        for vector, expected in zip(queries, exact_results):
+            if args.index == "hnsw":
+                ids, elapsed = top_k(vector, args.k, ef_search=setting)
+            else:
+                ids, elapsed = top_k(vector, args.k, probes=setting)
+            recalls.append(len(expected.intersection(ids)) / args.k)
+            latencies.append(elapsed)
+        knob = "ef_search" if args.index == "hnsw" else "probes"
+        print(
+            f"{knob}={setting}: recall@{args.k} {statistics.mean(recalls):.3f}, "
+            f"p50 {statistics.median(latencies) * 1000:.1f} ms, p95 {percentile(latencies, 0.95) * 1000:.1f} ms"
+        )
+
+    if not args.keep:
+        with get_db() as db:
+            db.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+            db.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -16,18 +16,18 @@ def create_db_if_not_exists():
         engine = create_engine(db_uri)
         # Attempt to connect to the database
         with engine.connect() as conn:
-            logger.info(f'Database {database} already exists.')
+            logger.info("Database %s already exists.", database)
     except exc.OperationalError:
-        logger.info(f'Database {database} does not exist. Creating now.')
+        logger.info("Database %s does not exist. Creating now.", database)
         engine = create_engine(db_postgres)
         try:
             # Attempt to connect to the database
             with engine.connect() as conn:
                 conn.execute(text("commit"))
                 conn.execute(text(f'CREATE DATABASE {database};'))
-                logger.info(f'Database {database} created successfully.')
+                logger.info("Database %s created successfully.", database)
         except exc.SQLAlchemyError as e:
-            logger.error(f'Error creating database {database}: {e}')
+            logger.error("Error creating database %s: %s", database, e)
 
 def run_migrations():
     # Point to the alembic.ini file
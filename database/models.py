@@ -1,25 +1,87 @@
 import uuid
+from functools import lru_cache
 from typing import Optional, List
 from datetime import datetime
-from sqlalchemy import Column, String, ForeignKey, Table, Text, TIMESTAMP, func
-from sqlalchemy.dialects.postgresql import UUID, JSONB
-from sqlalchemy.orm import relationship, Mapped, mapped_column
+from sqlalchemy import BigInteger, Boolean, Column, Computed, Integer, SmallInteger, String, ForeignKey, Index, Table, Text, TIMESTAMP, UniqueConstraint, func, text
+from sqlalchemy.dialects.postgresql import ARRAY, UUID, JSONB, TSVECTOR
+from sqlalchemy.orm import relationship, Mapped, mapped_column, object_session
+from sqlalchemy import exists
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import NullPool
 from pgvector.sqlalchemy import Vector
 import config.config as cfg
 
 # SQLAlchemy Base class for model inheritance
 Base = declarative_base()
 
-# Create a database engine using the DATABASE_URL from config.py
-engine = create_engine(cfg.DATABASE_URL, echo=True, pool_pre_ping=True, pool_recycle=3600, future=True, connect_args={"connect_timeout": 10})
+# Generated full-text search vectors. The 'simple' configuration keeps identifiers such as
+# invoice and contract numbers intact instead of stemming them.
+DOCUMENT_SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('simple', coalesce(file_name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'B') || "
+    "setweight(jsonb_to_tsvector('simple', coalesce(document_metadata, '{}'::jsonb), '[\"string\", \"numeric\"]'), 'B')"
+)
+# tsvector values are limited to 1MB, so very long contents are only indexed up to this prefix
+CONTENT_SEARCH_VECTOR_SQL = "setweight(to_tsvector('simple', left(raw_content, 500000)), 'C')"
+
+def create_db_engine(url: Optional[str] = None, **overrides) -> Engine:
+    """
+    Creates a database engine configured from config.py.
+
+    In PgBouncer mode the engine keeps no connections of its own (NullPool) and, with the
+    psycopg 3 driver, never prepares statements server-side, since consecutive transactions
+    may land on different server connections. psycopg2 never uses server-side prepared
+    statements, so it needs no extra setting.
+
+    :param url: The database URL; defaults to cfg.DATABASE_URL.
+    :param overrides: Keyword arguments passed to create_engine, overriding the configured ones.
+    :return: A new Engine. No connection is opened until it is first used.
+    """
+    url = make_url(url or cfg.DATABASE_URL)
+    options = {
+        "echo": cfg.DB_ECHO,
+        "future": True,
+        "pool_pre_ping": cfg.DB_POOL_PRE_PING,
+        "connect_args": {"connect_timeout": cfg.DB_CONNECT_TIMEOUT},
+    }
+    if cfg.DB_PGBOUNCER_MODE:
+        options["poolclass"] = NullPool
+        if url.get_driver_name() == "psycopg":
+            options["connect_args"]["prepare_threshold"] = None
+    else:
+        options.update(
+            pool_size=cfg.DB_POOL_SIZE,
+            max_overflow=cfg.DB_MAX_OVERFLOW,
+            pool_timeout=cfg.DB_POOL_TIMEOUT,
+            pool_recycle=cfg.DB_POOL_RECYCLE,
+        )
+    options.update(overrides)
+    return create_engine(url, **options)
+
+
+@lru_cache(maxsize=None)
+def get_engine() -> Engine:
+    """
+    Returns the process-wide engine, creating it on first use so importing the models stays cheap.
+    """
+    return create_db_engine()
+
+
+def __getattr__(name: str):
+    # Keeps `from database.models import engine` working without creating the engine at import time
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Many-to-Many association table between documents and tags
 document_tags = Table(
     'document_tags', Base.metadata,
     Column('document_id', UUID(as_uuid=True), ForeignKey('documents.id', ondelete='CASCADE'), primary_key=True),
-    Column('tag_id', UUID(as_uuid=True), ForeignKey('tags.id', ondelete='CASCADE'), primary_key=True)
+    Column('tag_id', UUID(as_uuid=True), ForeignKey('tags.id', ondelete='CASCADE'), primary_key=True),
+    # The primary key serves lookups by document; this one serves lookups by tag
+    Index('ix_document_tags_tag_id_document_id', 'tag_id', 'document_id'),
 )
 
 # Many-to-Many association table between user groups and tags
@@ -29,6 +91,14 @@ user_group_tags = Table(
     Column('tag_id', UUID(as_uuid=True), ForeignKey('tags.id', ondelete='CASCADE'), primary_key=True)
 )
 
+# Tags each user may see, derived from users.user_group_id and user_group_tags. Maintained by
+# database triggers (see the add_user_visible_tags migration); never written by the application.
+user_visible_tags = Table(
+    'user_visible_tags', Base.metadata,
+    Column('user_id', UUID(as_uuid=True), ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+    Column('tag_id', UUID(as_uuid=True), ForeignKey('tags.id', ondelete='CASCADE'), primary_key=True)
+)
+
 class User(Base):
     """
     Model representing a user.
@@ -92,7 +162,15 @@ class UserGroup(Base):
 
     def can_be_deleted(self) -> bool:
         """Check if the user group can be deleted (i.e., no users are associated with it)."""
-        return len(self.users) == 0
+        # An EXISTS query instead of loading every user of the group
+        query = exists().where(User.user_group_id == self.id).select()
+        session = object_session(self)
+        if session is not None:
+            return not session.execute(query).scalar()
+        # Detached, as the services return groups; imported here as database.session imports this module
+        from database.session import get_db
+        with get_db() as db:
+            return not db.execute(query).scalar()
 
     def __repr__(self) -> str:
         return f"<UserGroup(id={self.id}, group_name={self.group_name})>"
@@ -108,21 +186,44 @@ class Document(Base):
         - end_date: End date of the document.
         - description: Description of the document.
         - description_vector: Vector representation of the document description.
-        - file_path: Path of the file uploaded.
+        - file_path: Storage key of the file uploaded (see services.storage_service).
         - document_metadata: Additional document_metadata in JSONB format (e.g., date, author).
+        - search_vector: Generated full-text search vector over file name, description and metadata.
         - tags: Many-to-many relationship with tags.
     """
     __tablename__ = 'documents'
+    __table_args__ = (
+        # Approximate nearest neighbour index for cosine search over descriptions
+        Index(
+            'ix_documents_description_vector_hnsw', 'description_vector',
+            postgresql_using='hnsw',
+            postgresql_with={'m': 16, 'ef_construction': 64},
+            postgresql_ops={'description_vector': 'vector_cosine_ops'},
+        ),
+        Index('ix_documents_search_vector', 'search_vector', postgresql_using='gin'),
+        Index(
+            'ix_documents_document_metadata', 'document_metadata',
+            postgresql_using='gin',
+            postgresql_ops={'document_metadata': 'jsonb_path_ops'},
+        ),
+        # Keyset pagination over (created_at, id) and (file_name, id)
+        Index('ix_documents_created_at_id', 'created_at', 'id'),
+        Index('ix_documents_file_name_id', 'file_name', 'id'),
+        # Expiry window scans of the notification scheduler
+        Index('ix_documents_end_date', 'end_date', postgresql_where=text('end_date IS NOT NULL')),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
     file_name: Mapped[str] = mapped_column(String(255), nullable=False)
     start_date: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), nullable=False)
     end_date: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), nullable=True)
     description: Mapped[str] = mapped_column(Text, nullable=False)
-    description_vector: Mapped[Vector] = mapped_column(Vector(1536))
+    # NULL until the embedding pipeline has embedded the description (see services.embedding_service)
+    description_vector: Mapped[Optional[Vector]] = mapped_column(Vector(1536), nullable=True)
     file_path: Mapped[str] = mapped_column(String(255), nullable=False)
     document_metadata: Mapped[Optional[dict]] = mapped_column(JSONB, nullable=True)
     content_hash: Mapped[str] = mapped_column(String(64), unique=True, nullable=False)
+    search_vector: Mapped[str] = mapped_column(TSVECTOR, Computed(DOCUMENT_SEARCH_VECTOR_SQL, persisted=True), deferred=True)
     
     # Timestamps in UTC
     created_at: Mapped[datetime] = mapped_column(
@@ -147,13 +248,25 @@ class DocumentContent(Base):
         - document_id: Foreign key referencing the document's UUID.
         - raw_content: The raw document content as a string.
         - vector: The corresponding vector representation of the document.
+        - search_vector: Generated full-text search vector over the raw content.
     """
     __tablename__ = 'document_contents'
+    __table_args__ = (
+        # Approximate nearest neighbour index for cosine search over contents
+        Index(
+            'ix_document_contents_vector_hnsw', 'vector',
+            postgresql_using='hnsw',
+            postgresql_with={'m': 16, 'ef_construction': 64},
+            postgresql_ops={'vector': 'vector_cosine_ops'},
+        ),
+        Index('ix_document_contents_search_vector', 'search_vector', postgresql_using='gin'),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     document_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey('documents.id'), nullable=False)
     raw_content: Mapped[str] = mapped_column(Text, nullable=False)
-    vector: Mapped[Vector] = mapped_column(Vector(1536))
+    search_vector: Mapped[str] = mapped_column(TSVECTOR, Computed(CONTENT_SEARCH_VECTOR_SQL, persisted=True), deferred=True)
+    vector: Mapped[Optional[Vector]] = mapped_column(Vector(1536), nullable=True)
     file_extension: Mapped[str] = mapped_column(String(15), nullable=False)
     # Timestamps in UTC
     created_at: Mapped[datetime] = mapped_column(
@@ -166,6 +279,47 @@ class DocumentContent(Base):
     def __repr__(self) -> str:
         return f"<DocumentContent(id={self.id}, document_id={self.document_id})>"
 
+class DocumentChunk(Base):
+    """
+    Model representing a retrieval chunk of a document's content.
+    
+    Attributes:
+        - id: Primary key (UUID).
+        - document_id: Foreign key referencing the document's UUID.
+        - ordinal: Position of the chunk within the document, starting at 0.
+        - text: The chunk text.
+        - token_count: Number of embedding-model tokens in the text.
+        - page_start: First page (1-based) covered by the chunk.
+        - page_end: Last page (1-based) covered by the chunk.
+        - vector: Vector representation of the chunk text; NULL until the embedding backfill fills it.
+    """
+    __tablename__ = 'document_chunks'
+    __table_args__ = (
+        UniqueConstraint('document_id', 'ordinal', name='uq_document_chunks_document_id_ordinal'),
+        Index(
+            'ix_document_chunks_vector_hnsw', 'vector',
+            postgresql_using='hnsw',
+            postgresql_with={'m': 16, 'ef_construction': 64},
+            postgresql_ops={'vector': 'vector_cosine_ops'},
+        ),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    document_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey('documents.id', ondelete='CASCADE'), nullable=False)
+    ordinal: Mapped[int] = mapped_column(Integer, nullable=False)
+    text: Mapped[str] = mapped_column(Text, nullable=False)
+    token_count: Mapped[int] = mapped_column(Integer, nullable=False)
+    page_start: Mapped[int] = mapped_column(Integer, nullable=False)
+    page_end: Mapped[int] = mapped_column(Integer, nullable=False)
+    vector: Mapped[Optional[Vector]] = mapped_column(Vector(1536), nullable=True)
+    # Timestamps in UTC
+    created_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP(timezone=True), server_default=func.now(), nullable=False
+    )
+
+    def __repr__(self) -> str:
+        return f"<DocumentChunk(id={self.id}, document_id={self.document_id}, ordinal={self.ordinal})>"
+
 class Tag(Base):
     """
     Model representing a tag for categorizing documents.
@@ -206,5 +360,105 @@ class Tag(Base):
     def __repr__(self) -> str:
         return f"<Tag(id={self.id}, tag_name={self.tag_name})>"
 
+class DocumentNotification(Base):
+    """
+    Model recording when an expiry reminder was last sent for a document under a tag.
+
+    Attributes:
+        - document_id: Foreign key referencing the document.
+        - tag_id: Foreign key referencing the notifying tag.
+        - last_notified_at: When the last reminder including this document and tag was sent.
+    """
+    __tablename__ = 'document_notifications'
+
+    document_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey('documents.id', ondelete='CASCADE'), primary_key=True)
+    tag_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey('tags.id', ondelete='CASCADE'), primary_key=True)
+    last_notified_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<DocumentNotification(document_id={self.document_id}, tag_id={self.tag_id}, last_notified_at={self.last_notified_at})>"
+
+# LSH buckets of the MinHash signatures: one row per document and band. Near-duplicate
+# candidates are the documents sharing a (band, bucket) pair, found through the primary key
+document_lsh_bands = Table(
+    'document_lsh_bands', Base.metadata,
+    Column('band', SmallInteger, primary_key=True),
+    Column('bucket', BigInteger, primary_key=True),
+    Column('document_id', UUID(as_uuid=True), ForeignKey('documents.id', ondelete='CASCADE'), primary_key=True),
+    # Serves the ON DELETE CASCADE from documents
+    Index('ix_document_lsh_bands_document_id', 'document_id'),
+)
+
+class DocumentSignature(Base):
+    """
+    Model storing the MinHash signature of a document's extracted text.
+
+    Attributes:
+        - document_id: Foreign key referencing the document.
+        - signature: The MinHash values, one per permutation (see utils.minhash).
+    """
+    __tablename__ = 'document_signatures'
+
+    document_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey('documents.id', ondelete='CASCADE'), primary_key=True)
+    signature: Mapped[List[int]] = mapped_column(ARRAY(Integer), nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<DocumentSignature(document_id={self.document_id})>"
+
+class Job(Base):
+    """
+    Model representing a document pipeline job, processed by the workers (see services.job_service).
+
+    Attributes:
+        - id: Primary key (UUID).
+        - content_hash: SHA-256 of the source file; one job per file, so retries are idempotent.
+        - file_name: The original file name.
+        - source_path: Where the workers read the file from.
+        - stage: The next pipeline stage to run (extract, metadata, store, embed).
+        - status: queued, running, awaiting_review, duplicate, done or failed.
+        - review: Whether the metadata is reviewed by the uploader before the document is stored.
+        - attempts: The number of times the current stage was started.
+        - text: The extracted text.
+        - result: The metadata returned by the LLM, or the near-duplicate found.
+        - review_data: The metadata and tags confirmed by the uploader.
+        - error: The last error.
+        - document_id: The stored document.
+        - worker: The worker running the job.
+        - locked_at: When the worker claimed the job.
+        - run_after: When the job may run next (retries are delayed).
+    """
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        # Workers claim due queued jobs in run_after order
+        Index('ix_jobs_queued_run_after', 'run_after', postgresql_where=text("status = 'queued'")),
+        Index('ix_jobs_created_at', 'created_at'),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    content_hash: Mapped[str] = mapped_column(String(64), unique=True, nullable=False)
+    file_name: Mapped[str] = mapped_column(String(255), nullable=False)
+    source_path: Mapped[str] = mapped_column(Text, nullable=False)
+    stage: Mapped[str] = mapped_column(String(20), nullable=False, default='extract')
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default='queued')
+    review: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    text: Mapped[Optional[str]] = mapped_column(Text, nullable=True, deferred=True)
+    result: Mapped[Optional[dict]] = mapped_column(JSONB, nullable=True)
+    review_data: Mapped[Optional[dict]] = mapped_column(JSONB, nullable=True)
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    document_id: Mapped[Optional[uuid.UUID]] = mapped_column(UUID(as_uuid=True), ForeignKey('documents.id', ondelete='SET NULL'), nullable=True)
+    worker: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
+    locked_at: Mapped[Optional[datetime]] = mapped_column(TIMESTAMP(timezone=True), nullable=True)
+    run_after: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP(timezone=True), server_default=func.now(), nullable=False
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False
+    )
+
+    def __repr__(self) -> str:
+        return f"<Job(id={self.id}, file_name={self.file_name}, stage={self.stage}, status={self.status})>"
+
 # Create all tables in the database
 # Base.metadata.create_all(engine)
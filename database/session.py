@@ -2,23 +2,25 @@ import time
 from contextlib import contextmanager
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.exc import OperationalError
-from database.models import engine
+from database.models import get_engine
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Bound to the engine on first use, see get_db. Objects stay loaded after commit, since services
+# return them after their session is closed.
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False)
 
 @contextmanager
 def get_db(**session_options):
+    session_options.setdefault("bind", get_engine())
     db = SessionLocal(**session_options)
-    logger.info("Database session created.")
+    logger.debug("Database session created.")
     try:
         yield db
-        logger.info("Database session yielded successfully.")
     finally:
         db.close()
-        logger.info("Database session closed.")
+        logger.debug("Database session closed.")
 
 def get_db_with_retries(retries=10, delay=0.2, **session_options):
     attempt = 0
@@ -28,7 +30,7 @@ def get_db_with_retries(retries=10, delay=0.2, **session_options):
                 yield db
             return
         except OperationalError as e:
-            logger.warning(f"OperationalError encountered: {e}. Retrying {attempt + 1}/{retries}...")
+            logger.warning("OperationalError encountered: %s. Retrying %s/%s...", e, attempt + 1, retries)
             if attempt < retries - 1:
                 time.sleep(delay)
                 attempt += 1
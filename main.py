@@ -1,125 +1,45 @@
-import os
-import json
-from openai import OpenAI
-import openai
-import fitz
-from pdf2image import convert_from_path
-import base64
-import pandas as pd
-from dotenv import load_dotenv
-import requests
+"""
+Bulk ingest entry point.
 
-# Load environment variables from a .env file
-load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
+Loads every PDF below a folder into the database. Runs are resumable: files that
+were already ingested (matched by content hash) are skipped.
 
-class OpenAIClient:
-    def __init__(self, api_key):
-        """
-        Initializes the OpenAI client with the provided API key.
-        """
-        self.client = OpenAI(api_key=api_key)
+Usage:
+    python main.py invoices --workers 8 --max-in-flight 32 --batch-size 200
+    python main.py invoices --queue    # processed by the workers of worker.py instead
+"""
 
-    def extract_data_with_langchain(self, text):
-        """
-        Sends a request to OpenAI API to extract data from text.
-        """
-        prompt = """
-        You are given the text of a machine installment payment invoice. Extract the following information as plain json, please remember to parse all the date information to the format of yyyy.mm.dd:
-        - Manufacturer
-        - Billing company
-        - Invoice numbers
-        - Contract numbers
-        - Device names (if any)
-        - Address related to the use of this device
-        - Contract term
-        - Current billing month
-        - Total contract term
-        - Net price every term
+import argparse
+import config.config as cfg
+from services.ingest_service import IngestService
+from services.job_service import JobService
+from utils.logger import get_logger
 
-        If there are multiple contract numbers in an invoice, the exported file can have an additional row.
-        If there are duplicates in the result, only keep one; if there is only one result, it does not need to be a list.
-        no need to output any additonal characters
-        all output in english
-        """
-        try:
-            completion = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": prompt},
-                    {"role": "user", "content": text},
-                ],
-            )
-            return completion.choices[0].message
-        except Exception as e:
-            print(f"Error extracting data with Langchain: {e}")
-            return None
+logger = get_logger(__name__)
 
 
-def process_pdfs_in_folder(folder_path, output_file):
-    """
-    Processes all PDF files in a folder, extracts data, and saves it to an Excel file.
-    """
-    data = []
-    for filename in os.listdir(folder_path):
-        if filename.endswith(".pdf"):
-            file_path = os.path.join(folder_path, filename)
-            print(f"Processing file: {file_path}")
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Bulk ingest PDF files into IntelliDocs.")
+    parser.add_argument("folder_path", nargs="?", default="invoices", help="Folder to scan recursively for PDF files.")
+    parser.add_argument("--workers", type=int, default=cfg.INGEST_WORKERS, help="Number of text extraction processes.")
+    parser.add_argument("--max-in-flight", type=int, default=cfg.INGEST_MAX_IN_FLIGHT, help="Maximum concurrent OpenAI requests.")
+    parser.add_argument("--batch-size", type=int, default=cfg.INGEST_BATCH_SIZE, help="Documents written per transaction.")
+    parser.add_argument("--queue", action="store_true", help="Queue the files for the pipeline workers instead of ingesting them here.")
+    return parser.parse_args()
 
-            # Extract text from PDF
-            extracted_text = extract_text_from_pdf(file_path)
-
-            if extracted_text.strip():
-                print(f"Text successfully extracted from {file_path}")
-                try:
-                    extracted_data = extract_data_with_langchain(extracted_text)
-                    json_data = json.loads(
-                        extracted_data.content.strip("```json\n").strip("```")
-                    )
-                    data.append(json_data)
-                except Exception as e:
-                    print(f"Error processing extracted text: {e}")
-
-            else:
-                print(
-                    f"Text extraction failed, switching to image extraction for {file_path}"
-                )
-                try:
-                    images = convert_from_path(file_path)
-                    for i, image in enumerate(images):
-                        image_path = f"temp_image_{i}.jpg"
-                        image.save(image_path, "JPEG")
-
-                        encoded_image = encode_image(image_path)
-
-                        extracted_data = extract_data_from_image(encoded_image)
-                        print(f"Extracted Data from page {i + 1}: {extracted_data}")
-
-                        try:
-                            extracted_json = json.loads(
-                                extracted_data["choices"][0]["message"]["content"]
-                                .strip("```json\n")
-                                .strip("```")
-                            )
-                            data.append(extracted_json)
-                        except Exception as e:
-                            print(f"Error parsing GPT-4 response: {e}")
-
-                        os.remove(image_path)
-
-                except Exception as e:
-                    print(f"Error processing {file_path}: {e}")
-
-    if data:
-        df = pd.DataFrame(data)
-        df.to_excel(output_file, index=False)
-        print(f"Data successfully saved to {output_file}")
-    else:
-        print("No data to save.")
 
 if __name__ == "__main__":
-    api_key = os.getenv("OPENAI_API_KEY")
-    openai_client = OpenAIClient(api_key)
-    folder_path = "invoices"
-    output_file = "output.xlsx"
-    process_pdfs_in_folder(folder_path, output_file)
\ No newline at end of file
+    args = parse_args()
+    if args.queue:
+        # The workers read the files by path, so the folder must be reachable from every worker node
+        paths = IngestService.discover_pdfs(args.folder_path)
+        for path in paths:
+            JobService.enqueue_file(path)
+        logger.info("Queued %d files.", len(paths))
+    else:
+        IngestService.ingest_folder(
+            args.folder_path,
+            workers=args.workers,
+            max_in_flight=args.max_in_flight,
+            batch_size=args.batch_size,
+        )
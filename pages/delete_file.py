@@ -0,0 +1,35 @@
+import streamlit as st
+from services.document_service import DocumentService
+from utils.document_picker import document_picker, reset_document_picker
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+st.title("Delete Files")
+
+selected_documents = document_picker('delete_documents')
+
+if selected_documents:
+    @st.dialog("Confirm Deletion")
+    def confirm_deletion():
+        st.write(f"Are you sure you want to delete {len(selected_documents)} documents? This cannot be undone.")
+        if st.button("Confirm Delete"):
+            try:
+                result = DocumentService.bulk_delete_documents(selected_documents)
+                st.toast(f"Deleted {result.rows} documents in {result.seconds:.2f}s.", icon="✅")
+                logger.info("Deleted %s documents in %.2fs.", result.rows, result.seconds)
+                reset_document_picker('delete_documents')
+                st.rerun()
+            except Exception as e:
+                st.toast(f"Failed to delete documents. Error: {e}", icon="🚨")
+                logger.error("Error deleting %s documents: %s", len(selected_documents), e)
+        if st.button("Cancel"):
+            st.toast("Document deletion cancelled.", icon="ℹ️")
+            logger.info("Document deletion was cancelled.")
+            reset_document_picker('delete_documents')
+            st.rerun()
+
+with st.form(key='delete_documents_form', clear_on_submit=True, border=False):
+    submit_button = st.form_submit_button(label='Delete Documents')
+    if submit_button and selected_documents:
+        confirm_deletion()
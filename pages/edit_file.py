@@ -0,0 +1,44 @@
+import streamlit as st
+from services.document_service import DocumentService
+from services.tag_service import TagService
+from utils.document_picker import document_picker, reset_document_picker
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+st.title("Edit Files")
+
+all_tags = TagService.get_all_tags()
+tag_options = {tag.tag_name: tag.id for tag in all_tags}
+
+st.subheader("Retag Documents")
+selected_documents = document_picker('retag_documents')
+with st.form(key='retag_documents_form', border=False):
+    col1, col2 = st.columns(2)
+    with col1:
+        add_tags = st.multiselect("Add Tags", options=list(tag_options.keys()), key='retag_add_tags')
+    with col2:
+        remove_tags = st.multiselect("Remove Tags", options=list(tag_options.keys()), key='retag_remove_tags')
+    replace = st.checkbox("Replace all existing tags with the added tags", value=False, key='retag_replace')
+    submit_button = st.form_submit_button(label='Retag Documents')
+    if submit_button:
+        if not selected_documents:
+            st.toast("Select at least one document!", icon="🚨")
+            logger.warning("Attempted to retag without selecting documents.")
+        elif not (add_tags or remove_tags or replace):
+            st.toast("Select tags to add or remove!", icon="🚨")
+            logger.warning("Attempted to retag without selecting tags.")
+        else:
+            try:
+                result = DocumentService.bulk_retag(
+                    selected_documents,
+                    add_tag_ids=[tag_options[tag] for tag in add_tags],
+                    remove_tag_ids=[tag_options[tag] for tag in remove_tags],
+                    replace=replace,
+                )
+                st.toast(f"Retagged {len(selected_documents)} documents: {result.rows} tag links changed in {result.seconds:.2f}s.", icon="✅")
+                logger.info("Retagged %s documents (%s tag links) in %.2fs.", len(selected_documents), result.rows, result.seconds)
+                reset_document_picker('retag_documents')
+            except Exception as e:
+                st.toast(f"Failed to retag documents. Error: {e}", icon="🚨")
+                logger.error("Error retagging %s documents: %s", len(selected_documents), e)
@@ -24,11 +24,11 @@ with tab1:
                 try:
                     TagService.create_tag(tag_name, notify, notification_days_before_expiry, notification_frequency)
                     st.toast("Tag added successfully!", icon="✅")
-                    logger.info(f"Tag '{tag_name}' added successfully.")
+                    logger.info("Tag '%s' added successfully.", tag_name)
                     st.rerun()
                 except Exception as e:
                     st.toast(f"Failed to add tag '{tag_name}'. Please check the details and try again. Error: {e}", icon="🚨")
-                    logger.error(f"Error adding tag '{tag_name}': {e}")
+                    logger.error("Error adding tag '%s': %s", tag_name, e)
 
 with tab2:
     st.subheader("Update Tag")
@@ -56,11 +56,11 @@ with tab2:
                 try:
                     TagService.update_tag(selected_tag_id, tag_name, notify, notification_days_before_expiry, notification_frequency)
                     st.toast("Tag updated successfully!", icon="✅")
-                    logger.info(f"Tag '{selected_tag_name}' updated successfully.")
+                    logger.info("Tag '%s' updated successfully.", selected_tag_name)
                     st.rerun()
                 except Exception as e:
                     st.toast(f"Failed to update tag '{selected_tag_name}'. Please ensure the details are correct and try again. Error: {e}", icon="🚨")
-                    logger.error(f"Error updating tag '{selected_tag_name}': {e}")
+                    logger.error("Error updating tag '%s': %s", selected_tag_name, e)
 
 with tab3:
     st.subheader("Delete Tag")
@@ -78,18 +78,18 @@ with tab3:
                     selected_tag_id = tag_options[selected_tag_name]
                     if TagService.delete_tag(selected_tag_id):
                         st.toast("Tag deleted successfully!", icon="✅")
-                        logger.info(f"Tag '{selected_tag_name}' deleted successfully.")
+                        logger.info("Tag '%s' deleted successfully.", selected_tag_name)
                         st.session_state.pop('delete_tag_selector', None)
                         st.rerun()
                     else:
                         st.toast(f"Cannot delete tag '{selected_tag_name}' because it is associated with documents.", icon="🚨")
-                        logger.warning(f"Attempted to delete tag '{selected_tag_name}' that cannot be deleted.")
+                        logger.warning("Attempted to delete tag '%s' that cannot be deleted.", selected_tag_name)
                 except Exception as e:
                     st.toast(f"Failed to delete tag '{selected_tag_name}'. Please ensure the details are correct and try again. Error: {e}", icon="🚨")
-                    logger.error(f"Error deleting tag '{selected_tag_name}': {e}")
+                    logger.error("Error deleting tag '%s': %s", selected_tag_name, e)
             if st.button("Cancel"):
                 st.toast("Tag deletion cancelled.", icon="ℹ️")
-                logger.info(f"Tag deletion for '{selected_tag_name}' was cancelled.")
+                logger.info("Tag deletion for '%s' was cancelled.", selected_tag_name)
                 st.session_state.pop('delete_tag_selector', None)
                 st.rerun()
 
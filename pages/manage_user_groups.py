@@ -29,10 +29,10 @@ with tab1:
                     tag_ids = [tag.id for tag in all_tags if tag.tag_name in tags]
                     UserGroupService.create_user_group(group_name, tag_ids)
                     st.toast("User group added successfully!", icon="✅")
-                    logger.info(f"User group '{group_name}' added successfully.")
+                    logger.info("User group '%s' added successfully.", group_name)
                 except Exception as e:
                     st.toast(f"Failed to add user group '{group_name}'. Please check the details and try again. Error: {e}", icon="🚨")
-                    logger.error(f"Error adding user group '{group_name}': {e}")
+                    logger.error("Error adding user group '%s': %s", group_name, e)
 
 with tab2:
     st.subheader("Update User Group")
@@ -70,11 +70,11 @@ with tab2:
                 UserGroupService.update_user_group(selected_group_id, final_group_name, tag_ids)
 
                 st.toast("User group updated successfully!", icon="✅")
-                logger.info(f"User group '{final_group_name}' updated successfully.")
+                logger.info("User group '%s' updated successfully.", final_group_name)
                 st.rerun()
             except Exception as e:
                 st.toast(f"Failed to update user group '{selected_group_name}'. Please ensure the details are correct and try again. Error: {e}", icon="🚨")
-                logger.error(f"Error updating user group '{selected_group_name}': {e}")
+                logger.error("Error updating user group '%s': %s", selected_group_name, e)
 
 with tab3:
     st.subheader("Delete User Group")
@@ -92,18 +92,18 @@ with tab3:
                     selected_group_id = group_options[selected_group_name]
                     if UserGroupService.delete_user_group(selected_group_id):
                         st.toast("User group deleted successfully!", icon="✅")
-                        logger.info(f"User group '{selected_group_name}' deleted successfully.")
+                        logger.info("User group '%s' deleted successfully.", selected_group_name)
                         st.session_state.pop('delete_user_group_selector', None)
                         st.rerun()
                     else:
                         st.toast(f"Cannot delete user group '{selected_group_name}' because it has associated users.", icon="🚨")
-                        logger.warning(f"Attempted to delete user group '{selected_group_name}' that cannot be deleted.")
+                        logger.warning("Attempted to delete user group '%s' that cannot be deleted.", selected_group_name)
                 except Exception as e:
                     st.toast(f"Failed to delete user group '{selected_group_name}'. Please ensure the details are correct and try again. Error: {e}", icon="🚨")
-                    logger.error(f"Error deleting user group '{selected_group_name}': {e}")
+                    logger.error("Error deleting user group '%s': %s", selected_group_name, e)
             if st.button("Cancel"):
                 st.toast("User group deletion cancelled.", icon="ℹ️")
-                logger.info(f"User group deletion for '{selected_group_name}' was cancelled.")
+                logger.info("User group deletion for '%s' was cancelled.", selected_group_name)
                 st.session_state.pop('delete_user_group_selector', None)
                 st.rerun()
 
@@ -1,5 +1,5 @@
 import streamlit as st
-from services.user_service import UserService
+from services.user_service import IMPORT_FIELDS, UserService, load_user_records
 from services.user_group_service import UserGroupService
 from utils.logger import get_logger
 
@@ -9,7 +9,7 @@ logger = get_logger(__name__)
 st.title("User Management")
 
 # Add tabs for user management tasks
-tab1, tab2, tab3 = st.tabs(["Add User", "Update User", "Delete User"])
+tab1, tab2, tab3, tab4 = st.tabs(["Add User", "Update User", "Delete User", "Import Users"])
 
 # Fetch user groups
 user_groups = UserGroupService.fetch_all_user_groups()
@@ -33,11 +33,11 @@ with tab1:
                     password_hash = password
                     UserService.create_user(username, email, password_hash, user_group_options.get(user_group))
                     st.toast("User added successfully!", icon="✅")
-                    logger.info(f"User '{username}' added successfully.")
+                    logger.info("User '%s' added successfully.", username)
                     st.rerun()
                 except Exception as e:
                     st.toast(f"Failed to add user '{username}'. Please check the details and try again. Error: {e}", icon="🚨")
-                    logger.error(f"Error adding user '{username}': {e}")
+                    logger.error("Error adding user '%s': %s", username, e)
 
 with tab2:
     st.subheader("Update User")
@@ -80,11 +80,11 @@ with tab2:
                 try:
                     UserService.update_user(selected_user_id, username, email, password, user_group_options[user_group])
                     st.toast("User updated successfully!", icon="✅")
-                    logger.info(f"User '{selected_username}' updated successfully.")
+                    logger.info("User '%s' updated successfully.", selected_username)
                     st.rerun()
                 except Exception as e:
                     st.toast(f"Failed to update user '{selected_username}'. Please ensure the details are correct and try again. Error: {e}", icon="🚨")
-                    logger.error(f"Error updating user '{selected_username}': {e}")
+                    logger.error("Error updating user '%s': %s", selected_username, e)
 
 with tab3:
     st.subheader("Delete User")
@@ -101,15 +101,15 @@ with tab3:
                     selected_user_id = user_options[selected_username]
                     UserService.delete_user(selected_user_id)
                     st.toast("User deleted successfully!", icon="✅")
-                    logger.info(f"User '{selected_username}' deleted successfully.")
+                    logger.info("User '%s' deleted successfully.", selected_username)
                     st.session_state.pop('delete_user_selector', None)
                     st.rerun()  # Refresh the page
                 except Exception as e:
                     st.toast(f"Failed to delete user '{selected_username}'. Please ensure the details are correct and try again. Error: {e}", icon="🚨")
-                    logger.error(f"Error deleting user '{selected_username}': {e}")
+                    logger.error("Error deleting user '%s': %s", selected_username, e)
             if st.button("Cancel"):
                 st.toast("User deletion cancelled.", icon="ℹ️")
-                logger.info(f"User deletion for '{selected_username}' was cancelled.")
+                logger.info("User deletion for '%s' was cancelled.", selected_username)
                 st.session_state.pop('delete_user_selector', None)
                 st.rerun()
 
@@ -117,3 +117,24 @@ with tab3:
         submit_button = st.form_submit_button(label='Delete User')
         if submit_button and selected_username:
             confirm_deletion()
+
+with tab4:
+    st.subheader("Import Users")
+    st.caption(f"Upload a CSV file with the columns {', '.join(IMPORT_FIELDS)} or a JSON array of objects with these keys. The group is the user group name.")
+    with st.form(key='import_users_form', clear_on_submit=True, border=False):
+        import_file = st.file_uploader("Users File", type=['csv', 'json'], key='import_users_file')
+        submit_button = st.form_submit_button(label='Import Users')
+        if submit_button and import_file is not None:
+            try:
+                with st.spinner("Importing users..."):
+                    result = UserService.import_users(load_user_records(import_file, import_file.name))
+                st.toast(f"Imported {result['imported']} users, skipped {result['skipped']} existing.", icon="✅")
+                logger.info(
+                    "Imported users from '%s': %d imported, %d skipped in %.1fs.",
+                    import_file.name, result['imported'], result['skipped'], result['seconds'],
+                )
+                for error in result['errors']:
+                    st.warning(error)
+            except Exception as e:
+                st.toast(f"Failed to import users from '{import_file.name}'. Error: {e}", icon="🚨")
+                logger.error("Error importing users from '%s': %s", import_file.name, e)
@@ -0,0 +1,85 @@
+import streamlit as st
+import config.config as cfg
+from services.auth_service import get_current_user_id
+from services.search_service import MAX_EF_SEARCH, SearchService
+from services.storage_service import get_storage
+from services.tag_service import TagService
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+st.title("Search File")
+
+
+def download_button(document):
+    # Files are downloaded straight from the storage; it is never read into the app
+    url = get_storage().url(document.file_path)
+    if url:
+        st.link_button("Download", url)
+
+
+all_tags = TagService.get_all_tags()
+tag_options = {tag.tag_name: tag.id for tag in all_tags}
+
+with st.form(key='search_form', border=False):
+    query = st.text_input("Search", key='search_query', placeholder="Describe the document you are looking for")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        mode = st.radio("Mode", options=["Hybrid", "Semantic (Description)", "Semantic (Content)", "Passages"], horizontal=True, key='search_mode')
+        selected_tags = st.multiselect("Tags", options=list(tag_options.keys()), key='search_tags')
+    with col2:
+        date_from = st.date_input("Starts On Or After", value=None, key='search_date_from')
+        date_to = st.date_input("Ends On Or Before", value=None, key='search_date_to')
+    with col3:
+        page_size = st.number_input("Results Per Page", min_value=1, max_value=100, value=cfg.SEARCH_PAGE_SIZE, key='search_page_size')
+        page = st.number_input("Page", min_value=1, value=1, key='search_page')
+    with st.expander("Advanced", expanded=False):
+        ef_search = st.number_input("HNSW ef_search", min_value=1, max_value=MAX_EF_SEARCH, value=cfg.SEARCH_EF_SEARCH, key='search_ef_search')
+    submit_button = st.form_submit_button(label='Search')
+
+if submit_button and query:
+    try:
+        filters = dict(
+            k=int(page_size),
+            page=int(page),
+            tag_ids=[tag_options[tag] for tag in selected_tags],
+            date_from=date_from,
+            date_to=date_to,
+            ef_search=int(ef_search),
+            user_id=get_current_user_id() if cfg.ACCESS_CONTROL_ENABLED else None,
+        )
+        if mode == "Passages":
+            filters.pop("page")
+            passages = SearchService.search_chunks(query, **filters)
+            logger.info("Passage search for '%s' returned %s results.", query, len(passages))
+            if not passages:
+                st.info("No matching passages found.")
+            for chunk, document, score in passages:
+                with st.container(border=True):
+                    pages = f"page {chunk.page_start}" if chunk.page_start == chunk.page_end else f"pages {chunk.page_start}–{chunk.page_end}"
+                    st.markdown(f"**{document.file_name}** · {pages} · similarity {score:.3f}")
+                    st.write(chunk.text)
+                    download_button(document)
+            st.stop()
+        if mode == "Hybrid":
+            results = SearchService.hybrid_search(query, **filters)
+        else:
+            target = "documents" if mode == "Semantic (Description)" else "contents"
+            results = SearchService.semantic_search(query, target=target, **filters)
+        logger.info("Search for '%s' returned %s results.", query, len(results))
+        if not results and (page - 1) * page_size >= MAX_EF_SEARCH:
+            st.info(f"Search only reaches the best {MAX_EF_SEARCH} matches; narrow the query or the filters to see more.")
+        elif not results:
+            st.info("No matching documents found.")
+        for document, score in results:
+            with st.container(border=True):
+                st.markdown(f"**{document.file_name}** · score {score:.3f}")
+                st.caption(
+                    f"{document.start_date:%Y-%m-%d}"
+                    + (f" – {document.end_date:%Y-%m-%d}" if document.end_date else "")
+                )
+                st.write(document.description)
+                download_button(document)
+    except Exception as e:
+        st.toast(f"Search failed: {e}", icon="🚨")
+        logger.error("Error searching for '%s': %s", query, e)
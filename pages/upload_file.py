@@ -1,89 +1,160 @@
 import streamlit as st
-from utils.file_utils import extract_text_from_pdf
+import config.config as cfg
 from utils.logger import get_logger
 from services.document_service import DocumentService
-from services.openai_service import OpenAIClient
+from services.job_service import ACTIVE_STATUSES, JobService
 from services.tag_service import TagService
 from datetime import datetime
-from utils.file_utils import generate_hash_from_bytes
+from utils.upload_spool import SpooledUpload
 import json
 
 logger = get_logger(__name__)
 
 st.title("IntelliDocs - Upload PDF")
 
+
+@st.fragment(run_every=cfg.JOB_STATUS_REFRESH_SECONDS)
+def show_job_progress(job_id):
+    # Polls the job while the workers process it; only this fragment reruns until it leaves the queue
+    job = JobService.get_job(job_id)
+    if job.status not in ACTIVE_STATUSES:
+        st.rerun()
+    st.info(f"Processing '{job.file_name}': {job.stage} ({job.status}, attempt {max(job.attempts, 1)}).", icon="⏳")
+
+
+def spool_again(uploaded_file):
+    # The spooled file of a job stopped as a duplicate or failed is removed; the workers need it back
+    with SpooledUpload.from_stream(uploaded_file, uploaded_file.name) as upload:
+        return upload.persist(cfg.JOB_SPOOL_DIR)
+
+
+def show_recent_jobs():
+    with st.expander("Recent uploads", expanded=False):
+        counts = JobService.status_counts()
+        st.caption(" · ".join(f"{status}: {count}" for status, count in sorted(counts.items())) or "No jobs yet.")
+        st.dataframe(
+            [
+                {
+                    "File": job.file_name,
+                    "Stage": job.stage,
+                    "Status": job.status,
+                    "Attempts": job.attempts,
+                    "Error": job.error or "",
+                    "Updated": job.updated_at,
+                }
+                for job in JobService.list_jobs(limit=20)
+            ],
+            use_container_width=True,
+        )
+
+
 uploaded_file = st.file_uploader("Choose a PDF file", type=['pdf'], accept_multiple_files=False)
 if uploaded_file is not None:
     try:
-        logger.info("File uploaded: %s", uploaded_file.name)
-        
-        # Check if the document already exists
-        content_hash = generate_hash_from_bytes(uploaded_file)
-
-        existing_document = DocumentService.document_exists_by_hash(content_hash)
-        if existing_document is True:
-            st.toast(f"This document already exists in the database.", icon="🔍")
-            logger.info(f"Document {uploaded_file.name} already exists in the database.")
-            st.stop()
-
-        extracted_text = extract_text_from_pdf(uploaded_file)
-        logger.info("Text extracted successfully.")
-        parsed_data = OpenAIClient().extract_document_metadata(input_data=extracted_text)
-        parsed_data = json.loads(parsed_data)
-
-        col1, col2 = st.columns(2)
-
-        with col1:
-            st.expander("Extracted Text", expanded=False).code(extracted_text, language="text")
-
-        with col2:
-            st.expander("Parsed Data", expanded=False).code(json.dumps(parsed_data, indent=2), language="json")
-
-        file_name = parsed_data.get("filename", "")
-        parsed_data.pop("filename", None)
-        start_date = datetime.strptime(parsed_data.get("start_date", ""), "%Y.%m.%d") if parsed_data.get("start_date", "") else None
-        parsed_data.pop("start_date", None)
-        end_date = datetime.strptime(parsed_data.get("end_date", ""), "%Y.%m.%d") if parsed_data.get("end_date", "") else None
-        parsed_data.pop("end_date", None)
-        description = parsed_data.get("description", "")
-        parsed_data.pop("description", None)
-
-
-        col1, col2 = st.columns(2)
-
-        with col1:
-            file_name = st.text_input("File Name", value=file_name)
-            start_date = st.date_input("Start Date", value=start_date)
-            description = st.text_area("Description", value=description, height=250)
-        with col2:
-            file_extension = st.text_input("File Extension", value=uploaded_file.type.split('/')[1])
-            end_date = st.date_input("End Date", value=end_date)
-            document_metadata = st.text_area("Document Metadata", value=json.dumps(parsed_data, indent=2), height=250)
-
-
-        # Fetch tags for multiselect
-        all_tags = TagService.get_all_tags()
-        tag_options = {tag.tag_name: tag.id for tag in all_tags}
-        selected_tags = st.multiselect("Tags", options=list(tag_options.keys()), default=parsed_data.get("tags", []))
-        
-        if st.button("Save Document"):
-            try:
-                # Save the document using the DocumentService
-                DocumentService.create_document(
-                    file_name=file_name,
-                    start_date=start_date,
-                    end_date=end_date,
-                    description=description,
-                    file_extension=file_extension,
-                    document_metadata=document_metadata,
-                    tag_ids=[tag_options[tag] for tag in selected_tags]
-                )
-                st.toast("Document saved successfully!", icon="✅")
-                logger.info("Document saved successfully.")
-            except Exception as e:
-                st.toast(f"Failed to save document: {e}", icon="🚨")
-                logger.error("Failed to save document: %s", e)
-    
+        # Spool, hash and queue the upload once; Streamlit reruns this script on every interaction
+        spooled = st.session_state.get("upload_spool")
+        if spooled is None or spooled["file_id"] != uploaded_file.file_id:
+            logger.info("File uploaded: %s", uploaded_file.name)
+            with SpooledUpload.from_stream(uploaded_file, uploaded_file.name) as upload:
+                # Check if the document already exists
+                if DocumentService.document_exists_by_hash(upload.content_hash):
+                    st.toast(f"This document already exists in the database.", icon="🔍")
+                    logger.info("Document %s already exists in the database.", uploaded_file.name)
+                    st.stop()
+                # The workers read the file from the shared spool directory
+                source_path = upload.persist(cfg.JOB_SPOOL_DIR)
+                job = JobService.enqueue(upload.content_hash, uploaded_file.name, source_path, review=True)
+            spooled = {"file_id": uploaded_file.file_id, "job_id": job.id}
+            st.session_state["upload_spool"] = spooled
+
+        job = JobService.get_job(spooled["job_id"])
+
+        if job.status in ACTIVE_STATUSES:
+            show_job_progress(job.id)
+
+        elif job.status == "duplicate":
+            # Re-scans and re-exports of stored documents are only processed on request
+            duplicate = job.result["near_duplicate"]
+            st.warning(f"This document looks like a copy of '{duplicate['file_name']}' ({duplicate['similarity']:.0%} similar).")
+            if st.button("Process anyway"):
+                JobService.process_duplicate(job.id, spool_again(uploaded_file))
+                st.rerun()
+
+        elif job.status == "failed":
+            st.error(f"Processing failed at the {job.stage} stage: {job.error}")
+            if st.button("Retry"):
+                JobService.retry(job.id, spool_again(uploaded_file))
+                st.rerun()
+
+        elif job.status == "done":
+            st.success(f"'{job.file_name}' was saved and indexed.", icon="✅")
+
+        elif job.status == "awaiting_review":
+            # The extracted text only changes before review, so it is loaded once rather than on every rerun
+            if "text" not in spooled:
+                spooled["text"] = JobService.get_job(job.id, with_text=True).text
+            parsed_data = dict(job.result or {})
+
+            col1, col2 = st.columns(2)
+
+            with col1:
+                st.expander("Extracted Text", expanded=False).code(spooled["text"], language="text")
+
+            with col2:
+                st.expander("Parsed Data", expanded=False).code(json.dumps(parsed_data, indent=2), language="json")
+
+            file_name = parsed_data.get("filename", "")
+            parsed_data.pop("filename", None)
+            start_date = datetime.strptime(parsed_data.get("start_date", ""), "%Y.%m.%d") if parsed_data.get("start_date", "") else None
+            parsed_data.pop("start_date", None)
+            end_date = datetime.strptime(parsed_data.get("end_date", ""), "%Y.%m.%d") if parsed_data.get("end_date", "") else None
+            parsed_data.pop("end_date", None)
+            description = parsed_data.get("description", "")
+            parsed_data.pop("description", None)
+
+
+            col1, col2 = st.columns(2)
+
+            with col1:
+                file_name = st.text_input("File Name", value=file_name)
+                start_date = st.date_input("Start Date", value=start_date)
+                description = st.text_area("Description", value=description, height=250)
+            with col2:
+                file_extension = st.text_input("File Extension", value=uploaded_file.type.split('/')[1])
+                end_date = st.date_input("End Date", value=end_date)
+                document_metadata = st.text_area("Document Metadata", value=json.dumps(parsed_data, indent=2), height=250)
+
+
+            # Fetch tags for multiselect
+            all_tags = TagService.get_all_tags()
+            tag_options = {tag.tag_name: tag.id for tag in all_tags}
+            selected_tags = st.multiselect(
+                "Tags",
+                options=list(tag_options.keys()),
+                default=[tag for tag in parsed_data.get("tags", []) if tag in tag_options],
+            )
+
+            if st.button("Save Document"):
+                try:
+                    # The workers store and embed the document with the reviewed values
+                    JobService.submit_review(job.id, {
+                        "file_name": file_name,
+                        "start_date": start_date.isoformat() if start_date else None,
+                        "end_date": end_date.isoformat() if end_date else None,
+                        "description": description,
+                        "file_extension": file_extension,
+                        "document_metadata": json.loads(document_metadata),
+                        "tag_ids": [str(tag_options[tag]) for tag in selected_tags],
+                    })
+                    st.toast("Document queued for saving.", icon="✅")
+                    logger.info("Document %s queued for saving.", job.file_name)
+                    st.rerun()
+                except Exception as e:
+                    st.toast(f"Failed to save document: {e}", icon="🚨")
+                    logger.error("Failed to save document: %s", e)
+
     except Exception as e:
         st.toast(f"Failed to process document: {e}", icon="🚨")
         logger.error("Failed to process document: %s", e)
+
+show_recent_jobs()
@@ -1,48 +1,160 @@
 """
-This module handles user authentication for a Streamlit dashboard using 
-streamlit_authenticator. It includes functions to authenticate users, 
-manage the authentication flow, and interact with a custom database query.
+This module handles user authentication for the Streamlit dashboard. It keeps
+streamlit_authenticator's cookie format (an HS256 JWT named ST_SECRET_KEY holding
+name, username and exp_date), so existing sessions stay logged in, but never loads
+the user table: the cookie is verified with the secret key alone, a login looks up
+the single user by email, and the resulting identity is cached in the Streamlit
+session so reruns cost nothing regardless of the number of users.
 """
 
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+from uuid import UUID
+import bcrypt
+import extra_streamlit_components as stx
+import jwt
 import streamlit as st
-import streamlit_authenticator as stauth
 from config.config import ST_SECRET_KEY
 from services.user_service import UserService
+from utils.logger import get_logger
 
+logger = get_logger(__name__)
 
-def user_authentication(user_list=None):
-    """
-    Handles user authentication using streamlit_authenticator.
+# Session state keys; the first four are the ones streamlit_authenticator used
+SESSION_KEYS = ("name", "username", "authentication_status", "logout", "user_id")
+
+
+class AuthBackend:
+    def __init__(self, cookie_name: str = ST_SECRET_KEY, key: str = ST_SECRET_KEY, cookie_expiry_days: int = 30):
+        """
+        Initializes the backend and the browser cookie manager.
+
+        Parameters:
+        cookie_name (str): The name of the JWT cookie used for passwordless reauthentication.
+        key (str): The key signing the JWT cookie.
+        cookie_expiry_days (int): The number of days before the cookie expires.
+        """
+        self.cookie_name = cookie_name
+        self.key = key
+        self.cookie_expiry_days = cookie_expiry_days
+        self.cookie_manager = stx.CookieManager(key="auth_cookie_manager")
+        for session_key in SESSION_KEYS:
+            st.session_state.setdefault(session_key, None)
+
+    def encode_token(self, name: str, username: str, user_id: str) -> str:
+        """
+        Returns a signed cookie token for the user.
+        """
+        exp_date = (datetime.utcnow() + timedelta(days=self.cookie_expiry_days)).timestamp()
+        return jwt.encode({"name": name, "username": username, "user_id": user_id, "exp_date": exp_date}, self.key, algorithm="HS256")
+
+    def decode_token(self, token: str) -> Optional[dict]:
+        """
+        Returns the claims of a valid, unexpired cookie token, or None.
+        """
+        try:
+            claims = jwt.decode(token, self.key, algorithms=["HS256"])
+        except jwt.PyJWTError:
+            return None
+        if claims.get("exp_date", 0) <= datetime.utcnow().timestamp() or not claims.get("username"):
+            return None
+        return claims
+
+    def _set_identity(self, name: str, username: str, user_id: Optional[str]) -> None:
+        st.session_state["name"] = name
+        st.session_state["username"] = username
+        st.session_state["user_id"] = user_id
+        st.session_state["authentication_status"] = True
+
+    def restore_from_cookie(self) -> bool:
+        """
+        Authenticates the session from the cookie token, without touching the database.
+
+        Returns:
+        bool: True if the cookie held a valid token.
+        """
+        token = self.cookie_manager.get(self.cookie_name)
+        claims = self.decode_token(token) if token else None
+        if claims is None:
+            return False
+        self._set_identity(claims.get("name"), claims["username"], claims.get("user_id"))
+        return True
+
+    def authenticate(self, email: str, password: str) -> bool:
+        """
+        Verifies credentials against the single user with the given email and, on success,
+        stores the identity in the session and the token in the cookie.
+
+        Returns:
+        bool: True if the credentials are valid.
+        """
+        user = UserService.get_user_by_email(email)
+        try:
+            valid = user is not None and bcrypt.checkpw(password.encode(), user.password.encode())
+        except ValueError as e:
+            logger.error("Invalid password hash stored for %s: %s", email, e)
+            valid = False
+        if not valid:
+            st.session_state["authentication_status"] = False
+            return False
+        self._set_identity(user.username, user.email, str(user.id))
+        st.session_state["logout"] = None
+        self.cookie_manager.set(
+            self.cookie_name,
+            self.encode_token(user.username, user.email, str(user.id)),
+            expires_at=datetime.now() + timedelta(days=self.cookie_expiry_days),
+        )
+        return True
+
+    def login(self, form_name: str, location: str = "main") -> Tuple[Optional[str], Optional[bool], Optional[str]]:
+        """
+        Returns the session identity, restoring it from the cookie or rendering the login form if needed.
 
-    Parameters:
-    user_list (DataFrame, optional): DataFrame containing user credentials.
-    Defaults to querying the database.
+        Parameters:
+        form_name (str): The title of the login form.
+        location (str): Where to render the form, "main" or "sidebar".
+
+        Returns:
+        tuple: The user's name, the authentication status (None: no credentials entered,
+            False: incorrect credentials, True: authenticated) and the username (email).
+        """
+        if location not in ("main", "sidebar"):
+            raise ValueError("Location must be one of 'main' or 'sidebar'")
+
+        if not st.session_state["authentication_status"]:
+            if st.session_state["logout"] or not self.restore_from_cookie():
+                login_form = st.form("Login") if location == "main" else st.sidebar.form("Login")
+                login_form.subheader(form_name)
+                email = login_form.text_input("Username")
+                password = login_form.text_input("Password", type="password")
+                if login_form.form_submit_button("Login") and self.authenticate(email, password):
+                    st.rerun()
+
+        return st.session_state["name"], st.session_state["authentication_status"], st.session_state["username"]
+
+    def logout(self, button_name: str, location: str = "main") -> None:
+        """
+        Renders a logout button that clears the cookie and the session identity.
+        """
+        if location not in ("main", "sidebar"):
+            raise ValueError("Location must be one of 'main' or 'sidebar'")
+        container = st if location == "main" else st.sidebar
+        if container.button(button_name):
+            self.cookie_manager.delete(self.cookie_name)
+            for session_key in SESSION_KEYS:
+                st.session_state[session_key] = None
+            st.session_state["logout"] = True
+
+
+def user_authentication():
+    """
+    Handles user authentication.
 
     Returns:
     tuple: Contains the authenticated user's name,
         authentication status, username, and authenticator object.
     """
-    if user_list is None:
-        user_list = UserService.fetch_all_users()
-
-    usernames = []
-    names = []
-    hashed_passwords = []
-
-    for user in user_list:
-        usernames.append(user.email)
-        names.append(user.username)
-        hashed_passwords.append(user.password)
-
-    authenticator = stauth.Authenticate(
-        names,
-        usernames,
-        hashed_passwords,
-        ST_SECRET_KEY,
-        ST_SECRET_KEY,
-        cookie_expiry_days=30,
-    )
-
+    authenticator = AuthBackend(cookie_expiry_days=30)
     name, authentication_status, username = authenticator.login("Login", "main")
     return name, authentication_status, username, authenticator
 
@@ -56,6 +168,8 @@ def handle_authentication():
     """
     name, authentication_status, _, authenticator = user_authentication()
     if not authentication_status:
+        if authentication_status is False:
+            st.error("Username/password is incorrect")
         st.stop()
 
     st.sidebar.write(f"Welcome *{name}*!")
@@ -63,3 +177,15 @@ def handle_authentication():
 
     return name
 
+
+def get_current_user_id() -> Optional[UUID]:
+    """
+    Returns the id of the authenticated user, looking it up once per session for
+    cookies issued before the id was stored in the token.
+    """
+    if not st.session_state.get("authentication_status"):
+        return None
+    if st.session_state.get("user_id") is None:
+        user = UserService.get_user_by_email(st.session_state["username"])
+        st.session_state["user_id"] = str(user.id) if user else None
+    return UUID(st.session_state["user_id"]) if st.session_state["user_id"] else None
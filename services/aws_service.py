@@ -1,27 +1,92 @@
-# from typing import Union, Optional
-# import boto3
-# import config.config as cfg
-# import streamlit as st
-
-# # AWS credentials and S3 configuration
-# AWS_ACCESS_KEY = cfg.AWS_ACCESS_KEY
-# AWS_SECRET_KEY = cfg.AWS_SECRET_KEY
-# S3_BUCKET_NAME = cfg.S3_BUCKET_NAME
-
-# def upload_to_s3(file: Union[bytes, 'file-like object'], file_name: str) -> Optional[str]:
-#     """
-#     Uploads a file to an S3 bucket.
-    
-#     :param file: The file to upload (bytes or file-like object).
-#     :param file_name: The name of the file to be saved as in S3.
-#     :return: The URL of the uploaded file.
-#     """
-#     s3_client = boto3.client('s3', aws_access_key_id=AWS_ACCESS_KEY, aws_secret_access_key=AWS_SECRET_KEY)
-    
-#     try:
-#         s3_client.upload_fileobj(file, S3_BUCKET_NAME, file_name)
-#         s3_url = f"https://{S3_BUCKET_NAME}.s3.amazonaws.com/{file_name}"
-#         return s3_url
-#     except Exception as e:
-#         st.error(f"Failed to upload file to S3: {e}")
-#         return None
+"""
+This module stores document files in an S3 bucket (see services.storage_service).
+
+One boto3 client is shared by the process: clients are thread-safe, and the shared
+client keeps a pool of up to S3_MAX_POOL_CONNECTIONS HTTP connections that every
+request reuses. Uploads from S3_MULTIPART_THRESHOLD on are sent as multipart
+uploads, S3_MAX_CONCURRENCY parts at a time. Reads use ranged GETs and stream the
+response body. S3_ENDPOINT_URL points the client at an S3-compatible server such
+as MinIO, or at a moto server in tests.
+"""
+
+from functools import lru_cache
+from typing import IO, Iterator, Optional
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import ClientError
+import config.config as cfg
+from services.storage_service import BlobStorage
+
+# AWS credentials and S3 configuration
+AWS_ACCESS_KEY = cfg.AWS_ACCESS_KEY
+AWS_SECRET_KEY = cfg.AWS_SECRET_KEY
+S3_BUCKET_NAME = cfg.S3_BUCKET_NAME
+
+
+@lru_cache(maxsize=None)
+def get_s3_client():
+    """
+    Returns the process-wide S3 client.
+    """
+    return boto3.client(
+        's3',
+        aws_access_key_id=AWS_ACCESS_KEY,
+        aws_secret_access_key=AWS_SECRET_KEY,
+        endpoint_url=cfg.S3_ENDPOINT_URL,
+        region_name=cfg.S3_REGION,
+        config=Config(max_pool_connections=cfg.S3_MAX_POOL_CONNECTIONS, retries={'mode': 'standard'}),
+    )
+
+
+class S3Storage(BlobStorage):
+    """
+    Stores objects in an S3 bucket.
+    """
+
+    def __init__(self, bucket: str = S3_BUCKET_NAME, client=None):
+        self.bucket = bucket
+        self.client = client or get_s3_client()
+        self.transfer_config = TransferConfig(
+            multipart_threshold=cfg.S3_MULTIPART_THRESHOLD,
+            multipart_chunksize=cfg.S3_MULTIPART_CHUNKSIZE,
+            max_concurrency=cfg.S3_MAX_CONCURRENCY,
+        )
+
+    def put(self, stream: IO[bytes], key: str) -> None:
+        self.client.upload_fileobj(stream, self.bucket, key, Config=self.transfer_config)
+
+    def put_file(self, path: str, key: str) -> None:
+        # By path, multipart parts are read concurrently from the file
+        self.client.upload_file(path, self.bucket, key, Config=self.transfer_config)
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    def size(self, key: str) -> int:
+        return self.client.head_object(Bucket=self.bucket, Key=key)['ContentLength']
+
+    def stream(self, key: str, start: int = 0, end: Optional[int] = None, chunk_size: int = cfg.STORAGE_CHUNK_SIZE) -> Iterator[bytes]:
+        if end is not None and end <= start:
+            return
+        # HTTP byte ranges are inclusive; a whole-object read sends none, as empty objects have no satisfiable range
+        ranged = {} if start == 0 and end is None else {'Range': f"bytes={start}-{'' if end is None else end - 1}"}
+        body = self.client.get_object(Bucket=self.bucket, Key=key, **ranged)['Body']
+        try:
+            yield from body.iter_chunks(chunk_size)
+        finally:
+            body.close()
+
+    def url(self, key: str, expires_in: int = 3600) -> Optional[str]:
+        """
+        Returns a presigned URL of the object, so clients download it without going through the app.
+        """
+        return self.client.generate_presigned_url(
+            'get_object', Params={'Bucket': self.bucket, 'Key': key}, ExpiresIn=expires_in
+        )
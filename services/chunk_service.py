@@ -0,0 +1,93 @@
+"""
+This module splits stored document contents into page-aware retrieval chunks
+(DocumentChunk rows). Chunk vectors are filled in by the embedding backfill.
+
+    python -m services.chunk_service
+"""
+
+from typing import List, Optional
+from uuid import UUID
+from sqlalchemy import delete, exists, insert
+import config.config as cfg
+from database.models import Document, DocumentChunk, DocumentContent
+from database.session import get_db
+from utils.chunking import chunk_pages
+from utils.file_utils import split_pages
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class ChunkService:
+    @staticmethod
+    def chunk_documents(document_ids: List[UUID]) -> int:
+        """
+        (Re)builds the chunks of the given documents from their stored contents.
+
+        Args:
+            document_ids (List[UUID]): The documents to chunk.
+
+        Returns:
+            int: The number of chunks written.
+        """
+        with get_db() as db:
+            contents = (
+                db.query(DocumentContent.document_id, DocumentContent.raw_content)
+                .filter(DocumentContent.document_id.in_(document_ids))
+                .all()
+            )
+            rows = []
+            for content in contents:
+                for chunk in chunk_pages(split_pages(content.raw_content), cfg.CHUNK_MAX_TOKENS, cfg.CHUNK_OVERLAP_TOKENS):
+                    rows.append({
+                        "document_id": content.document_id,
+                        "ordinal": chunk.ordinal,
+                        "text": chunk.text,
+                        "token_count": chunk.token_count,
+                        "page_start": chunk.page_start,
+                        "page_end": chunk.page_end,
+                    })
+            db.execute(delete(DocumentChunk).where(DocumentChunk.document_id.in_(document_ids)))
+            if rows:
+                db.execute(insert(DocumentChunk), rows)
+            db.commit()
+            return len(rows)
+
+    @staticmethod
+    def backfill(batch_size: int = cfg.EMBEDDING_BACKFILL_BATCH_SIZE, max_batches: Optional[int] = None) -> int:
+        """
+        Chunks documents that have contents but no chunks yet, batch by batch.
+
+        Args:
+            batch_size (int): The number of documents chunked per batch.
+            max_batches (Optional[int]): Stop after this many batches; None runs until done.
+
+        Returns:
+            int: The number of chunks written.
+        """
+        written = 0
+        batches = 0
+        last_id: Optional[UUID] = None
+        while max_batches is None or batches < max_batches:
+            with get_db() as db:
+                query = db.query(Document.id).filter(
+                    exists().where(DocumentContent.document_id == Document.id),
+                    ~exists().where(DocumentChunk.document_id == Document.id),
+                )
+                if last_id is not None:
+                    query = query.filter(Document.id > last_id)
+                document_ids = [row.id for row in query.order_by(Document.id).limit(batch_size).all()]
+            if not document_ids:
+                break
+            last_id = document_ids[-1]
+            batches += 1
+            try:
+                written += ChunkService.chunk_documents(document_ids)
+                logger.info("Chunk backfill: batch %s done, %s chunks written.", batches, written)
+            except Exception as e:
+                logger.error("Chunk backfill batch %s failed: %s", batches, e)
+        return written
+
+
+if __name__ == "__main__":
+    ChunkService.backfill()
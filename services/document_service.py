@@ -1,9 +1,76 @@
-from typing import List, Optional
-from database.models import Document, DocumentContent, Tag
+import csv
+import time
+from dataclasses import dataclass
+from typing import IO, Any, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+from sqlalchemy import bindparam, cast, delete, exists, func, insert, select, tuple_
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.orm import defer, selectinload
+import config.config as cfg
+from database.models import Document, DocumentContent, Tag, document_tags, user_visible_tags
 from database.session import get_db
-from uuid import UUID
+from services.near_duplicate_service import NearDuplicateService
+from utils import minhash
+from uuid import UUID, uuid4
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+# Orderings supported by the keyset listing; each is backed by a (column, id) index
+LISTING_ORDERS = {"created_at": Document.created_at, "file_name": Document.file_name}
+
+# Columns written by export_documents_csv
+EXPORT_COLUMNS = ("id", "file_name", "start_date", "end_date", "description", "file_path", "content_hash", "created_at")
+
+
+@dataclass
+class DocumentPage:
+    """
+    One page of a keyset-paginated listing. next_cursor is passed as `after` to fetch the
+    following page and is None on the last page.
+    """
+    documents: List[Document]
+    next_cursor: Optional[Tuple[Any, UUID]]
+
+
+@dataclass
+class BulkResult:
+    """
+    The outcome of a bulk document operation: rows affected and wall-clock seconds.
+    """
+    rows: int
+    seconds: float
+
+
+def _id_array(ids: Sequence[UUID]):
+    """
+    Binds a list of ids as one uuid[] parameter, so statements stay the same size however many ids there are.
+    """
+    array_type = ARRAY(PG_UUID(as_uuid=True))
+    return func.unnest(cast(bindparam(None, list(ids), type_=array_type), array_type)).table_valued("id").render_derived()
+
 
 class DocumentService:
+    @staticmethod
+    def visibility_filter(user_id: UUID):
+        """
+        Returns a filter on Document matching the documents the user may see, i.e. those carrying
+        a tag of the user's group. It is a single semi-join against the trigger-maintained
+        user_visible_tags table, served by the document_tags and user_visible_tags primary keys.
+
+        Parameters:
+        user_id (UUID): The ID of the user.
+
+        Returns:
+        A SQLAlchemy EXISTS clause.
+        """
+        return exists().where(
+            document_tags.c.document_id == Document.id,
+            user_visible_tags.c.tag_id == document_tags.c.tag_id,
+            user_visible_tags.c.user_id == user_id,
+        )
+
     @staticmethod
     def create_document(title: str, content: str, file_extension: str, tags: Optional[List[UUID]] = None, document_metadata: Optional[str] = None) -> Document:
         """
@@ -32,29 +99,133 @@ class DocumentService:
             return new_document
 
     @staticmethod
-    def fetch_all_documents() -> List[Document]:
+    def fetch_all_documents(user_id: Optional[UUID] = None) -> List[Document]:
         """
         Retrieves all documents from the database.
 
+        Parameters:
+        user_id (Optional[UUID]): Only return documents visible to this user.
+
         Returns:
         List[Document]: A list of Document objects.
         """
+        return list(DocumentService.iter_documents("file_name", user_id=user_id))
+
+    @staticmethod
+    def _listing_query(db, order_by: str, user_id: Optional[UUID], tag_ids: Optional[List[UUID]]):
+        if order_by not in LISTING_ORDERS:
+            raise ValueError(f"Unknown document ordering '{order_by}', expected one of {sorted(LISTING_ORDERS)}.")
+        # Listings never need the embedding, which is by far the widest column
+        query = db.query(Document).options(defer(Document.description_vector))
+        if user_id is not None:
+            query = query.filter(DocumentService.visibility_filter(user_id))
+        if tag_ids:
+            query = query.filter(exists().where(document_tags.c.document_id == Document.id, document_tags.c.tag_id.in_(tag_ids)))
+        return query
+
+    @staticmethod
+    def list_documents(
+        order_by: str = "created_at",
+        descending: bool = False,
+        after: Optional[Tuple[Any, UUID]] = None,
+        limit: int = cfg.DOCUMENT_PAGE_SIZE,
+        user_id: Optional[UUID] = None,
+        tag_ids: Optional[List[UUID]] = None) -> DocumentPage:
+        """
+        Returns one page of documents using keyset pagination, so every page costs the same
+        index range scan however deep into the listing it is.
+
+        Parameters:
+        order_by (str): "created_at" or "file_name"; ties are broken by id.
+        descending (bool): List newest (or Z-A) first.
+        after (Optional[Tuple[Any, UUID]]): The next_cursor of the previous page; None for the first page.
+        limit (int): The page size.
+        user_id (Optional[UUID]): Only list documents visible to this user.
+        tag_ids (Optional[List[UUID]]): Only list documents carrying any of these tags.
+
+        Returns:
+        DocumentPage: The documents and the cursor of the next page.
+        """
+        with get_db() as db:
+            query = DocumentService._listing_query(db, order_by, user_id, tag_ids)
+            column = LISTING_ORDERS[order_by]
+            if after is not None:
+                key = tuple_(column, Document.id)
+                query = query.filter(key < tuple_(*after) if descending else key > tuple_(*after))
+            if descending:
+                query = query.order_by(column.desc(), Document.id.desc())
+            else:
+                query = query.order_by(column, Document.id)
+            # One extra row tells whether there is a next page
+            documents = query.limit(limit + 1).all()
+        if len(documents) <= limit:
+            return DocumentPage(documents, None)
+        documents = documents[:limit]
+        last = documents[-1]
+        return DocumentPage(documents, (getattr(last, order_by), last.id))
+
+    @staticmethod
+    def iter_documents(
+        order_by: str = "created_at",
+        batch_size: int = cfg.DOCUMENT_STREAM_BATCH_SIZE,
+        user_id: Optional[UUID] = None,
+        tag_ids: Optional[List[UUID]] = None) -> Iterator[Document]:
+        """
+        Streams all documents through a server-side cursor, batch_size rows at a time, so
+        memory use does not grow with the table. The session stays open until the
+        iterator is exhausted or closed.
+
+        Parameters:
+        order_by (str): "created_at" or "file_name"; ties are broken by id.
+        batch_size (int): The number of rows fetched per round trip.
+        user_id (Optional[UUID]): Only yield documents visible to this user.
+        tag_ids (Optional[List[UUID]]): Only yield documents carrying any of these tags.
+
+        Returns:
+        Iterator[Document]: The documents in order.
+        """
         with get_db() as db:
-            return db.query(Document).order_by(Document.title).all()
+            query = DocumentService._listing_query(db, order_by, user_id, tag_ids)
+            yield from query.order_by(LISTING_ORDERS[order_by], Document.id).yield_per(batch_size)
+
+    @staticmethod
+    def export_documents_csv(fileobj: IO[str], user_id: Optional[UUID] = None, tag_ids: Optional[List[UUID]] = None) -> int:
+        """
+        Writes the documents as CSV (EXPORT_COLUMNS) to a text file, streaming from the database.
+
+        Parameters:
+        fileobj (IO[str]): The file to write to.
+        user_id (Optional[UUID]): Only export documents visible to this user.
+        tag_ids (Optional[List[UUID]]): Only export documents carrying any of these tags.
+
+        Returns:
+        int: The number of documents written.
+        """
+        writer = csv.writer(fileobj)
+        writer.writerow(EXPORT_COLUMNS)
+        count = 0
+        for document in DocumentService.iter_documents(user_id=user_id, tag_ids=tag_ids):
+            writer.writerow([getattr(document, column) for column in EXPORT_COLUMNS])
+            count += 1
+        return count
 
     @staticmethod
-    def get_document_by_id(document_id: UUID) -> Optional[Document]:
+    def get_document_by_id(document_id: UUID, user_id: Optional[UUID] = None) -> Optional[Document]:
         """
         Retrieves a document by its ID.
 
         Parameters:
         document_id (UUID): The ID of the document to retrieve.
+        user_id (Optional[UUID]): Only return the document if it is visible to this user.
 
         Returns:
         Optional[Document]: The Document object if found, otherwise None.
         """
         with get_db() as db:
-            return db.query(Document).filter(Document.id == document_id).first()
+            query = db.query(Document).options(selectinload(Document.tags)).filter(Document.id == document_id)
+            if user_id is not None:
+                query = query.filter(DocumentService.visibility_filter(user_id))
+            return query.first()
 
     @staticmethod
     def update_document(document_id: UUID, title: Optional[str] = None, content: Optional[str] = None, tags: Optional[List[UUID]] = None) -> Optional[Document]:
@@ -105,15 +276,7 @@ class DocumentService:
         Returns:
         bool: True if the document was deleted, otherwise False.
         """
-        with get_db() as db:
-            document = db.query(Document).filter(Document.id == document_id).first()
-            if document:
-                # Delete associated content
-                db.query(DocumentContent).filter(DocumentContent.document_id == document_id).delete()
-                db.delete(document)
-                db.commit()
-                return True
-            return False
+        return DocumentService.bulk_delete_documents([document_id]).rows > 0
 
     @staticmethod
     def get_document_by_hash(content_hash: str) -> Optional[Document]:
@@ -125,3 +288,144 @@ class DocumentService:
         with get_db() as db:
             document = db.query(Document).filter(Document.content_hash == content_hash).first()
             return document is not None
+
+    @staticmethod
+    def get_document_id_by_hash(content_hash: str) -> Optional[UUID]:
+        """
+        Returns the id of the document with the given content hash, or None.
+        """
+        with get_db() as db:
+            return db.execute(select(Document.id).where(Document.content_hash == content_hash)).scalar()
+
+    @staticmethod
+    def get_existing_hashes(content_hashes: Iterable[str]) -> Set[str]:
+        """
+        Returns the subset of the given content hashes that already exist in the database.
+
+        Parameters:
+        content_hashes (Iterable[str]): The SHA-256 content hashes to look up.
+
+        Returns:
+        Set[str]: The content hashes that are already stored.
+        """
+        content_hashes = list(content_hashes)
+        if not content_hashes:
+            return set()
+        with get_db() as db:
+            rows = db.query(Document.content_hash).filter(Document.content_hash.in_(content_hashes)).all()
+            return {row.content_hash for row in rows}
+
+    @staticmethod
+    def bulk_create_documents(records: List[dict], tag_ids: Optional[List[UUID]] = None) -> BulkResult:
+        """
+        Creates many documents, their contents and tag links in a single transaction.
+
+        Each record holds the Document columns (file_name, start_date, end_date,
+        description, file_path, document_metadata, content_hash) plus the
+        DocumentContent columns raw_content and file_extension, and optionally the
+        precomputed minhash_signature of raw_content. Records whose content_hash is
+        already stored are skipped (INSERT ... ON CONFLICT DO NOTHING). When near-duplicate
+        detection is enabled, the signatures of the created documents are stored too.
+
+        Parameters:
+        records (List[dict]): The documents to create.
+        tag_ids (Optional[List[UUID]]): Tags to attach to every created document.
+
+        Returns:
+        BulkResult: The number of documents created and the time taken.
+        """
+        started = time.monotonic()
+        if not records:
+            return BulkResult(0, 0.0)
+        documents = []
+        contents = {}
+        signatures = {}
+        for record in records:
+            record = dict(record)
+            signatures[record["content_hash"]] = record.pop("minhash_signature", None)
+            contents[record["content_hash"]] = {
+                "raw_content": record.pop("raw_content"),
+                "file_extension": record.pop("file_extension"),
+            }
+            documents.append({"id": uuid4(), **record})
+        with get_db() as db:
+            created = db.execute(
+                pg_insert(Document).on_conflict_do_nothing(index_elements=[Document.content_hash])
+                .returning(Document.id, Document.content_hash),
+                documents,
+            ).all()
+            if created:
+                db.execute(insert(DocumentContent), [{"document_id": row.id, **contents[row.content_hash]} for row in created])
+                if tag_ids:
+                    db.execute(insert(document_tags), [{"document_id": row.id, "tag_id": tag_id} for row in created for tag_id in tag_ids])
+                if cfg.NEAR_DUPLICATE_ENABLED:
+                    NearDuplicateService.store_signatures(db, {
+                        row.id: signatures[row.content_hash] or minhash.signature(contents[row.content_hash]["raw_content"])
+                        for row in created
+                    })
+            db.commit()
+        result = BulkResult(len(created), time.monotonic() - started)
+        logger.info("Bulk created %s of %s documents in %.2fs.", result.rows, len(records), result.seconds)
+        return result
+
+    @staticmethod
+    def bulk_retag(document_ids: List[UUID], add_tag_ids: Sequence[UUID] = (), remove_tag_ids: Sequence[UUID] = (), replace: bool = False) -> BulkResult:
+        """
+        Adds and removes tags on many documents in a single transaction.
+
+        Parameters:
+        document_ids (List[UUID]): The documents to retag.
+        add_tag_ids (Sequence[UUID]): Tags to attach; existing links are kept as they are.
+        remove_tag_ids (Sequence[UUID]): Tags to detach.
+        replace (bool): Detach every tag not in add_tag_ids, so the documents end up with exactly those tags.
+
+        Returns:
+        BulkResult: The number of tag links inserted plus deleted and the time taken.
+        """
+        started = time.monotonic()
+        rows = 0
+        if document_ids:
+            ids = _id_array(document_ids)
+            with get_db() as db:
+                if replace or remove_tag_ids:
+                    condition = ~document_tags.c.tag_id.in_(list(add_tag_ids)) if replace else document_tags.c.tag_id.in_(list(remove_tag_ids))
+                    rows += db.execute(
+                        delete(document_tags).where(document_tags.c.document_id == ids.c.id, condition)
+                    ).rowcount
+                if add_tag_ids:
+                    rows += db.execute(
+                        pg_insert(document_tags)
+                        .from_select(
+                            ["document_id", "tag_id"],
+                            select(Document.id, Tag.id).join(ids, ids.c.id == Document.id).where(Tag.id.in_(list(add_tag_ids))),
+                        )
+                        .on_conflict_do_nothing()
+                    ).rowcount
+                db.commit()
+        result = BulkResult(rows, time.monotonic() - started)
+        logger.info("Bulk retagged %s documents (%s tag links changed) in %.2fs.", len(document_ids), result.rows, result.seconds)
+        return result
+
+    @staticmethod
+    def bulk_delete_documents(document_ids: List[UUID]) -> BulkResult:
+        """
+        Deletes many documents in a single transaction with DELETE ... USING. Contents are
+        deleted in the same transaction; chunks and tag links go through ON DELETE CASCADE.
+
+        Parameters:
+        document_ids (List[UUID]): The documents to delete.
+
+        Returns:
+        BulkResult: The number of documents deleted and the time taken.
+        """
+        started = time.monotonic()
+        rows = 0
+        if document_ids:
+            with get_db() as db:
+                ids = _id_array(document_ids)
+                db.execute(delete(DocumentContent).where(DocumentContent.document_id == ids.c.id))
+                rows = db.execute(delete(Document).where(Document.id == ids.c.id)).rowcount
+                db.commit()
+        result = BulkResult(rows, time.monotonic() - started)
+        logger.info("Bulk deleted %s documents in %.2fs.", result.rows, result.seconds)
+        return result
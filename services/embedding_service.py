@@ -0,0 +1,298 @@
+"""
+This module provides the embedding pipeline that fills Document.description_vector
+and DocumentContent.vector. Texts are chunked to the embedding model's token limit,
+identical chunks are embedded once, many chunks are sent per API request through
+the rate-limited AsyncOpenAIClient, and the resulting vectors are written back with
+a single bulk UPDATE per batch.
+
+Retrieval chunks (DocumentChunk) are embedded one vector per chunk.
+
+Rows without a vector are picked up by the backfill, which can run once from the
+command line or continuously in a background thread. Blank descriptions, contents
+and chunks have nothing to embed; they keep a NULL vector and the backfill skips them.
+
+    python -m services.embedding_service
+"""
+
+import asyncio
+import hashlib
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+from uuid import UUID
+import numpy as np
+from sqlalchemy import text
+import config.config as cfg
+from database.models import Document, DocumentChunk, DocumentContent
+from database.session import get_db
+from services.chunk_service import ChunkService
+from services.openai_service import AsyncOpenAIClient, run_sync
+from utils.chunking import count_tokens, split_by_tokens
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Tables and vector columns the bulk writer is allowed to update
+VECTOR_COLUMNS = {
+    "documents": "description_vector",
+    "document_contents": "vector",
+    "document_chunks": "vector",
+}
+
+
+def _has_text(column):
+    """
+    SQL condition that a text column has a non-whitespace character, i.e. something to embed.
+    """
+    return column.op("~")(r"\S")
+
+
+def _to_vector_literal(vector: Sequence[float]) -> str:
+    return "[" + ",".join(f"{value:.8g}" for value in vector) + "]"
+
+
+class EmbeddingService:
+    @staticmethod
+    def embed_texts(texts: List[str]) -> List[List[float]]:
+        """
+        Embeds a list of texts, sending each distinct text once and batching many texts per request.
+
+        Args:
+            texts (List[str]): The texts to embed; each must fit the model's token limit.
+
+        Returns:
+            List[List[float]]: One vector per input text, in input order.
+        """
+        unique: Dict[str, str] = {}
+        for item in texts:
+            unique.setdefault(hashlib.sha256(item.encode("utf-8")).hexdigest(), item)
+
+        batches: List[List[Tuple[str, str]]] = [[]]
+        batch_tokens = 0
+        for digest, item in unique.items():
+            tokens = count_tokens(item)
+            if batches[-1] and (len(batches[-1]) >= cfg.EMBEDDING_BATCH_SIZE or batch_tokens + tokens > cfg.EMBEDDING_BATCH_TOKENS):
+                batches.append([])
+                batch_tokens = 0
+            batches[-1].append((digest, item))
+            batch_tokens += tokens
+
+        async def embed_batches() -> List[List[List[float]]]:
+            # Concurrent requests, paced by the client's shared rate limiter and retried on 429 and 5xx
+            client = AsyncOpenAIClient()
+            return await asyncio.gather(*(client.get_text_embeddings([item for _, item in batch]) for batch in batches if batch))
+
+        vectors: Dict[str, List[float]] = {}
+        for batch, embeddings in zip(batches, run_sync(embed_batches())):
+            vectors.update(zip((digest for digest, _ in batch), embeddings))
+
+        return [vectors[hashlib.sha256(item.encode("utf-8")).hexdigest()] for item in texts]
+
+    @staticmethod
+    def embed_documents_text(texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Embeds texts of arbitrary length. Long texts are split to the model's token limit
+        and their chunk vectors are averaged (weighted by token count) and re-normalised.
+
+        Args:
+            texts (List[str]): The texts to embed.
+
+        Returns:
+            List[Optional[List[float]]]: One vector per text, or None for blank texts.
+        """
+        chunked = [split_by_tokens(item, cfg.EMBEDDING_MAX_TOKENS) for item in texts]
+        flat = [chunk for chunks in chunked for chunk in chunks]
+        flat_vectors = iter(EmbeddingService.embed_texts(flat)) if flat else iter(())
+
+        results: List[Optional[List[float]]] = []
+        for chunks in chunked:
+            if not chunks:
+                results.append(None)
+                continue
+            matrix = np.array([next(flat_vectors) for _ in chunks], dtype=np.float32)
+            if len(chunks) == 1:
+                results.append(matrix[0].tolist())
+                continue
+            weights = np.array([count_tokens(chunk) for chunk in chunks], dtype=np.float32)
+            pooled = (matrix * weights[:, None]).sum(axis=0) / weights.sum()
+            results.append((pooled / np.linalg.norm(pooled)).tolist())
+        return results
+
+    @staticmethod
+    def write_vectors(table: str, rows: List[Tuple[UUID, Sequence[float]]]) -> int:
+        """
+        Writes many vectors back in one UPDATE ... FROM (VALUES ...) statement.
+
+        Args:
+            table (str): One of "documents", "document_contents" or "document_chunks".
+            rows (List[Tuple[UUID, Sequence[float]]]): (row id, vector) pairs.
+
+        Returns:
+            int: The number of rows updated.
+        """
+        if not rows:
+            return 0
+        column = VECTOR_COLUMNS[table]
+        values = ", ".join(f"(CAST(:id_{i} AS uuid), CAST(:vector_{i} AS vector))" for i in range(len(rows)))
+        params = {}
+        for i, (row_id, vector) in enumerate(rows):
+            params[f"id_{i}"] = str(row_id)
+            params[f"vector_{i}"] = _to_vector_literal(vector)
+        statement = text(
+            f"UPDATE {table} AS t SET {column} = v.vector "
+            f"FROM (VALUES {values}) AS v(id, vector) WHERE t.id = v.id"
+        )
+        with get_db() as db:
+            result = db.execute(statement, params)
+            db.commit()
+            return result.rowcount
+
+    @staticmethod
+    def embed_documents(document_ids: List[UUID]) -> int:
+        """
+        Embeds the descriptions and raw contents of the given documents and stores the vectors.
+
+        Args:
+            document_ids (List[UUID]): The documents to embed.
+
+        Returns:
+            int: The number of vectors written.
+        """
+        with get_db() as db:
+            documents = db.query(Document.id, Document.file_name, Document.description).filter(Document.id.in_(document_ids)).all()
+            contents = db.query(DocumentContent.id, DocumentContent.raw_content).filter(DocumentContent.document_id.in_(document_ids)).all()
+
+        # A vector of the file name alone says nothing about the document; blank descriptions keep none
+        description_texts = [f"{row.file_name}\n{row.description}" if (row.description or "").strip() else "" for row in documents]
+        written = 0
+        if documents:
+            vectors = EmbeddingService.embed_documents_text(description_texts)
+            written += EmbeddingService.write_vectors("documents", [(row.id, vector) for row, vector in zip(documents, vectors) if vector is not None])
+        if contents:
+            vectors = EmbeddingService.embed_documents_text([row.raw_content for row in contents])
+            written += EmbeddingService.write_vectors("document_contents", [(row.id, vector) for row, vector in zip(contents, vectors) if vector is not None])
+        return written
+
+    @staticmethod
+    def embed_chunks(chunk_ids: List[UUID]) -> int:
+        """
+        Embeds the given document chunks and stores their vectors.
+
+        Args:
+            chunk_ids (List[UUID]): The chunks to embed.
+
+        Returns:
+            int: The number of vectors written.
+        """
+        with get_db() as db:
+            chunks = db.query(DocumentChunk.id, DocumentChunk.text).filter(DocumentChunk.id.in_(chunk_ids)).all()
+        if not chunks:
+            return 0
+        vectors = EmbeddingService.embed_documents_text([row.text for row in chunks])
+        return EmbeddingService.write_vectors("document_chunks", [(row.id, vector) for row, vector in zip(chunks, vectors) if vector is not None])
+
+    @staticmethod
+    def backfill_chunks(batch_size: int = cfg.EMBEDDING_BATCH_SIZE, max_batches: Optional[int] = None, stop_event: Optional[threading.Event] = None) -> int:
+        """
+        Embeds document chunks that have no vector yet, batch by batch.
+
+        Args:
+            batch_size (int): The number of chunks embedded per batch.
+            max_batches (Optional[int]): Stop after this many batches; None runs until done.
+            stop_event (Optional[threading.Event]): Stop between batches once set.
+
+        Returns:
+            int: The number of vectors written.
+        """
+        written = 0
+        batches = 0
+        last_id: Optional[UUID] = None
+        while max_batches is None or batches < max_batches:
+            if stop_event is not None and stop_event.is_set():
+                break
+            with get_db() as db:
+                query = db.query(DocumentChunk.id).filter(DocumentChunk.vector.is_(None), _has_text(DocumentChunk.text))
+                if last_id is not None:
+                    query = query.filter(DocumentChunk.id > last_id)
+                chunk_ids = [row.id for row in query.order_by(DocumentChunk.id).limit(batch_size).all()]
+            if not chunk_ids:
+                break
+            last_id = chunk_ids[-1]
+            batches += 1
+            try:
+                written += EmbeddingService.embed_chunks(chunk_ids)
+                logger.info("Chunk embedding backfill: batch %s done, %s vectors written.", batches, written)
+            except Exception as e:
+                logger.error("Chunk embedding backfill batch %s failed: %s", batches, e)
+        return written
+
+    @staticmethod
+    def backfill(batch_size: int = cfg.EMBEDDING_BACKFILL_BATCH_SIZE, max_batches: Optional[int] = None, stop_event: Optional[threading.Event] = None) -> int:
+        """
+        Embeds documents that are missing a description or content vector, batch by batch,
+        then embeds any chunks without a vector.
+
+        Progress is committed after every batch, so the backfill can be interrupted and
+        resumed at any time. Documents that fail are skipped for the rest of the run.
+
+        Args:
+            batch_size (int): The number of documents embedded per batch.
+            max_batches (Optional[int]): Stop after this many batches; None runs until done.
+            stop_event (Optional[threading.Event]): Stop between batches once set.
+
+        Returns:
+            int: The number of vectors written.
+        """
+        written = 0
+        batches = 0
+        last_id: Optional[UUID] = None
+        while max_batches is None or batches < max_batches:
+            if stop_event is not None and stop_event.is_set():
+                break
+            with get_db() as db:
+                # Blank texts are never embedded, so selecting them would repeat them on every run
+                missing_content = db.query(DocumentContent.document_id).filter(
+                    DocumentContent.vector.is_(None), _has_text(DocumentContent.raw_content)
+                )
+                query = db.query(Document.id).filter(
+                    (Document.description_vector.is_(None) & _has_text(Document.description)) | Document.id.in_(missing_content)
+                )
+                if last_id is not None:
+                    query = query.filter(Document.id > last_id)
+                document_ids = [row.id for row in query.order_by(Document.id).limit(batch_size).all()]
+            if not document_ids:
+                break
+            last_id = document_ids[-1]
+            batches += 1
+            try:
+                written += EmbeddingService.embed_documents(document_ids)
+                logger.info("Embedding backfill: batch %s done, %s vectors written.", batches, written)
+            except Exception as e:
+                logger.error("Embedding backfill batch %s failed: %s", batches, e)
+        return written + EmbeddingService.backfill_chunks(stop_event=stop_event)
+
+    @staticmethod
+    def start_background_backfill(interval_seconds: float = 60.0) -> Tuple[threading.Thread, threading.Event]:
+        """
+        Runs the chunk and embedding backfills in a daemon thread, repeating every interval_seconds.
+
+        Returns:
+            Tuple[threading.Thread, threading.Event]: The thread and an event that stops it.
+        """
+        stop_event = threading.Event()
+
+        def run() -> None:
+            while not stop_event.is_set():
+                try:
+                    ChunkService.backfill()
+                    EmbeddingService.backfill(stop_event=stop_event)
+                except Exception as e:
+                    logger.error("Embedding backfill failed: %s", e)
+                stop_event.wait(interval_seconds)
+
+        thread = threading.Thread(target=run, name="embedding-backfill", daemon=True)
+        thread.start()
+        return thread, stop_event
+
+
+if __name__ == "__main__":
+    EmbeddingService.backfill()
@@ -0,0 +1,255 @@
+"""
+This module provides the bulk ingest pipeline used to load large folders of PDF
+files into the database. Text extraction runs in a process pool (scanned pages
+are rendered there too and transcribed by the OCR fallback), metadata
+extraction requests are sent to OpenAI concurrently with a bounded number of
+requests in flight, and documents are written in batches through DocumentService.
+
+Runs are resumable: files whose content hash is already stored are skipped, so a
+crashed run can simply be started again. Files whose text is a near-duplicate of a
+stored document are skipped before their metadata is requested.
+"""
+
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import config.config as cfg
+from services.chunk_service import ChunkService
+from services.document_service import DocumentService
+from services.embedding_service import EmbeddingService
+from services.metadata_cache import get_metadata_cache
+from services.near_duplicate_service import NearDuplicateService
+from services.openai_service import AsyncOpenAIClient, close_loop_client
+from services.ocr_service import OcrService
+from services.storage_service import get_storage
+from utils.file_utils import PAGE_SEPARATOR, extract_pages_from_pdf, generate_hash_from_bytes
+from utils import minhash
+from utils.logger import get_logger
+from utils.pdf_engine import RenderedPage, render_pdf_pages
+
+logger = get_logger(__name__)
+
+# Number of hashes checked against the database per query when resuming
+HASH_LOOKUP_CHUNK_SIZE = 1000
+
+
+def _hash_file(path: str) -> Tuple[str, str]:
+    """
+    Computes the SHA-256 content hash of a file. Runs in a worker process.
+    """
+    with open(path, "rb") as fileobj:
+        return path, generate_hash_from_bytes(fileobj)
+
+
+def _extract_file(path: str) -> List[str]:
+    """
+    Extracts the text of each page of a PDF file. Runs in a worker process, so pages are not fanned out again.
+    """
+    return extract_pages_from_pdf(path, workers=1)
+
+
+def _render_file(path: str, page_numbers: List[int]) -> List[RenderedPage]:
+    """
+    Renders pages of a PDF file for OCR. Runs in a worker process.
+    """
+    return render_pdf_pages(path, page_numbers, workers=1)
+
+
+def parse_metadata(raw_metadata: Optional[str]) -> Dict:
+    """
+    Parses the JSON returned by OpenAIClient.extract_document_metadata into
+    Document column values.
+
+    :param raw_metadata: The JSON string returned by the LLM.
+    :return: A dict with file_name, description, start_date, end_date and document_metadata.
+    """
+    metadata = json.loads(raw_metadata) if raw_metadata else {}
+
+    def _parse_date(value: Optional[str]) -> Optional[datetime]:
+        if not value:
+            return None
+        try:
+            return datetime.strptime(value, "%Y.%m.%d").replace(tzinfo=timezone.utc)
+        except (TypeError, ValueError):
+            return None
+
+    return {
+        "file_name": metadata.pop("filename", "") or "",
+        "description": metadata.pop("description", "") or "",
+        "start_date": _parse_date(metadata.pop("start_date", None)),
+        "end_date": _parse_date(metadata.pop("end_date", None)),
+        "document_metadata": metadata,
+    }
+
+
+class IngestService:
+    @staticmethod
+    def discover_pdfs(folder_path: str) -> List[str]:
+        """
+        Recursively lists the PDF files below a folder.
+
+        Args:
+            folder_path (str): The folder to scan.
+
+        Returns:
+            List[str]: The sorted paths of all PDF files found.
+        """
+        return sorted(str(path) for path in Path(folder_path).rglob("*") if path.is_file() and path.suffix.lower() == ".pdf")
+
+    @staticmethod
+    def filter_pending(paths: List[str], workers: int) -> List[Tuple[str, str]]:
+        """
+        Hashes the given files and drops those already stored or duplicated within the run.
+
+        Args:
+            paths (List[str]): The candidate file paths.
+            workers (int): The number of hashing processes.
+
+        Returns:
+            List[Tuple[str, str]]: (path, content_hash) pairs that still need ingesting.
+        """
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            hashed = list(pool.map(_hash_file, paths, chunksize=64))
+
+        pending = []
+        seen = set()
+        for start in range(0, len(hashed), HASH_LOOKUP_CHUNK_SIZE):
+            chunk = hashed[start:start + HASH_LOOKUP_CHUNK_SIZE]
+            existing = DocumentService.get_existing_hashes(content_hash for _, content_hash in chunk)
+            for path, content_hash in chunk:
+                if content_hash in existing or content_hash in seen:
+                    continue
+                seen.add(content_hash)
+                pending.append((path, content_hash))
+        return pending
+
+    @staticmethod
+    def ingest_folder(
+        folder_path: str,
+        workers: int = cfg.INGEST_WORKERS,
+        max_in_flight: int = cfg.INGEST_MAX_IN_FLIGHT,
+        batch_size: int = cfg.INGEST_BATCH_SIZE) -> Dict[str, int]:
+        """
+        Ingests every PDF below a folder into the database.
+
+        Args:
+            folder_path (str): The folder to ingest.
+            workers (int): The number of text extraction processes.
+            max_in_flight (int): The maximum number of concurrent OpenAI requests.
+            batch_size (int): The number of documents written per transaction.
+
+        Returns:
+            Dict[str, int]: Counters for discovered, skipped, written, failed and near-duplicate files,
+                plus chunks and vectors created.
+        """
+        started = time.monotonic()
+        paths = IngestService.discover_pdfs(folder_path)
+        pending = IngestService.filter_pending(paths, workers)
+        stats = {"discovered": len(paths), "skipped": len(paths) - len(pending), "written": 0, "failed": 0, "near_duplicates": 0}
+        logger.info("Found %s PDF files, %s to ingest, %s already done.", len(paths), len(pending), stats['skipped'])
+
+        if pending:
+            asyncio.run(IngestService._run_pipeline(pending, stats, workers, max_in_flight, batch_size))
+            stats["chunks"] = ChunkService.backfill()
+            stats["embedded"] = EmbeddingService.backfill()
+
+        logger.info("Ingest finished in %.1fs: %s", time.monotonic() - started, stats)
+        return stats
+
+    @staticmethod
+    async def _run_pipeline(pending: List[Tuple[str, str]], stats: Dict[str, int], workers: int, max_in_flight: int, batch_size: int) -> None:
+        loop = asyncio.get_running_loop()
+        client = AsyncOpenAIClient()
+        cache = get_metadata_cache()
+        storage = get_storage()
+        llm_slots = asyncio.Semaphore(max_in_flight)
+        # Bounds the number of files held in memory between extraction and the writer
+        file_slots = asyncio.Semaphore(workers + max_in_flight + batch_size)
+        records: asyncio.Queue = asyncio.Queue()
+
+        async def process(pool: ProcessPoolExecutor, path: str, content_hash: str) -> None:
+            try:
+                pages = await loop.run_in_executor(pool, _extract_file, path)
+                sparse = OcrService.low_density_pages(pages) if cfg.OCR_ENABLED else []
+                if sparse:
+                    rendered = await loop.run_in_executor(pool, _render_file, path, sparse)
+                    pages = OcrService.merge(pages, await OcrService.transcribe_async(rendered, client, llm_slots))
+                    logger.info("OCR transcribed %s of %s pages of %s.", len(sparse), len(pages), path)
+                text = PAGE_SEPARATOR.join(pages)
+                if not text.strip():
+                    raise ValueError("no text could be extracted")
+                signature = None
+                if cfg.NEAR_DUPLICATE_ENABLED:
+                    # Re-scans and re-exports of stored documents are skipped before any OpenAI call
+                    signature = await asyncio.to_thread(minhash.signature, text)
+                    duplicates = await asyncio.to_thread(NearDuplicateService.find_near_duplicates, signature) if signature else []
+                    if duplicates:
+                        stats["near_duplicates"] += 1
+                        file_slots.release()
+                        logger.info(
+                            "Skipping %s: near-duplicate of '%s' (similarity %.2f).",
+                            path, duplicates[0].file_name, duplicates[0].similarity,
+                        )
+                        return
+                raw_metadata = cache.get(content_hash)
+                if raw_metadata is None:
+                    async with llm_slots:
+                        raw_metadata = await client.extract_document_metadata(text)
+                    if raw_metadata is None:
+                        raise ValueError("metadata extraction failed")
+                    cache.set(content_hash, raw_metadata)
+                record = parse_metadata(raw_metadata)
+                record["file_name"] = record["file_name"] or Path(path).stem
+                record["start_date"] = record["start_date"] or datetime.fromtimestamp(os.path.getmtime(path), tz=timezone.utc)
+                # Content-addressed, so a file stored by an interrupted run is not uploaded again
+                file_path = await asyncio.to_thread(storage.store_file, path, content_hash)
+                record.update(
+                    file_path=file_path,
+                    content_hash=content_hash,
+                    raw_content=text,
+                    file_extension=Path(path).suffix.lstrip(".").lower(),
+                    minhash_signature=signature,
+                )
+                await records.put(record)
+            except Exception as e:
+                stats["failed"] += 1
+                file_slots.release()
+                logger.error("Error ingesting %s: %s", path, e)
+
+        async def write_batches() -> None:
+            batch = []
+            while True:
+                record = await records.get()
+                if record is not None:
+                    batch.append(record)
+                if batch and (record is None or len(batch) >= batch_size):
+                    try:
+                        stats["written"] += (await asyncio.to_thread(DocumentService.bulk_create_documents, batch)).rows
+                        logger.info("Wrote %s documents (%s total).", len(batch), stats['written'])
+                    except Exception as e:
+                        stats["failed"] += len(batch)
+                        logger.error("Error writing batch of %s documents: %s", len(batch), e)
+                    for _ in batch:
+                        file_slots.release()
+                    batch = []
+                if record is None:
+                    return
+
+        writer = asyncio.create_task(write_batches())
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                tasks = []
+                for path, content_hash in pending:
+                    await file_slots.acquire()
+                    tasks.append(asyncio.create_task(process(pool, path, content_hash)))
+                await asyncio.gather(*tasks)
+            await records.put(None)
+            await writer
+        finally:
+            # Each ingest runs on a new loop, so its OpenAI connections are closed with it
+            await close_loop_client()
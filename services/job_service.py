@@ -0,0 +1,447 @@
+"""
+This module provides the Postgres-backed job queue of the document pipeline. A job
+takes one uploaded file through the stages
+
+    extract   text extraction with the OCR fallback, and the near-duplicate check
+    metadata  metadata extraction by the LLM (served from the metadata cache on repeats)
+    store     the file is put in the blob storage; the document, its contents and tags are written
+    embed     chunks and vectors of the document are computed
+
+Each stage commits its output to the job row before the next one is queued, so a
+retry resumes at the stage that failed and never repeats finished work. While a
+stage runs, the worker refreshes the job's lock every JOB_HEARTBEAT_INTERVAL
+seconds; a job whose lock goes stale (its worker died) is queued again, or failed
+once it has used up JOB_MAX_ATTEMPTS, so a file that kills workers is not retried
+forever. Workers
+claim jobs with SELECT ... FOR UPDATE SKIP LOCKED, so any number of worker
+processes on any number of nodes can share the queue (see worker.py). Jobs are
+keyed by content hash: enqueueing a file again returns its existing job.
+
+Uploads that are reviewed by the user stop after the metadata stage with status
+awaiting_review; submit_review queues the store stage with the confirmed values.
+
+Uploaded files are spooled to JOB_SPOOL_DIR until the store stage has put them in
+the blob storage, and are then removed. So are those of jobs stopped as
+near-duplicates or failed for good, and those of jobs left waiting for longer than
+JOB_ABANDONED_AFTER; uploading the file again (or passing a new source_path to
+retry and process_duplicate) brings the job its file back. Files queued from
+elsewhere (enqueue_file) are never removed.
+"""
+
+import json
+import os
+import socket
+import time
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+from uuid import UUID
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import defer, undefer
+import config.config as cfg
+from database.models import DocumentChunk, Job
+from database.session import get_db
+from services.chunk_service import ChunkService
+from services.document_service import DocumentService
+from services.embedding_service import EmbeddingService
+from services.ingest_service import parse_metadata
+from services.metadata_cache import get_metadata_cache
+from services.near_duplicate_service import NearDuplicateService
+from services.ocr_service import OcrService
+from services.openai_service import OpenAIClient
+from services.storage_service import get_storage, object_key
+from utils.file_utils import PAGE_SEPARATOR, generate_hash_from_bytes
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+STAGES = ("extract", "metadata", "store", "embed")
+
+# Statuses in which a job waits for a worker or is being processed
+ACTIVE_STATUSES = ("queued", "running")
+
+# Statuses in which a job waits for the user, whose spooled files are removed once abandoned
+WAITING_STATUSES = ("awaiting_review", "duplicate", "failed")
+
+
+def _parse_review_date(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _remove_spooled(source_path: str) -> bool:
+    """
+    Removes a file of the spool directory; files queued from anywhere else are left alone.
+    """
+    if os.path.dirname(os.path.abspath(source_path)) != os.path.abspath(cfg.JOB_SPOOL_DIR):
+        return False
+    try:
+        os.remove(source_path)
+    except FileNotFoundError:
+        return False
+    logger.debug("Removed spooled file %s.", source_path)
+    return True
+
+
+class JobService:
+    @staticmethod
+    def enqueue(content_hash: str, file_name: str, source_path: str, review: bool = False) -> Job:
+        """
+        Queues a file for the pipeline, or returns the existing job of the same content.
+        A failed job is queued again from the stage that failed, and a done job whose
+        document has since been deleted (its document_id is set to NULL) starts over.
+
+        Args:
+            content_hash (str): The SHA-256 of the file.
+            file_name (str): The original file name.
+            source_path (str): Where the workers read the file from.
+            review (bool): Stop after the metadata stage until submit_review is called.
+
+        Returns:
+            Job: The job of the file.
+        """
+        with get_db() as db:
+            db.execute(
+                pg_insert(Job)
+                .values(content_hash=content_hash, file_name=file_name, source_path=source_path, review=review)
+                .on_conflict_do_nothing(index_elements=[Job.content_hash])
+            )
+            db.execute(
+                update(Job)
+                .where(Job.content_hash == content_hash, Job.status == "failed")
+                .values(source_path=source_path, status="queued", attempts=0, error=None, run_after=func.now())
+            )
+            db.execute(
+                update(Job)
+                .where(Job.content_hash == content_hash, Job.status == "done", Job.document_id.is_(None))
+                .values(
+                    file_name=file_name, source_path=source_path, review=review, stage=STAGES[0], status="queued",
+                    attempts=0, result=None, review_data=None, error=None, run_after=func.now(),
+                )
+            )
+            db.commit()
+            return db.execute(select(Job).options(defer(Job.text)).where(Job.content_hash == content_hash)).scalar_one()
+
+    @staticmethod
+    def enqueue_file(path: str, review: bool = False) -> Job:
+        """
+        Hashes a file readable by the workers and queues it.
+        """
+        with open(path, "rb") as fileobj:
+            content_hash = generate_hash_from_bytes(fileobj)
+        return JobService.enqueue(content_hash, Path(path).name, os.path.abspath(path), review)
+
+    @staticmethod
+    def get_job(job_id: UUID, with_text: bool = False) -> Optional[Job]:
+        """
+        Returns the job, loading the extracted text only if asked to.
+        """
+        with get_db() as db:
+            query = select(Job).where(Job.id == job_id).options(undefer(Job.text) if with_text else defer(Job.text))
+            return db.execute(query).scalar_one_or_none()
+
+    @staticmethod
+    def list_jobs(limit: int = 50, statuses: Optional[Sequence[str]] = None) -> List[Job]:
+        """
+        Returns the most recently created jobs, without their extracted text.
+        """
+        with get_db() as db:
+            query = select(Job).options(defer(Job.text)).order_by(Job.created_at.desc()).limit(limit)
+            if statuses:
+                query = query.where(Job.status.in_(list(statuses)))
+            return list(db.execute(query).scalars())
+
+    @staticmethod
+    def status_counts() -> Dict[str, int]:
+        """
+        Returns the number of jobs per status.
+        """
+        with get_db() as db:
+            return dict(db.execute(select(Job.status, func.count()).group_by(Job.status)).all())
+
+    @staticmethod
+    def _transition(job_id: UUID, from_statuses: Sequence[str], **values) -> bool:
+        with get_db() as db:
+            changed = db.execute(
+                update(Job).where(Job.id == job_id, Job.status.in_(list(from_statuses))).values(**values)
+            ).rowcount
+            db.commit()
+            return changed > 0
+
+    @staticmethod
+    def submit_review(job_id: UUID, review_data: dict) -> bool:
+        """
+        Queues the store stage of a reviewed job with the values confirmed by the user.
+
+        Args:
+            job_id (UUID): The job awaiting review.
+            review_data (dict): Any of file_name, description, start_date and end_date (ISO
+                dates), file_extension, document_metadata and tag_ids (strings).
+
+        Returns:
+            bool: False if the job was not awaiting review.
+        """
+        return JobService._transition(
+            job_id, ["awaiting_review"],
+            review_data=review_data, stage="store", status="queued", attempts=0, run_after=func.now(),
+        )
+
+    @staticmethod
+    def process_duplicate(job_id: UUID, source_path: Optional[str] = None) -> bool:
+        """
+        Continues a job stopped as a near-duplicate with the metadata stage, reading the file
+        from source_path if given (its spooled file was removed when it stopped).
+        """
+        values = {"source_path": source_path} if source_path else {}
+        return JobService._transition(job_id, ["duplicate"], stage="metadata", status="queued", attempts=0, run_after=func.now(), **values)
+
+    @staticmethod
+    def retry(job_id: UUID, source_path: Optional[str] = None) -> bool:
+        """
+        Queues a failed job again from the stage that failed, reading the file from source_path
+        if given (its spooled file was removed when it failed).
+        """
+        values = {"source_path": source_path} if source_path else {}
+        return JobService._transition(job_id, ["failed"], status="queued", attempts=0, error=None, run_after=func.now(), **values)
+
+    @staticmethod
+    def claim(worker: str, stages: Sequence[str] = STAGES) -> Optional[Job]:
+        """
+        Claims the next due queued job of the given stages, skipping jobs locked by other workers.
+
+        Returns:
+            Optional[Job]: The claimed job, now running, or None if there is none.
+        """
+        next_job = (
+            select(Job.id)
+            .where(Job.status == "queued", Job.run_after <= func.now(), Job.stage.in_(list(stages)))
+            .order_by(Job.run_after)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        with get_db() as db:
+            job_id = db.execute(
+                update(Job)
+                .where(Job.id == next_job)
+                .values(status="running", worker=worker, locked_at=func.now(), attempts=Job.attempts + 1)
+                .returning(Job.id)
+            ).scalar()
+            db.commit()
+        return JobService.get_job(job_id, with_text=True) if job_id else None
+
+    @staticmethod
+    def requeue_stale(timeout_seconds: int = cfg.JOB_LOCK_TIMEOUT) -> int:
+        """
+        Queues again the jobs whose lock has not been refreshed for longer than the timeout (their
+        worker died), and fails those that have used up their attempts.
+
+        Returns:
+            int: The number of jobs queued again.
+        """
+        stale = (Job.status == "running", Job.locked_at < func.now() - timedelta(seconds=timeout_seconds))
+        with get_db() as db:
+            failed = db.execute(
+                update(Job)
+                .where(*stale, Job.attempts >= cfg.JOB_MAX_ATTEMPTS)
+                .values(status="failed", worker=None, locked_at=None, error="The worker died on every attempt.")
+                .returning(Job.id, Job.source_path)
+            ).all()
+            requeued = db.execute(
+                update(Job).where(*stale).values(status="queued", worker=None, locked_at=None, run_after=func.now())
+            ).rowcount
+            db.commit()
+        for job_id, source_path in failed:
+            logger.error("Job %s failed: its worker died on each of %d attempts.", job_id, cfg.JOB_MAX_ATTEMPTS)
+            _remove_spooled(source_path)
+        if requeued:
+            logger.warning("Requeued %d jobs not heard of for %ds.", requeued, timeout_seconds)
+        return requeued
+
+    @staticmethod
+    def heartbeat(job_id: UUID, worker: str) -> bool:
+        """
+        Refreshes the lock of a job the worker is running, so requeue_stale leaves it alone.
+
+        Returns:
+            bool: False if the job is no longer running on this worker.
+        """
+        with get_db() as db:
+            refreshed = db.execute(
+                update(Job).where(Job.id == job_id, Job.status == "running", Job.worker == worker).values(locked_at=func.now())
+            ).rowcount
+            db.commit()
+            return refreshed > 0
+
+    @staticmethod
+    def remove_abandoned_files(max_age_seconds: int = cfg.JOB_ABANDONED_AFTER) -> int:
+        """
+        Removes the spooled files of jobs that have waited for the user for longer than max_age_seconds.
+
+        Returns:
+            int: The number of files removed.
+        """
+        with get_db() as db:
+            source_paths = db.execute(
+                select(Job.source_path)
+                .where(Job.status.in_(WAITING_STATUSES), Job.updated_at < func.now() - timedelta(seconds=max_age_seconds))
+            ).scalars().all()
+        removed = sum(_remove_spooled(source_path) for source_path in source_paths)
+        if removed:
+            logger.info("Removed %d spooled files of abandoned jobs.", removed)
+        return removed
+
+    @staticmethod
+    def _finish_stage(job: Job, **values) -> None:
+        """
+        Stores the output of the job's current stage and queues the next one, unless values set the status.
+        """
+        if "status" not in values:
+            values.update(stage=STAGES[STAGES.index(job.stage) + 1], status="queued", attempts=0)
+        JobService._transition(job.id, ["running"], worker=None, locked_at=None, error=None, run_after=func.now(), **values)
+
+    @staticmethod
+    def _fail(job: Job, error: Exception) -> None:
+        if job.attempts < cfg.JOB_MAX_ATTEMPTS:
+            delay = cfg.JOB_RETRY_BACKOFF * 2 ** (job.attempts - 1)
+            logger.warning("Job %s failed at %s (attempt %d), retrying in %.0fs: %s", job.id, job.stage, job.attempts, delay, error)
+            values = {"status": "queued", "run_after": func.now() + timedelta(seconds=delay)}
+        else:
+            logger.error("Job %s failed at %s after %d attempts: %s", job.id, job.stage, job.attempts, error)
+            values = {"status": "failed"}
+        JobService._transition(job.id, ["running"], worker=None, locked_at=None, error=str(error), **values)
+        if values["status"] == "failed":
+            _remove_spooled(job.source_path)
+
+    @staticmethod
+    def _extract(job: Job) -> None:
+        text = PAGE_SEPARATOR.join(OcrService.extract_pages(job.source_path))
+        if not text.strip():
+            raise ValueError("no text could be extracted")
+        duplicates = NearDuplicateService.find_near_duplicates_of_text(text)
+        if duplicates:
+            duplicate = duplicates[0]
+            JobService._finish_stage(job, text=text, stage="metadata", status="duplicate", result={
+                "near_duplicate": {"document_id": str(duplicate.document_id), "file_name": duplicate.file_name, "similarity": duplicate.similarity},
+            })
+            _remove_spooled(job.source_path)
+            return
+        JobService._finish_stage(job, text=text)
+
+    @staticmethod
+    def _metadata(job: Job) -> None:
+        raw_metadata = get_metadata_cache().get_or_compute(
+            job.content_hash,
+            lambda: OpenAIClient().extract_document_metadata(input_data=job.text),
+        )
+        if raw_metadata is None:
+            raise ValueError("metadata extraction failed")
+        result = json.loads(raw_metadata)
+        if job.review:
+            JobService._finish_stage(job, result=result, stage="store", status="awaiting_review")
+        else:
+            JobService._finish_stage(job, result=result)
+
+    @staticmethod
+    def _store(job: Job) -> None:
+        storage = get_storage()
+        if not os.path.exists(job.source_path) and not storage.exists(object_key(job.content_hash, job.file_name)):
+            # Removed as abandoned; uploading the file again resumes the job
+            JobService._transition(
+                job.id, ["running"], worker=None, locked_at=None, status="failed",
+                error="The uploaded file is no longer available; upload it again.",
+            )
+            return
+        review = job.review_data or {}
+        record = parse_metadata(json.dumps(job.result or {}))
+        for key in ("file_name", "description", "document_metadata"):
+            if key in review:
+                record[key] = review[key]
+        for key in ("start_date", "end_date"):
+            if key in review:
+                record[key] = _parse_review_date(review[key])
+        record["file_name"] = record["file_name"] or Path(job.file_name).stem
+        record["start_date"] = record["start_date"] or job.created_at
+        record.update(
+            file_path=storage.store_file(job.source_path, job.content_hash, job.file_name),
+            content_hash=job.content_hash,
+            raw_content=job.text,
+            file_extension=review.get("file_extension") or Path(job.file_name).suffix.lstrip(".").lower(),
+        )
+        # ON CONFLICT on the content hash makes a retried store a no-op
+        DocumentService.bulk_create_documents([record], [UUID(tag_id) for tag_id in review.get("tag_ids", [])])
+        JobService._finish_stage(job, document_id=DocumentService.get_document_id_by_hash(job.content_hash))
+        _remove_spooled(job.source_path)
+
+    @staticmethod
+    def _embed(job: Job) -> None:
+        if job.document_id is not None:
+            ChunkService.chunk_documents([job.document_id])
+            EmbeddingService.embed_documents([job.document_id])
+            with get_db() as db:
+                chunk_ids = list(db.execute(select(DocumentChunk.id).where(DocumentChunk.document_id == job.document_id)).scalars())
+            if chunk_ids:
+                EmbeddingService.embed_chunks(chunk_ids)
+        JobService._finish_stage(job, status="done")
+
+    @staticmethod
+    def run_job(job: Job) -> None:
+        """
+        Runs the current stage of a claimed job and records the outcome.
+        """
+        started = time.monotonic()
+        stop_heartbeat = threading.Event()
+
+        def heartbeat() -> None:
+            while not stop_heartbeat.wait(cfg.JOB_HEARTBEAT_INTERVAL):
+                try:
+                    JobService.heartbeat(job.id, job.worker)
+                except Exception as e:
+                    logger.warning("Job %s: failed to refresh the lock: %s", job.id, e)
+
+        heartbeat_thread = threading.Thread(target=heartbeat, name=f"job-heartbeat-{job.id}", daemon=True)
+        heartbeat_thread.start()
+        try:
+            getattr(JobService, f"_{job.stage}")(job)
+            logger.info("Job %s: %s done in %.2fs.", job.id, job.stage, time.monotonic() - started)
+        except Exception as e:
+            JobService._fail(job, e)
+        finally:
+            stop_heartbeat.set()
+            heartbeat_thread.join()
+
+    @staticmethod
+    def run_worker(
+        stages: Sequence[str] = STAGES,
+        poll_interval: float = cfg.JOB_POLL_INTERVAL,
+        stop_event: Optional[threading.Event] = None) -> None:
+        """
+        Claims and runs jobs until stop_event is set, sleeping poll_interval seconds when the queue is empty.
+
+        Args:
+            stages (Sequence[str]): The stages this worker runs, so stages can be scaled separately.
+            poll_interval (float): Seconds between polls of an empty queue.
+            stop_event (Optional[threading.Event]): Stops the worker when set.
+        """
+        worker = f"{socket.gethostname()}:{os.getpid()}"
+        stop_event = stop_event or threading.Event()
+        last_reap = 0.0
+        logger.info("Job worker %s started for stages %s.", worker, ", ".join(stages))
+        while not stop_event.is_set():
+            try:
+                if time.monotonic() - last_reap > cfg.JOB_LOCK_TIMEOUT / 2:
+                    JobService.requeue_stale()
+                    JobService.remove_abandoned_files()
+                    last_reap = time.monotonic()
+                job = JobService.claim(worker, stages)
+            except Exception as e:
+                logger.error("Job worker %s could not claim a job: %s", worker, e)
+                job = None
+            if job is None:
+                stop_event.wait(poll_interval)
+            else:
+                JobService.run_job(job)
@@ -0,0 +1,154 @@
+"""
+This module provides a persistent cache for LLM results keyed by the content hash
+of the input, the prompt version and the model. Lookups go through an in-memory
+LRU tier first and fall back to an on-disk SQLite store, so repeated uploads and
+Streamlit reruns do not pay for the same completion twice.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Callable, Optional, Tuple
+import config.config as cfg
+from services.openai_service import PROMPT_VERSION
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Evictions run on the SQLite tier after this many writes
+EVICTION_INTERVAL = 100
+
+
+class MetadataCache:
+    """
+    Two-tier (memory LRU + SQLite) cache of raw LLM responses.
+
+    Entries older than the TTL are ignored and evicted; once the store holds more
+    than max_entries rows, the least recently accessed ones are dropped.
+    """
+
+    def __init__(
+        self,
+        path: str = cfg.METADATA_CACHE_PATH,
+        memory_entries: int = cfg.METADATA_CACHE_MEMORY_ENTRIES,
+        max_entries: int = cfg.METADATA_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = cfg.METADATA_CACHE_TTL_DAYS * 86400):
+        self.memory_entries = memory_entries
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._memory: "OrderedDict[Tuple[str, str, str], Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS metadata_cache (
+                content_hash TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                model TEXT NOT NULL,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (content_hash, prompt_version, model)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_metadata_cache_accessed_at ON metadata_cache (accessed_at)")
+
+    def get(self, content_hash: str, prompt_version: str = PROMPT_VERSION, model: str = cfg.LLM_MODEL) -> Optional[str]:
+        """
+        Returns the cached value for the key, or None on a miss.
+        """
+        key = (content_hash, prompt_version, model)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created_at = entry
+                if now - created_at <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    return value
+                del self._memory[key]
+
+            row = self._conn.execute(
+                "SELECT value, created_at FROM metadata_cache WHERE content_hash = ? AND prompt_version = ? AND model = ?",
+                key,
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                return None
+            self._conn.execute(
+                "UPDATE metadata_cache SET accessed_at = ? WHERE content_hash = ? AND prompt_version = ? AND model = ?",
+                (now, *key),
+            )
+            self._remember(key, row[0], row[1])
+            return row[0]
+
+    def set(self, content_hash: str, value: str, prompt_version: str = PROMPT_VERSION, model: str = cfg.LLM_MODEL) -> None:
+        """
+        Stores a value in both tiers.
+        """
+        key = (content_hash, prompt_version, model)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO metadata_cache (content_hash, prompt_version, model, value, created_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (*key, value, now, now),
+            )
+            self._remember(key, value, now)
+            self._writes += 1
+            if self._writes % EVICTION_INTERVAL == 0:
+                self._evict(now)
+
+    def get_or_compute(
+        self,
+        content_hash: str,
+        compute: Callable[[], Optional[str]],
+        prompt_version: str = PROMPT_VERSION,
+        model: str = cfg.LLM_MODEL) -> Optional[str]:
+        """
+        Returns the cached value, computing and storing it on a miss. None results are not cached.
+        """
+        value = self.get(content_hash, prompt_version, model)
+        if value is not None:
+            logger.debug("Metadata cache hit for %s.", content_hash)
+            return value
+        value = compute()
+        if value is not None:
+            self.set(content_hash, value, prompt_version, model)
+        return value
+
+    def _remember(self, key: Tuple[str, str, str], value: str, created_at: float) -> None:
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self, now: float) -> None:
+        expired = self._conn.execute("DELETE FROM metadata_cache WHERE created_at < ?", (now - self.ttl_seconds,)).rowcount
+        overflow = self._conn.execute(
+            """
+            DELETE FROM metadata_cache WHERE rowid IN (
+                SELECT rowid FROM metadata_cache ORDER BY accessed_at
+                LIMIT max(0, (SELECT count(*) FROM metadata_cache) - ?)
+            )
+            """,
+            (self.max_entries,),
+        ).rowcount
+        if expired or overflow:
+            logger.info("Metadata cache evicted %s expired and %s overflow entries.", expired, overflow)
+
+
+@lru_cache(maxsize=None)
+def get_metadata_cache() -> MetadataCache:
+    """
+    Returns the process-wide metadata cache.
+    """
+    return MetadataCache()
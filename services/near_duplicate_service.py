@@ -0,0 +1,135 @@
+"""
+This module detects near-duplicate documents, e.g. re-scanned or re-exported copies
+whose bytes (and so content_hash) differ. Every document's extracted text has a
+MinHash signature in document_signatures and one LSH bucket per band in
+document_lsh_bands. A check looks up the candidates sharing a bucket through the
+primary key of document_lsh_bands, fetches their signatures in the same query and
+compares them in memory, so it costs one indexed query regardless of the number
+of documents. Ingest and upload run it before asking OpenAI for metadata.
+
+Documents stored before this module existed are picked up by the backfill:
+
+    python -m services.near_duplicate_service
+"""
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+from uuid import UUID
+from sqlalchemy import select, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+import config.config as cfg
+from database.models import Document, DocumentContent, DocumentSignature, document_lsh_bands
+from database.session import get_db
+from utils import minhash
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class NearDuplicate:
+    """
+    A stored document similar to the checked text.
+    """
+    document_id: UUID
+    file_name: str
+    similarity: float
+
+
+class NearDuplicateService:
+    @staticmethod
+    def find_near_duplicates(signature: Sequence[int], threshold: float = cfg.NEAR_DUPLICATE_THRESHOLD, limit: int = 5) -> List[NearDuplicate]:
+        """
+        Returns the stored documents whose estimated similarity to the signature reaches the threshold.
+
+        Args:
+            signature (Sequence[int]): The MinHash signature of the checked text.
+            threshold (float): The minimum estimated Jaccard similarity, between 0 and 1.
+            limit (int): The maximum number of documents returned.
+
+        Returns:
+            List[NearDuplicate]: The most similar documents first.
+        """
+        keys = [(band, key) for band, key in enumerate(minhash.band_keys(signature))]
+        candidates = (
+            select(document_lsh_bands.c.document_id)
+            .where(tuple_(document_lsh_bands.c.band, document_lsh_bands.c.bucket).in_(keys))
+            .distinct()
+        )
+        query = (
+            select(Document.id, Document.file_name, DocumentSignature.signature)
+            .join(DocumentSignature, DocumentSignature.document_id == Document.id)
+            .where(Document.id.in_(candidates))
+        )
+        with get_db() as db:
+            rows = db.execute(query).all()
+        matches = [NearDuplicate(row.id, row.file_name, minhash.similarity(signature, row.signature)) for row in rows]
+        matches = sorted((match for match in matches if match.similarity >= threshold), key=lambda match: -match.similarity)
+        return matches[:limit]
+
+    @staticmethod
+    def find_near_duplicates_of_text(text: str, threshold: float = cfg.NEAR_DUPLICATE_THRESHOLD) -> List[NearDuplicate]:
+        """
+        Returns the stored documents similar to the text; none if near-duplicate detection is disabled.
+        """
+        if not cfg.NEAR_DUPLICATE_ENABLED:
+            return []
+        signature = minhash.signature(text)
+        return NearDuplicateService.find_near_duplicates(signature, threshold) if signature else []
+
+    @staticmethod
+    def store_signatures(db, signatures: Dict[UUID, Optional[List[int]]]) -> None:
+        """
+        Stores the signatures and LSH buckets of documents in the caller's transaction.
+        Documents already having a signature and None signatures (texts without words) are skipped.
+        """
+        signatures = {document_id: values for document_id, values in signatures.items() if values}
+        if not signatures:
+            return
+        db.execute(
+            pg_insert(DocumentSignature).on_conflict_do_nothing(),
+            [{"document_id": document_id, "signature": values} for document_id, values in signatures.items()],
+        )
+        db.execute(
+            pg_insert(document_lsh_bands).on_conflict_do_nothing(),
+            [
+                {"band": band, "bucket": key, "document_id": document_id}
+                for document_id, values in signatures.items()
+                for band, key in enumerate(minhash.band_keys(values))
+            ],
+        )
+
+    @staticmethod
+    def backfill(batch_size: int = 500) -> int:
+        """
+        Computes the signatures of the documents that have none, in keyset-paginated batches.
+
+        Returns:
+            int: The number of signatures written.
+        """
+        written = 0
+        last_id = None
+        while True:
+            query = (
+                select(DocumentContent.document_id, DocumentContent.raw_content)
+                .where(~select(DocumentSignature.document_id).where(DocumentSignature.document_id == DocumentContent.document_id).exists())
+                .order_by(DocumentContent.document_id)
+                .limit(batch_size)
+            )
+            if last_id is not None:
+                query = query.where(DocumentContent.document_id > last_id)
+            with get_db() as db:
+                rows = db.execute(query).all()
+                if not rows:
+                    break
+                signatures = {row.document_id: minhash.signature(row.raw_content or "") for row in rows}
+                NearDuplicateService.store_signatures(db, signatures)
+                db.commit()
+            last_id = rows[-1].document_id
+            written += sum(1 for values in signatures.values() if values)
+            logger.info("Near-duplicate backfill: %d signatures written.", written)
+        return written
+
+
+if __name__ == "__main__":
+    NearDuplicateService.backfill()
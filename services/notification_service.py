@@ -0,0 +1,239 @@
+"""
+This module sends the expiry reminders configured on tags. A tag with notify set
+reminds the user groups it is assigned to about its documents from
+notification_days_before_expiry days before their end_date, repeating every
+notification_frequency days. When each (document, tag) pair was last reminded
+about is recorded in document_notifications, so a run only selects the pairs that
+are due and the whole computation is one query over the end_date index. All the
+documents due for a user group go out in one email to its users.
+"""
+
+import argparse
+import html
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set, Tuple
+from uuid import UUID
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+import config.config as cfg
+from database.models import Document, DocumentNotification, Tag, User, UserGroup, document_tags, get_engine, user_group_tags
+from database.session import get_db
+from utils.email_utils import send_emails
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Advisory lock key held while a run is in progress, so concurrent schedulers never send twice
+NOTIFICATION_LOCK_KEY = 0x6E6F7469
+
+
+@dataclass
+class DueReminder:
+    """
+    A document whose expiry reminder is due under one of its tags.
+    """
+    document_id: UUID
+    file_name: str
+    end_date: datetime
+    tag_id: UUID
+    tag_name: str
+
+
+class NotificationService:
+    @staticmethod
+    def find_due(now: datetime) -> List[DueReminder]:
+        """
+        Returns the (document, tag) pairs whose reminder is due at the given time: the document
+        expires within the tag's notification window and was not reminded about under that tag
+        in the last notification_frequency days.
+        """
+        # Constant upper bound on end_date, so the range scan uses ix_documents_end_date
+        widest_window = (
+            select(func.make_interval(0, 0, 0, func.max(Tag.notification_days_before_expiry)))
+            .where(Tag.notify.is_(True))
+            .scalar_subquery()
+        )
+        query = (
+            select(Document.id, Document.file_name, Document.end_date, Tag.id, Tag.tag_name)
+            .select_from(Document)
+            .join(document_tags, document_tags.c.document_id == Document.id)
+            .join(Tag, Tag.id == document_tags.c.tag_id)
+            .outerjoin(
+                DocumentNotification,
+                and_(DocumentNotification.document_id == Document.id, DocumentNotification.tag_id == Tag.id),
+            )
+            .where(
+                Tag.notify.is_(True),
+                Document.end_date >= now,
+                Document.end_date <= now + widest_window,
+                Document.end_date <= now + func.make_interval(0, 0, 0, Tag.notification_days_before_expiry),
+                or_(
+                    DocumentNotification.last_notified_at.is_(None),
+                    DocumentNotification.last_notified_at <= now - func.make_interval(0, 0, 0, Tag.notification_frequency),
+                ),
+            )
+            .order_by(Document.end_date, Document.id)
+        )
+        with get_db() as db:
+            return [DueReminder(*row) for row in db.execute(query)]
+
+    @staticmethod
+    def find_recipients(tag_ids: Set[UUID]) -> Dict[UUID, Tuple[str, Set[UUID], List[str]]]:
+        """
+        Returns, for each user group assigned one of the tags, its name, which of the tags
+        it has and the emails of its users. Groups without users are left out.
+        """
+        if not tag_ids:
+            return {}
+        query = (
+            select(UserGroup.id, UserGroup.group_name, user_group_tags.c.tag_id, User.email)
+            .join(user_group_tags, user_group_tags.c.user_group_id == UserGroup.id)
+            .join(User, User.user_group_id == UserGroup.id)
+            .where(user_group_tags.c.tag_id.in_(list(tag_ids)))
+        )
+        recipients: Dict[UUID, Tuple[str, Set[UUID], List[str]]] = {}
+        with get_db() as db:
+            for group_id, group_name, tag_id, email in db.execute(query):
+                _, group_tags, emails = recipients.setdefault(group_id, (group_name, set(), []))
+                group_tags.add(tag_id)
+                if email not in emails:
+                    emails.append(email)
+        return recipients
+
+    @staticmethod
+    def build_email_body(group_name: str, reminders: List[DueReminder], now: datetime) -> str:
+        """
+        Returns the HTML listing the documents due for a user group, soonest expiry first.
+        """
+        rows = "".join(
+            f"<tr><td>{html.escape(reminder.file_name)}</td><td>{html.escape(reminder.tag_name)}</td>"
+            f"<td>{reminder.end_date:%Y-%m-%d}</td><td>{(reminder.end_date - now).days}</td></tr>"
+            for reminder in reminders
+        )
+        return f"""
+        <html>
+        <body>
+            <p>The following documents of {html.escape(group_name)} are about to expire.</p>
+            <table border="1">
+                <tr><th>Document</th><th>Tag</th><th>Expires</th><th>Days left</th></tr>
+                {rows}
+            </table>
+        </body>
+        </html>
+        """
+
+    @staticmethod
+    def mark_notified(pairs: Set[Tuple[UUID, UUID]], now: datetime) -> None:
+        """
+        Records now as the last reminder time of the (document, tag) pairs.
+        """
+        if not pairs:
+            return
+        statement = pg_insert(DocumentNotification)
+        statement = statement.on_conflict_do_update(
+            index_elements=[DocumentNotification.document_id, DocumentNotification.tag_id],
+            set_={"last_notified_at": statement.excluded.last_notified_at},
+        )
+        with get_db() as db:
+            db.execute(statement, [
+                {"document_id": document_id, "tag_id": tag_id, "last_notified_at": now}
+                for document_id, tag_id in pairs
+            ])
+            db.commit()
+
+    @staticmethod
+    def run_once(now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Sends the reminders due at the given time (default: now) and records them. A pair is
+        only recorded once every group email listing it was sent, so failed sends are retried
+        on the next run. Returns without sending if another run holds the advisory lock.
+
+        Returns:
+            Dict[str, int]: The number of due pairs, emails sent, emails failed and pairs recorded.
+        """
+        now = now or datetime.now(timezone.utc)
+        started = time.monotonic()
+        stats = {"due": 0, "sent": 0, "failed": 0, "recorded": 0}
+        # The lock is transaction-scoped, so it also works behind a transaction-mode PgBouncer
+        with get_engine().connect() as lock_connection, lock_connection.begin():
+            if not lock_connection.execute(select(func.pg_try_advisory_xact_lock(NOTIFICATION_LOCK_KEY))).scalar():
+                logger.info("Another expiry notification run is in progress, skipping.")
+                return stats
+
+            due = NotificationService.find_due(now)
+            stats["due"] = len(due)
+            if not due:
+                return stats
+
+            by_tag: Dict[UUID, List[DueReminder]] = defaultdict(list)
+            for reminder in due:
+                by_tag[reminder.tag_id].append(reminder)
+            recipients = NotificationService.find_recipients(set(by_tag))
+
+            # One email per group, all sent over one pooled SMTP session
+            emails, group_pairs = [], []
+            for group_name, group_tags, recipient_emails in recipients.values():
+                reminders = sorted(
+                    (reminder for tag_id in group_tags for reminder in by_tag[tag_id]),
+                    key=lambda reminder: (reminder.end_date, reminder.file_name),
+                )
+                body = NotificationService.build_email_body(group_name, reminders, now)
+                emails.append((", ".join(recipient_emails), f"{cfg.NOTIFICATION_SUBJECT}: {group_name}", body))
+                group_pairs.append({(reminder.document_id, reminder.tag_id) for reminder in reminders})
+
+            failed_pairs: Set[Tuple[UUID, UUID]] = set()
+            notified_pairs: Set[Tuple[UUID, UUID]] = set()
+            for pairs, sent in zip(group_pairs, send_emails(emails)):
+                if sent:
+                    stats["sent"] += 1
+                    notified_pairs |= pairs
+                else:
+                    stats["failed"] += 1
+                    failed_pairs |= pairs
+
+            NotificationService.mark_notified(notified_pairs - failed_pairs, now)
+            stats["recorded"] = len(notified_pairs - failed_pairs)
+
+        logger.info(
+            "Expiry notifications: %d due, %d emails sent, %d failed, %d recorded in %.2fs.",
+            stats["due"], stats["sent"], stats["failed"], stats["recorded"], time.monotonic() - started,
+        )
+        return stats
+
+    @staticmethod
+    def start_background_scheduler(interval_seconds: float = cfg.NOTIFICATION_INTERVAL_SECONDS) -> Tuple[threading.Thread, threading.Event]:
+        """
+        Runs the expiry notifications in a daemon thread, repeating every interval_seconds.
+
+        Returns:
+            Tuple[threading.Thread, threading.Event]: The thread and an event that stops it.
+        """
+        stop_event = threading.Event()
+
+        def run() -> None:
+            while not stop_event.is_set():
+                try:
+                    NotificationService.run_once()
+                except Exception as e:
+                    logger.error("Expiry notification run failed: %s", e)
+                stop_event.wait(interval_seconds)
+
+        thread = threading.Thread(target=run, name="expiry-notifications", daemon=True)
+        thread.start()
+        return thread, stop_event
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Send the expiry reminders of notifying tags.")
+    parser.add_argument("--once", action="store_true", help="Run once and exit instead of repeating.")
+    parser.add_argument("--interval", type=float, default=cfg.NOTIFICATION_INTERVAL_SECONDS, help="Seconds between runs.")
+    args = parser.parse_args()
+    if args.once:
+        NotificationService.run_once()
+    else:
+        thread, _ = NotificationService.start_background_scheduler(args.interval)
+        thread.join()
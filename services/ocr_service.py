@@ -0,0 +1,133 @@
+"""
+This module provides the OCR fallback for scanned PDFs. Pages whose extracted text
+is too sparse are rendered to images in memory, sent to a vision model several
+pages per request, and replaced by the transcription. Transcriptions are cached
+per rendered page hash, so the same scanned page is never transcribed twice.
+"""
+
+import asyncio
+from typing import Dict, List, Optional, Tuple
+import config.config as cfg
+from services.metadata_cache import get_metadata_cache
+from services.openai_service import OCR_PROMPT_VERSION, AsyncOpenAIClient, OpenAIClient
+from utils.file_utils import extract_pages_from_pdf
+from utils.logger import get_logger
+from utils.pdf_engine import PdfSource, RenderedPage, render_pdf_pages
+
+logger = get_logger(__name__)
+
+
+class OcrService:
+    @staticmethod
+    def low_density_pages(pages: List[str], min_chars: int = cfg.OCR_MIN_CHARS_PER_PAGE) -> List[int]:
+        """
+        Returns the 1-based numbers of the pages with fewer than min_chars non-whitespace characters.
+        """
+        return [number for number, text in enumerate(pages, start=1) if len("".join(text.split())) < min_chars]
+
+    @staticmethod
+    def _split_cached(rendered: List[RenderedPage]) -> Tuple[Dict[int, str], List[List[RenderedPage]]]:
+        """
+        Looks the rendered pages up in the cache and batches the misses into vision requests.
+        """
+        cache = get_metadata_cache()
+        texts: Dict[int, str] = {}
+        missing: List[RenderedPage] = []
+        for page in rendered:
+            cached = cache.get(page.page_hash, OCR_PROMPT_VERSION, cfg.OCR_MODEL)
+            if cached is None:
+                missing.append(page)
+            else:
+                texts[page.page_number] = cached
+        size = cfg.OCR_PAGES_PER_REQUEST
+        return texts, [missing[start:start + size] for start in range(0, len(missing), size)]
+
+    @staticmethod
+    def _store(batch: List[RenderedPage], transcriptions: List[str], texts: Dict[int, str]) -> None:
+        cache = get_metadata_cache()
+        for page, text in zip(batch, transcriptions):
+            cache.set(page.page_hash, text, OCR_PROMPT_VERSION, cfg.OCR_MODEL)
+            texts[page.page_number] = text
+
+    @staticmethod
+    def transcribe(rendered: List[RenderedPage]) -> Dict[int, str]:
+        """
+        Transcribes rendered pages, reusing cached transcriptions.
+
+        Args:
+            rendered (List[RenderedPage]): The rendered pages.
+
+        Returns:
+            Dict[int, str]: The transcription per 1-based page number; pages whose request failed are missing.
+        """
+        texts, batches = OcrService._split_cached(rendered)
+        client = OpenAIClient()
+        for batch in batches:
+            try:
+                OcrService._store(batch, client.transcribe_page_images([page.image for page in batch]), texts)
+            except Exception as e:
+                logger.error("Error transcribing pages %s: %s", [page.page_number for page in batch], e)
+        return texts
+
+    @staticmethod
+    async def transcribe_async(
+        rendered: List[RenderedPage],
+        client: Optional[AsyncOpenAIClient] = None,
+        slots: Optional[asyncio.Semaphore] = None) -> Dict[int, str]:
+        """
+        asyncio counterpart of transcribe; all batches are sent concurrently.
+
+        Args:
+            rendered (List[RenderedPage]): The rendered pages.
+            client (Optional[AsyncOpenAIClient]): The client to send requests with.
+            slots (Optional[asyncio.Semaphore]): Bounds the number of requests in flight, shared with the caller.
+
+        Returns:
+            Dict[int, str]: The transcription per 1-based page number; pages whose request failed are missing.
+        """
+        texts, batches = OcrService._split_cached(rendered)
+        client = client or AsyncOpenAIClient()
+
+        async def send(batch: List[RenderedPage]) -> None:
+            try:
+                if slots is None:
+                    transcriptions = await client.transcribe_page_images([page.image for page in batch])
+                else:
+                    async with slots:
+                        transcriptions = await client.transcribe_page_images([page.image for page in batch])
+                OcrService._store(batch, transcriptions, texts)
+            except Exception as e:
+                logger.error("Error transcribing pages %s: %s", [page.page_number for page in batch], e)
+
+        await asyncio.gather(*(send(batch) for batch in batches))
+        return texts
+
+    @staticmethod
+    def merge(pages: List[str], texts: Dict[int, str]) -> List[str]:
+        """
+        Replaces the text of sparse pages by their transcription, keeping whichever is longer.
+        """
+        merged = list(pages)
+        for number, text in texts.items():
+            if len(text.strip()) > len(merged[number - 1].strip()):
+                merged[number - 1] = text
+        return merged
+
+    @staticmethod
+    def extract_pages(source: PdfSource, workers: Optional[int] = None) -> List[str]:
+        """
+        Extracts the text of each page of a PDF, transcribing sparse (scanned) pages with the vision model.
+
+        Args:
+            source (PdfSource): A file path, bytes or binary file-like object of the PDF.
+            workers (Optional[int]): The number of processes for extraction and rendering.
+
+        Returns:
+            List[str]: One string per page, in page order.
+        """
+        pages = extract_pages_from_pdf(source, workers)
+        sparse = OcrService.low_density_pages(pages) if cfg.OCR_ENABLED else []
+        if not sparse:
+            return pages
+        logger.info("Running OCR on %s of %s pages.", len(sparse), len(pages))
+        return OcrService.merge(pages, OcrService.transcribe(render_pdf_pages(source, sparse, workers)))
@@ -1,101 +1,435 @@
-from typing import List, Union
-import requests
-from openai import OpenAI
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+import weakref
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Coroutine, Dict, List, Mapping, Optional, TypeVar, Union
+import httpx
+import openai
+from openai import AsyncOpenAI, OpenAI
 import config.config as cfg
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+T = TypeVar("T")
+
+# Bump whenever METADATA_PROMPT changes so cached results of older prompts are not reused
+PROMPT_VERSION = "1"
+
+METADATA_PROMPT = """
+All output should be in ENGLISH, ENGLISH, ENGLISH.
+You are given a document. Extract the following key metadata as plain JSON:
+below are the keys you must use in your output JSON:
+- [filename] (in English): please suggest a descriptive filename in ENGLISH based on the document content, all lowercase, no special characters, spaces replaced with underscores, no file extension
+- [description] (in English): please suggest a description/shot summary in ENGLISH based on the document content
+- [start_date]: the date of creation of the document you must find this date in the document content, please parse it into the format of yyyy.mm.dd
+- [end_date]: the date of expiration of the document or the validity period of the document, for example if it is a contract, find the end date of the contract, you must find this date in the document content, please parse it into the format of yyyy.mm.dd, if there are multiple dates, please use the most recent date, if there are no dates, please output an empty string
+
+and please output all other very important document metadata.
+
+Ensure all date information is parsed into the format yyyy.mm.dd.
+If there are duplicates in the result, only keep one; if there is only one result, it does not need to be a list.
+No need to output any additional characters.
+All output should be in ENGLISH, ENGLISH, ENGLISH.
+All the output text should not be encoded, print the text directly even if there are special characters in the text. Please handle the text encoding issue very carefully.
+If there are weired characters in the output, please remove them or replace them with the corresponding English characters. like $ to USD, € to EUR, £ to GBP, etc..
+"""
+
+# Bump whenever OCR_PROMPT changes so cached page transcriptions of older prompts are not reused
+OCR_PROMPT_VERSION = "ocr-1"
+
+OCR_PROMPT = """
+You are given images of consecutive pages of a scanned document, in order.
+Transcribe the text of every page exactly as written, in its original language; do not translate or summarise.
+Keep the reading order and line breaks. Write tables row by row with cells separated by " | ".
+If a page has no readable text, use an empty string for it.
+Output plain JSON of the form {"pages": ["<text of image 1>", "<text of image 2>", ...]} with exactly one entry per image.
+"""
+
+
+@lru_cache(maxsize=None)
+def get_sync_client() -> OpenAI:
+    """
+    Returns the process-wide synchronous OpenAI client, so its connection pool is reused.
+    """
+    return OpenAI(api_key=cfg.OPENAI_API_KEY, timeout=cfg.OPENAI_TIMEOUT)
+
+
 class OpenAIClient:
     def __init__(self):
         """
         Initializes the OpenAI client with the provided API key.
         """
-        self.client = OpenAI(api_key=cfg.OPENAI_API_KEY)
+        self.client = get_sync_client()
 
 
     def extract_document_metadata(self, input_data: Union[str, List[str], bytes, List[bytes]]) -> Union[dict, None]:
         """
         Sends a request to OpenAI API to extract data from text or image input.
         """
-        prompt = """
-        All output should be in ENGLISH, ENGLISH, ENGLISH.
-        You are given a document. Extract the following key metadata as plain JSON:
-        below are the keys you must use in your output JSON:
-        - [filename] (in English): please suggest a descriptive filename in ENGLISH based on the document content, all lowercase, no special characters, spaces replaced with underscores, no file extension
-        - [description] (in English): please suggest a description/shot summary in ENGLISH based on the document content
-        - [start_date]: the date of creation of the document you must find this date in the document content, please parse it into the format of yyyy.mm.dd
-        - [end_date]: the date of expiration of the document or the validity period of the document, for example if it is a contract, find the end date of the contract, you must find this date in the document content, please parse it into the format of yyyy.mm.dd, if there are multiple dates, please use the most recent date, if there are no dates, please output an empty string
-        
-        and please output all other very important document metadata.
-
-        Ensure all date information is parsed into the format yyyy.mm.dd.
-        If there are duplicates in the result, only keep one; if there is only one result, it does not need to be a list.
-        No need to output any additional characters.
-        All output should be in ENGLISH, ENGLISH, ENGLISH.
-        All the output text should not be encoded, print the text directly even if there are special characters in the text. Please handle the text encoding issue very carefully.
-        If there are weired characters in the output, please remove them or replace them with the corresponding English characters. like $ to USD, € to EUR, £ to GBP, etc..
+        try:
+            completion = self.client.chat.completions.create(
+                model=cfg.LLM_MODEL,
+                messages=_build_metadata_messages(input_data),
+                temperature=0.0,
+                response_format={ "type": "json_object" }
+            )
+            return completion.choices[0].message.content
+        except Exception as e:
+            logger.error("Error extracting data: %s", e)
+            return None
+
+    def transcribe_page_images(self, images: List[bytes]) -> List[str]:
+        """
+        Transcribes the text of several rendered page images in a single vision request.
         """
+        completion = self.client.chat.completions.create(
+            model=cfg.OCR_MODEL,
+            messages=_build_ocr_messages(images),
+            temperature=0.0,
+            response_format={"type": "json_object"},
+        )
+        return _parse_transcription(completion.choices[0].message.content, len(images))
 
+    def get_text_embedding(self, text: str) -> List[float]:
         try:
-            if isinstance(input_data, (str, list)):
-                messages = [{"role": "system", "content": prompt}]
-                if isinstance(input_data, str):
-                    messages.append({"role": "user", "content": input_data})
-                else:
-                    for text in input_data:
-                        messages.append({"role": "user", "content": text})
-
-                completion = self.client.chat.completions.create(
-                    model=cfg.LLM_MODEL,
-                    messages=messages,
-                    temperature=0.0,
-                    response_format={ "type": "json_object" }
-                )
-                return completion.choices[0].message.content
-
-            elif isinstance(input_data, (bytes, list)):
-                headers = {
-                    "Content-Type": "application/json",
-                    "Authorization": f"Bearer {cfg.OPENAI_API_KEY}",
-                }
-
-                if isinstance(input_data, bytes):
-                    input_data = [input_data]
-
-                payload = {
-                    "model": cfg.LLM_MODEL,
-                    "messages": [
-                        {"role": "system", "content": prompt},
-                        {
-                            "role": "user",
-                            "content": [
-                                {"type": "text", "text": "What’s in this invoice image?"},
-                                {
-                                    "type": "image_url",
-                                    "image_url": {"url": f"data:image/jpeg;base64,{input_data}"},
-                                },
-                            ],
-                        },
-                    ],
-                    "temperature": 0.0,
-                    "response_format": { "type": "json_object" }
-                }
-
-                response = requests.post(
-                    "https://api.openai.com/v1/chat/completions", headers=headers, json=payload
-                )
-                return response.json()
+            response = self.client.embeddings.create(input=text, model=cfg.EMBEDDING_MODEL)
+            return response.data[0].embedding
+        except Exception as e:
+            logger.error("Error getting text embedding: %s", e)
+            return None
+
+    def get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embeds many texts in a single API request, returning vectors in input order.
+        """
+        response = self.client.embeddings.create(input=texts, model=cfg.EMBEDDING_MODEL)
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+
+def _build_metadata_messages(input_data: Union[str, List[str], bytes, List[bytes]]) -> List[dict]:
+    """
+    Builds the chat messages for a metadata extraction request from text or image input.
+    """
+    if isinstance(input_data, (str, bytes)):
+        input_data = [input_data]
+    messages = [{"role": "system", "content": METADATA_PROMPT}]
+    texts = [item for item in input_data if isinstance(item, str)]
+    images = [item for item in input_data if isinstance(item, bytes)]
+    for text in texts:
+        messages.append({"role": "user", "content": text})
+    if images:
+        content = [{"type": "text", "text": "What’s in this document image?"}]
+        for image in images:
+            encoded = base64.b64encode(image).decode("utf-8")
+            content.append({"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{encoded}"}})
+        messages.append({"role": "user", "content": content})
+    return messages
+
+
+def _build_ocr_messages(images: List[bytes]) -> List[dict]:
+    """
+    Builds the chat messages for a batched page transcription request.
+    """
+    content = [{"type": "text", "text": f"Transcribe these {len(images)} pages."}]
+    for image in images:
+        encoded = base64.b64encode(image).decode("utf-8")
+        content.append({"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{encoded}", "detail": "high"}})
+    return [{"role": "system", "content": OCR_PROMPT}, {"role": "user", "content": content}]
+
+
+def _parse_transcription(content: Optional[str], count: int) -> List[str]:
+    """
+    Parses the JSON returned for a transcription request into exactly one text per image.
+    """
+    pages = json.loads(content or "{}").get("pages", [])
+    if len(pages) != count:
+        raise ValueError(f"Expected {count} page transcriptions, got {len(pages)}.")
+    return [page if isinstance(page, str) else "" for page in pages]
+
+
+def _estimate_tokens(text: str) -> int:
+    """
+    Rough token estimate (~4 characters per token) used to draw from the token bucket.
+    """
+    return max(1, len(text) // 4)
+
+
+def _parse_reset(value: Optional[str]) -> Optional[float]:
+    """
+    Parses OpenAI rate-limit reset durations such as "1s", "6m0s" or "20ms" into seconds.
+    """
+    if not value:
+        return None
+    units = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    parts = re.findall(r"([\d.]+)(ms|s|m|h)", value)
+    if not parts:
+        return None
+    return sum(float(amount) * units[unit] for amount, unit in parts)
+
+
+def _retry_after(headers: Mapping[str, str]) -> float:
+    """
+    Returns how long the API asked us to wait after a 429, in seconds.
+    """
+    try:
+        return float(headers.get("retry-after", ""))
+    except ValueError:
+        return _parse_reset(headers.get("x-ratelimit-reset-requests")) or 0.0
+
+
+class _TokenBucket:
+    """
+    A token bucket refilled continuously at capacity-per-minute, corrected from rate-limit headers.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = float(capacity)
+        self.level = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.capacity / 60.0)
+        self.updated = now
+
+    async def acquire(self, amount: float) -> None:
+        amount = min(amount, self.capacity)
+        async with self.lock:
+            while True:
+                self._refill()
+                if self.level >= amount:
+                    self.level -= amount
+                    return
+                await asyncio.sleep((amount - self.level) * 60.0 / self.capacity)
+
+    def update(self, limit: Optional[str], remaining: Optional[str]) -> None:
+        try:
+            if limit:
+                self.capacity = float(limit)
+            if remaining is not None:
+                self._refill()
+                self.level = min(self.level, float(remaining))
+        except ValueError:
+            logger.debug("Ignoring malformed rate-limit headers: %s, %s", limit, remaining)
+
+
+class _RateLimiter:
+    """
+    Request and token buckets driven by the x-ratelimit-* response headers, plus a
+    global pause used when the API answers 429.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests = _TokenBucket(requests_per_minute)
+        self.tokens = _TokenBucket(tokens_per_minute)
+        self.paused_until = 0.0
+
+    async def acquire(self, tokens: int) -> None:
+        delay = self.paused_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await self.requests.acquire(1)
+        await self.tokens.acquire(tokens)
 
+    def update(self, headers: Mapping[str, str]) -> None:
+        self.requests.update(headers.get("x-ratelimit-limit-requests"), headers.get("x-ratelimit-remaining-requests"))
+        self.tokens.update(headers.get("x-ratelimit-limit-tokens"), headers.get("x-ratelimit-remaining-tokens"))
+
+    def pause(self, seconds: float) -> None:
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class _LoopState:
+    """
+    Per event loop state shared by all AsyncOpenAIClient instances: one pooled HTTP
+    client, the rate limiter, the concurrency bound and the in-flight request map.
+    """
+
+    def __init__(self):
+        self.client = AsyncOpenAI(
+            api_key=cfg.OPENAI_API_KEY,
+            max_retries=0,
+            timeout=cfg.OPENAI_TIMEOUT,
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=cfg.OPENAI_MAX_CONCURRENCY,
+                    max_keepalive_connections=cfg.OPENAI_MAX_CONCURRENCY,
+                ),
+                timeout=cfg.OPENAI_TIMEOUT,
+            ),
+        )
+        self.limiter = _RateLimiter(cfg.OPENAI_REQUESTS_PER_MINUTE, cfg.OPENAI_TOKENS_PER_MINUTE)
+        self.slots = asyncio.Semaphore(cfg.OPENAI_MAX_CONCURRENCY)
+        self.in_flight: Dict[str, asyncio.Future] = {}
+
+
+_loop_states: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopState]" = weakref.WeakKeyDictionary()
+
+
+def _get_loop_state() -> _LoopState:
+    loop = asyncio.get_running_loop()
+    state = _loop_states.get(loop)
+    if state is None:
+        state = _loop_states[loop] = _LoopState()
+    return state
+
+
+async def close_loop_client() -> None:
+    """
+    Closes the HTTP client of the running event loop and forgets its state. Call it before a
+    loop of asyncio.run finishes, as the connections of that loop are never reused.
+    """
+    state = _loop_states.pop(asyncio.get_running_loop(), None)
+    if state is not None:
+        await state.client.close()
+
+
+class AsyncOpenAIClient:
+    """
+    asyncio counterpart of OpenAIClient for bulk workloads.
+
+    All instances running on the same event loop share one pooled HTTP client, a
+    token-bucket rate limiter fed by the API's rate-limit headers and a bound on
+    concurrent requests. Retryable failures (429, 5xx, timeouts) are retried with
+    exponential backoff, and identical requests that are already in flight are
+    coalesced into a single API call.
+    """
+
+    async def extract_document_metadata(self, input_data: Union[str, List[str], bytes, List[bytes]]) -> Union[str, None]:
+        """
+        Sends a request to OpenAI API to extract data from text or image input.
+        """
+        messages = _build_metadata_messages(input_data)
+        request = {
+            "model": cfg.LLM_MODEL,
+            "messages": messages,
+            "temperature": 0.0,
+            "response_format": {"type": "json_object"},
+        }
+        # Images are billed by tile; 1000 tokens per image part is a conservative estimate
+        tokens = sum(_estimate_tokens(m["content"]) if isinstance(m["content"], str) else 1000 * len(m["content"]) for m in messages)
+
+        async def call(client: AsyncOpenAI):
+            return await client.chat.completions.with_raw_response.create(**request)
+
+        try:
+            completion = await self._request("chat", request, tokens, call)
+            return completion.choices[0].message.content
         except Exception as e:
-            logger.error(f"Error extracting data: {e}")
+            logger.error("Error extracting data: %s", e)
             return None
 
+    async def transcribe_page_images(self, images: List[bytes]) -> List[str]:
+        """
+        Transcribes the text of several rendered page images in a single vision request.
+        """
+        request = {
+            "model": cfg.OCR_MODEL,
+            "messages": _build_ocr_messages(images),
+            "temperature": 0.0,
+            "response_format": {"type": "json_object"},
+        }
+
+        async def call(client: AsyncOpenAI):
+            return await client.chat.completions.with_raw_response.create(**request)
+
+        # Page transcriptions are long; budget 1000 tokens per image plus ~1000 output tokens per page
+        completion = await self._request("ocr", request, 2000 * len(images), call)
+        return _parse_transcription(completion.choices[0].message.content, len(images))
+
+    async def get_text_embedding(self, text: str) -> List[float]:
+        request = {"input": text, "model": cfg.EMBEDDING_MODEL}
+
+        async def call(client: AsyncOpenAI):
+            return await client.embeddings.with_raw_response.create(**request)
 
-    def get_text_embedding(self, text: str) -> List[float]:
         try:
-            response = self.client.embeddings.create(input=text, model=cfg.EMBEDDING_MODEL)
-            return response['data'][0]['embedding']
+            response = await self._request("embedding", request, _estimate_tokens(text), call)
+            return response.data[0].embedding
         except Exception as e:
-            logger.error(f"Error getting text embedding: {e}")
+            logger.error("Error getting text embedding: %s", e)
             return None
+
+    async def get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embeds many texts in a single API request, returning vectors in input order.
+        """
+        request = {"input": texts, "model": cfg.EMBEDDING_MODEL}
+
+        async def call(client: AsyncOpenAI):
+            return await client.embeddings.with_raw_response.create(**request)
+
+        response = await self._request("embedding", request, sum(_estimate_tokens(text) for text in texts), call)
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    async def _request(self, kind: str, request: dict, tokens: int, call: Callable[[AsyncOpenAI], Awaitable]):
+        """
+        Runs a request through coalescing, the rate limiter and the retry loop.
+        """
+        state = _get_loop_state()
+        key = hashlib.sha256(f"{kind}:{json.dumps(request, sort_keys=True, default=str)}".encode("utf-8")).hexdigest()
+        future = state.in_flight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._send(state, tokens, call))
+            state.in_flight[key] = future
+            future.add_done_callback(lambda _: state.in_flight.pop(key, None))
+        else:
+            logger.debug("Coalescing identical in-flight %s request.", kind)
+        return await asyncio.shield(future)
+
+    @staticmethod
+    async def _send(state: _LoopState, tokens: int, call: Callable[[AsyncOpenAI], Awaitable]):
+        for attempt in range(cfg.OPENAI_MAX_RETRIES + 1):
+            await state.limiter.acquire(tokens)
+            try:
+                async with state.slots:
+                    raw = await call(state.client)
+                state.limiter.update(raw.headers)
+                return raw.parse()
+            except (openai.RateLimitError, openai.InternalServerError, openai.APIConnectionError) as e:
+                if attempt == cfg.OPENAI_MAX_RETRIES:
+                    raise
+                delay = min(60.0, 2 ** attempt) * (0.5 + random.random() / 2)
+                response = getattr(e, "response", None)
+                if response is not None:
+                    state.limiter.update(response.headers)
+                if isinstance(e, openai.RateLimitError):
+                    if response is not None:
+                        delay = max(delay, _retry_after(response.headers))
+                    # Hold back every request on this loop, not just this one
+                    state.limiter.pause(delay)
+                logger.warning(
+                    "OpenAI request failed (%s), retrying in %.1fs (%d/%d).",
+                    e.__class__.__name__, delay, attempt + 1, cfg.OPENAI_MAX_RETRIES,
+                )
+                await asyncio.sleep(delay)
+
+
+@lru_cache(maxsize=None)
+def _background_loop() -> asyncio.AbstractEventLoop:
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="openai-loop", daemon=True).start()
+    return loop
+
+
+# A forked child does not inherit the loop's thread; it starts its own on first use
+os.register_at_fork(after_in_child=_background_loop.cache_clear)
+
+
+def run_sync(coroutine: Coroutine[Any, Any, T]) -> T:
+    """
+    Runs a coroutine of AsyncOpenAIClient from synchronous code and returns its result.
+
+    Every synchronous caller of the process shares one background event loop, and so one
+    rate limiter, retry policy and connection pool, however many threads call in.
+    """
+    return asyncio.run_coroutine_threadsafe(coroutine, _background_loop()).result()
@@ -0,0 +1,135 @@
+"""
+This module provides a process-wide read cache for the small reference tables
+(tags, user groups, users) that every Streamlit page renders. Services read
+through it and invalidate it after their writes.
+
+Each namespace carries a version number that every invalidation bumps; a value
+loaded while an invalidation was in progress is never stored, so a stale read
+cannot overwrite a newer one. Invalidations are broadcast with Postgres NOTIFY
+and a listener thread applies those of other processes, so several Streamlit
+servers stay coherent. Entries also expire after a TTL as a safety net for
+missed notifications (e.g. behind a transaction-mode PgBouncer, where LISTEN is
+not available and the listener is not started).
+"""
+
+import os
+import select
+import threading
+import time
+import uuid
+from functools import lru_cache
+from typing import Any, Callable, Dict, Hashable, Tuple
+from sqlalchemy import func
+from sqlalchemy import select as sql_select
+import config.config as cfg
+from database.models import get_engine
+from database.session import get_db
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Namespaces cached by the services
+NAMESPACES = ("tags", "user_groups", "users")
+
+
+class ReferenceCache:
+    """
+    Version-stamped in-memory cache of reference data, kept coherent across processes with LISTEN/NOTIFY.
+    """
+
+    def __init__(self, ttl_seconds: float = cfg.REFERENCE_CACHE_TTL, channel: str = cfg.REFERENCE_CACHE_CHANNEL):
+        self.ttl_seconds = ttl_seconds
+        self.channel = channel
+        # Identifies this process in notifications, so it skips its own
+        self.origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._versions: Dict[str, int] = {namespace: 0 for namespace in NAMESPACES}
+        self._entries: Dict[Tuple[str, Hashable], Tuple[Any, int, float]] = {}
+        self._lock = threading.Lock()
+        self._listener = None
+
+    def get(self, namespace: str, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        Returns the cached value for the key, calling loader() on a miss. Cached values are
+        shared between sessions and must not be modified by callers.
+        """
+        now = time.monotonic()
+        with self._lock:
+            version = self._versions[namespace]
+            entry = self._entries.get((namespace, key))
+            if entry is not None and entry[1] == version and now - entry[2] <= self.ttl_seconds:
+                return entry[0]
+        value = loader()
+        with self._lock:
+            # Only store the value if no invalidation happened while it was loading
+            if self._versions[namespace] == version:
+                self._entries[(namespace, key)] = (value, version, now)
+        return value
+
+    def invalidate(self, *namespaces: str, broadcast: bool = True) -> None:
+        """
+        Drops the cached values of the given namespaces and, unless broadcast is False,
+        notifies the other processes. Call after the write has been committed.
+        """
+        self._invalidate_local(namespaces)
+        if broadcast and cfg.REFERENCE_CACHE_LISTEN:
+            try:
+                with get_db() as db:
+                    db.execute(sql_select(func.pg_notify(self.channel, f"{self.origin}:{','.join(namespaces)}")))
+                    db.commit()
+            except Exception as e:
+                logger.warning("Failed to broadcast reference cache invalidation of %s: %s", namespaces, e)
+
+    def _invalidate_local(self, namespaces) -> None:
+        with self._lock:
+            for namespace in namespaces:
+                self._versions[namespace] += 1
+            self._entries = {key: entry for key, entry in self._entries.items() if key[0] not in namespaces}
+
+    def start_listener(self) -> None:
+        """
+        Starts the daemon thread applying invalidations broadcast by other processes.
+        """
+        if self._listener is None:
+            self._listener = threading.Thread(target=self._listen, name="reference-cache-listener", daemon=True)
+            self._listener.start()
+
+    def _listen(self) -> None:
+        delay = 1.0
+        while True:
+            try:
+                connection = get_engine().raw_connection()
+                # The listening connection is kept for good, so take it out of the pool
+                connection.detach()
+                dbapi_connection = connection.dbapi_connection
+                dbapi_connection.autocommit = True
+                with dbapi_connection.cursor() as cursor:
+                    cursor.execute(f'LISTEN "{self.channel}"')
+                # Notifications may have been missed while disconnected
+                self._invalidate_local(NAMESPACES)
+                logger.debug("Listening for reference cache invalidations on '%s'.", self.channel)
+                delay = 1.0
+                while True:
+                    if select.select([dbapi_connection], [], [], 60)[0]:
+                        dbapi_connection.poll()
+                        while dbapi_connection.notifies:
+                            self._apply(dbapi_connection.notifies.pop(0).payload)
+            except Exception as e:
+                logger.warning("Reference cache listener disconnected (%s), reconnecting in %.0fs.", e, delay)
+                time.sleep(delay)
+                delay = min(delay * 2, 60.0)
+
+    def _apply(self, payload: str) -> None:
+        origin, _, namespaces = payload.partition(":")
+        if origin != self.origin:
+            self._invalidate_local([namespace for namespace in namespaces.split(",") if namespace in self._versions])
+
+
+@lru_cache(maxsize=None)
+def get_reference_cache() -> ReferenceCache:
+    """
+    Returns the process-wide reference cache, starting its listener when enabled.
+    """
+    cache = ReferenceCache()
+    if cfg.REFERENCE_CACHE_LISTEN and not cfg.DB_PGBOUNCER_MODE:
+        cache.start_listener()
+    return cache
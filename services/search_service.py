@@ -0,0 +1,308 @@
+"""
+This module provides semantic search over documents using the pgvector HNSW
+indexes on Document.description_vector and DocumentContent.vector, and hybrid
+search that fuses full-text (tsvector/GIN) and vector rankings with reciprocal
+rank fusion. Chunk search returns the best passages of long documents together
+with the pages they come from.
+"""
+
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple, Union
+from uuid import UUID
+from sqlalchemy import func, literal_column, select, union_all
+from sqlalchemy.orm import Session
+import config.config as cfg
+from database.models import Document, DocumentChunk, DocumentContent, document_tags
+from database.session import get_db
+from services.document_service import DocumentService
+from services.openai_service import OpenAIClient
+
+# Search targets: the short description vector or the full content vector
+SEARCH_TARGETS = ("documents", "contents")
+
+# The largest hnsw.ef_search pgvector accepts. The index returns at most ef_search rows,
+# so index searches only reach this many results deep; pages beyond it are empty.
+MAX_EF_SEARCH = 1000
+
+# Text search configuration; must match the one used by the generated search_vector columns
+SEARCH_TEXT_CONFIG = literal_column("'simple'::regconfig")
+
+
+class SearchService:
+    @staticmethod
+    def embed_query(query: Union[str, Sequence[float]]) -> List[float]:
+        """
+        Returns the query vector, embedding the query first if it is text.
+        """
+        if isinstance(query, str):
+            vector = OpenAIClient().get_text_embedding(query)
+            if vector is None:
+                raise ValueError("Failed to embed the search query.")
+            return vector
+        return list(query)
+
+    @staticmethod
+    def apply_search_settings(db: Session, ef_search: Optional[int] = None, probes: Optional[int] = None, exact: bool = False) -> None:
+        """
+        Sets the ANN tuning knobs for the current transaction only.
+
+        Args:
+            db (Session): The session whose transaction is configured.
+            ef_search (Optional[int]): HNSW candidate list size; higher means better recall, slower queries.
+            probes (Optional[int]): IVFFlat lists probed per query.
+            exact (bool): Disable index scans to get exact (sequential scan) results.
+        """
+        settings = {
+            "hnsw.ef_search": min(ef_search or cfg.SEARCH_EF_SEARCH, MAX_EF_SEARCH),
+            "ivfflat.probes": probes or cfg.SEARCH_IVFFLAT_PROBES,
+        }
+        if exact:
+            settings["enable_indexscan"] = "off"
+        db.execute(select(*[func.set_config(name, str(value), True) for name, value in settings.items()]))
+
+    @staticmethod
+    def document_filters(
+        tag_ids: Optional[List[UUID]] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        metadata: Optional[dict] = None,
+        user_id: Optional[UUID] = None) -> list:
+        """
+        Builds the WHERE clauses shared by all search modes.
+
+        Args:
+            tag_ids (Optional[List[UUID]]): Only match documents carrying any of these tags.
+            date_from (Optional[datetime]): Only match documents starting on or after this date.
+            date_to (Optional[datetime]): Only match documents ending on or before this date.
+            metadata (Optional[dict]): Only match documents whose metadata contains this JSON (uses the jsonb_path_ops index).
+            user_id (Optional[UUID]): Only match documents visible to this user.
+
+        Returns:
+            list: SQLAlchemy filter clauses on Document.
+        """
+        filters = []
+        if tag_ids:
+            filters.append(Document.id.in_(select(document_tags.c.document_id).where(document_tags.c.tag_id.in_(tag_ids))))
+        if date_from is not None:
+            filters.append(Document.start_date >= date_from)
+        if date_to is not None:
+            filters.append(Document.end_date <= date_to)
+        if metadata:
+            filters.append(Document.document_metadata.contains(metadata))
+        if user_id is not None:
+            filters.append(DocumentService.visibility_filter(user_id))
+        return filters
+
+    @staticmethod
+    def semantic_search(
+        query: Union[str, Sequence[float]],
+        k: int = cfg.SEARCH_PAGE_SIZE,
+        page: int = 1,
+        target: str = "documents",
+        tag_ids: Optional[List[UUID]] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+        exact: bool = False,
+        user_id: Optional[UUID] = None) -> List[Tuple[Document, float]]:
+        """
+        Returns the top-k documents by cosine similarity to the query.
+
+        Args:
+            query (Union[str, Sequence[float]]): Query text or a precomputed query vector.
+            k (int): The page size.
+            page (int): The 1-based page number.
+            target (str): "documents" searches descriptions, "contents" searches full text vectors.
+            tag_ids (Optional[List[UUID]]): Only return documents carrying any of these tags.
+            date_from (Optional[datetime]): Only return documents starting on or after this date.
+            date_to (Optional[datetime]): Only return documents ending on or before this date.
+            ef_search (Optional[int]): HNSW ef_search; raised automatically to cover the requested page,
+                up to MAX_EF_SEARCH, which is as deep as index searches page.
+            probes (Optional[int]): IVFFlat probes.
+            exact (bool): Run an exact search instead of using the ANN index; pages are not limited.
+            user_id (Optional[UUID]): Only return documents visible to this user.
+
+        Returns:
+            List[Tuple[Document, float]]: The documents and their cosine similarity, best first.
+        """
+        if target not in SEARCH_TARGETS:
+            raise ValueError(f"Unknown search target '{target}', expected one of {SEARCH_TARGETS}.")
+        vector = SearchService.embed_query(query)
+        offset = (max(page, 1) - 1) * k
+        if not exact:
+            # The index can only return ef_search candidates, so the page must end within them
+            k = min(k, MAX_EF_SEARCH - offset)
+            if k <= 0:
+                return []
+        ef_search = max(ef_search or cfg.SEARCH_EF_SEARCH, offset + k)
+
+        with get_db() as db:
+            SearchService.apply_search_settings(db, ef_search, probes, exact)
+            if target == "documents":
+                distance = Document.description_vector.cosine_distance(vector)
+                q = db.query(Document, distance.label("distance")).filter(Document.description_vector.isnot(None))
+            else:
+                distance = DocumentContent.vector.cosine_distance(vector)
+                q = (
+                    db.query(Document, distance.label("distance"))
+                    .join(DocumentContent, DocumentContent.document_id == Document.id)
+                    .filter(DocumentContent.vector.isnot(None))
+                )
+            q = q.filter(*SearchService.document_filters(tag_ids, date_from, date_to, user_id=user_id))
+            rows = q.order_by(distance).offset(offset).limit(k).all()
+            return [(document, 1.0 - float(row_distance)) for document, row_distance in rows]
+
+    @staticmethod
+    def hybrid_search(
+        query: str,
+        k: int = cfg.SEARCH_PAGE_SIZE,
+        page: int = 1,
+        tag_ids: Optional[List[UUID]] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        metadata: Optional[dict] = None,
+        candidates: int = cfg.SEARCH_HYBRID_CANDIDATES,
+        rrf_k: int = cfg.SEARCH_RRF_K,
+        text_weight: float = 1.0,
+        vector_weight: float = 1.0,
+        ef_search: Optional[int] = None,
+        user_id: Optional[UUID] = None) -> List[Tuple[Document, float]]:
+        """
+        Fuses full-text and vector rankings with reciprocal rank fusion in one SQL statement.
+
+        The text ranking matches the query against the generated search_vector columns of
+        documents (file name, description, metadata) and document_contents (raw content),
+        so exact identifiers such as contract or invoice numbers are found even when the
+        embedding misses them. Each ranking contributes weight / (rrf_k + rank).
+
+        Args:
+            query (str): The search query; websearch syntax ("quoted phrases", -exclusions, or) is supported.
+            k (int): The page size.
+            page (int): The 1-based page number.
+            tag_ids (Optional[List[UUID]]): Only return documents carrying any of these tags.
+            date_from (Optional[datetime]): Only return documents starting on or after this date.
+            date_to (Optional[datetime]): Only return documents ending on or before this date.
+            metadata (Optional[dict]): Only return documents whose metadata contains this JSON.
+            candidates (int): How many candidates each ranking contributes before fusion; raised
+                automatically to cover the requested page, up to MAX_EF_SEARCH, which is as deep
+                as hybrid searches page.
+            rrf_k (int): The RRF damping constant.
+            text_weight (float): Weight of the full-text ranking.
+            vector_weight (float): Weight of the vector ranking.
+            ef_search (Optional[int]): HNSW ef_search for the vector candidates.
+            user_id (Optional[UUID]): Only return documents visible to this user.
+
+        Returns:
+            List[Tuple[Document, float]]: The documents and their fused score, best first.
+        """
+        vector = SearchService.embed_query(query)
+        offset = (max(page, 1) - 1) * k
+        # The vector ranking comes from the index, which returns at most ef_search candidates
+        k = min(k, MAX_EF_SEARCH - offset)
+        if k <= 0:
+            return []
+        candidates = min(max(candidates, offset + k), MAX_EF_SEARCH)
+        filters = SearchService.document_filters(tag_ids, date_from, date_to, metadata, user_id)
+        tsquery = func.websearch_to_tsquery(SEARCH_TEXT_CONFIG, query)
+
+        distance = Document.description_vector.cosine_distance(vector)
+        vector_candidates = (
+            select(Document.id, distance.label("distance"))
+            .where(Document.description_vector.isnot(None), *filters)
+            .order_by(distance)
+            .limit(candidates)
+            .subquery()
+        )
+        vector_hits = select(
+            vector_candidates.c.id,
+            func.row_number().over(order_by=vector_candidates.c.distance).label("rank"),
+        ).cte("vector_hits")
+
+        document_rank = func.ts_rank_cd(Document.search_vector, tsquery)
+        document_matches = (
+            select(Document.id.label("id"), document_rank.label("score"))
+            .where(Document.search_vector.op("@@")(tsquery), *filters)
+            .order_by(document_rank.desc())
+            .limit(candidates)
+            .subquery()
+        )
+        content_rank = func.ts_rank_cd(DocumentContent.search_vector, tsquery)
+        content_matches = (
+            select(DocumentContent.document_id.label("id"), content_rank.label("score"))
+            .join(Document, Document.id == DocumentContent.document_id)
+            .where(DocumentContent.search_vector.op("@@")(tsquery), *filters)
+            .order_by(content_rank.desc())
+            .limit(candidates)
+            .subquery()
+        )
+        text_matches = union_all(select(document_matches), select(content_matches)).subquery()
+        text_hits = (
+            select(
+                text_matches.c.id,
+                func.row_number().over(order_by=func.max(text_matches.c.score).desc()).label("rank"),
+            )
+            .group_by(text_matches.c.id)
+            .cte("text_hits")
+        )
+
+        score = (
+            func.coalesce(vector_weight / (rrf_k + vector_hits.c.rank), 0.0)
+            + func.coalesce(text_weight / (rrf_k + text_hits.c.rank), 0.0)
+        )
+        fused = (
+            select(func.coalesce(vector_hits.c.id, text_hits.c.id).label("id"), score.label("score"))
+            .select_from(vector_hits.join(text_hits, vector_hits.c.id == text_hits.c.id, full=True))
+            .cte("fused")
+        )
+
+        with get_db() as db:
+            SearchService.apply_search_settings(db, max(ef_search or cfg.SEARCH_EF_SEARCH, candidates))
+            rows = (
+                db.query(Document, fused.c.score)
+                .join(fused, fused.c.id == Document.id)
+                .order_by(fused.c.score.desc(), Document.id)
+                .offset(offset)
+                .limit(k)
+                .all()
+            )
+            return [(document, float(row_score)) for document, row_score in rows]
+
+    @staticmethod
+    def search_chunks(
+        query: Union[str, Sequence[float]],
+        k: int = cfg.SEARCH_PAGE_SIZE,
+        tag_ids: Optional[List[UUID]] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        ef_search: Optional[int] = None,
+        user_id: Optional[UUID] = None) -> List[Tuple[DocumentChunk, Document, float]]:
+        """
+        Returns the top-k document chunks by cosine similarity to the query.
+
+        Args:
+            query (Union[str, Sequence[float]]): Query text or a precomputed query vector.
+            k (int): The number of chunks to return.
+            tag_ids (Optional[List[UUID]]): Only return chunks of documents carrying any of these tags.
+            date_from (Optional[datetime]): Only return chunks of documents starting on or after this date.
+            date_to (Optional[datetime]): Only return chunks of documents ending on or before this date.
+            ef_search (Optional[int]): HNSW ef_search.
+            user_id (Optional[UUID]): Only return chunks of documents visible to this user.
+
+        Returns:
+            List[Tuple[DocumentChunk, Document, float]]: The chunks (with page_start/page_end),
+            their documents and their cosine similarity, best first.
+        """
+        vector = SearchService.embed_query(query)
+        with get_db() as db:
+            SearchService.apply_search_settings(db, max(ef_search or cfg.SEARCH_EF_SEARCH, k))
+            distance = DocumentChunk.vector.cosine_distance(vector)
+            rows = (
+                db.query(DocumentChunk, Document, distance.label("distance"))
+                .join(Document, Document.id == DocumentChunk.document_id)
+                .filter(DocumentChunk.vector.isnot(None), *SearchService.document_filters(tag_ids, date_from, date_to, user_id=user_id))
+                .order_by(distance)
+                .limit(k)
+                .all()
+            )
+            return [(chunk, document, 1.0 - float(row_distance)) for chunk, document, row_distance in rows]
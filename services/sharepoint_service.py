@@ -1,28 +1,299 @@
+"""
+This module uploads files to a SharePoint document library.
+
+SharePointStorage keeps a pool of authenticated ClientContexts, so a context is
+authenticated once and then reused by the following uploads rather than once per
+file. Files up to one chunk are uploaded in a single request; larger files go
+through a chunked upload session (StartUpload, ContinueUpload, FinishUpload) that
+reads the stream one chunk ahead, so at most two chunks are held in memory
+regardless of the file size. A failed chunk is resent at the same offset of the
+same session, so a transient error does not restart the upload. upload_many
+uploads files concurrently, one pooled context per upload in flight.
+
+    storage = get_sharepoint_storage()
+    result = storage.upload_file("invoices/2026-001.pdf")
+    logger.info("%s at %.1f MB/s", result.url, result.throughput / 1e6)
+
+SharePointStorage is also the 'sharepoint' backend of services.storage_service,
+which stores objects as files of the folder named by their keys; reads are
+streamed with HTTP range requests.
+
+Tests and local runs can point the storage at a stub server by passing a
+context_factory that builds a ClientContext for the stub's URL.
+"""
+
+import os
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import IO, Callable, Iterable, Iterator, List, Optional, Tuple, Union
+from urllib.parse import quote, urlparse
+from io import BytesIO
+from office365.runtime.http.request_options import RequestOptions
 from office365.sharepoint.client_context import ClientContext
+from requests import RequestException
 import config.config as cfg
-import streamlit as st
-from typing import Union, Optional, IO
+from services.storage_service import BlobStorage
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
 
 # SharePoint configuration
 SHAREPOINT_SITE_URL: str = cfg.SHAREPOINT_SITE_URL
 SHAREPOINT_USERNAME: str = cfg.SHAREPOINT_USERNAME
 SHAREPOINT_PASSWORD: str = cfg.SHAREPOINT_PASSWORD
 
+
+@dataclass
+class UploadResult:
+    """
+    A completed upload.
+    """
+    name: str
+    url: str
+    size: int
+    seconds: float
+
+    @property
+    def throughput(self) -> float:
+        """
+        Bytes uploaded per second.
+        """
+        return self.size / self.seconds if self.seconds > 0 else float("inf")
+
+
+def _read_chunk(stream: IO[bytes], size: int) -> bytes:
+    """
+    Reads up to size bytes, fewer only at the end of the stream.
+    """
+    parts = []
+    remaining = size
+    while remaining:
+        part = stream.read(remaining)
+        if not part:
+            break
+        parts.append(part)
+        remaining -= len(part)
+    return b"".join(parts)
+
+
+class SharePointStorage(BlobStorage):
+    """
+    Uploads files to one folder of a SharePoint site.
+    """
+
+    def __init__(
+        self,
+        site_url: str = SHAREPOINT_SITE_URL,
+        folder: str = cfg.SHAREPOINT_FOLDER,
+        username: str = SHAREPOINT_USERNAME,
+        password: str = SHAREPOINT_PASSWORD,
+        chunk_size: int = cfg.SHAREPOINT_CHUNK_SIZE,
+        concurrency: int = cfg.SHAREPOINT_UPLOAD_CONCURRENCY,
+        chunk_retries: int = cfg.SHAREPOINT_CHUNK_RETRIES,
+        context_factory: Optional[Callable[[], ClientContext]] = None):
+        self.site_url = site_url.rstrip("/")
+        self.folder_url = "/" + "/".join(part for part in (urlparse(self.site_url).path.strip("/"), folder.strip("/")) if part)
+        self.chunk_size = chunk_size
+        self.concurrency = concurrency
+        self.chunk_retries = chunk_retries
+        self._context_factory = context_factory or (
+            lambda: ClientContext(self.site_url).with_user_credentials(username, password)
+        )
+        self._contexts: "queue.LifoQueue[ClientContext]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(concurrency)
+
+    @contextmanager
+    def context(self) -> Iterator[ClientContext]:
+        """
+        Lends an authenticated context from the pool, creating one if none is idle. A context whose
+        request failed is dropped, so a broken session is not reused.
+        """
+        with self._slots:
+            try:
+                ctx = self._contexts.get_nowait()
+            except queue.Empty:
+                ctx = self._context_factory()
+            yield ctx
+            self._contexts.put(ctx)
+
+    def url_of(self, name: str) -> str:
+        """
+        Returns the URL of a file of the folder.
+        """
+        return f"{urlparse(self.site_url)._replace(path='').geturl()}{quote(self.folder_url)}/{quote(name)}"
+
+    def _execute(self, ctx: ClientContext, queue_request: Callable[[], object], what: str) -> None:
+        # Queries are dequeued before they run, so a failed one is queued again for the retry
+        for attempt in range(self.chunk_retries + 1):
+            queue_request()
+            try:
+                ctx.execute_query()
+                return
+            except RequestException as e:
+                if attempt == self.chunk_retries:
+                    raise
+                delay = 2 ** attempt
+                logger.warning("SharePoint %s failed (attempt %d), retrying in %ds: %s", what, attempt + 1, delay, e)
+                time.sleep(delay)
+
+    def upload(self, stream: IO[bytes], name: str) -> UploadResult:
+        """
+        Uploads a binary stream from its current position, replacing a file of the same name.
+
+        Args:
+            stream (IO[bytes]): The content to upload.
+            name (str): The file name in the folder.
+
+        Returns:
+            UploadResult: The URL, size and duration of the upload.
+        """
+        started = time.monotonic()
+        with self.context() as ctx:
+            folder = ctx.web.get_folder_by_server_relative_url(self.folder_url)
+            chunk = _read_chunk(stream, self.chunk_size)
+            following = _read_chunk(stream, self.chunk_size) if len(chunk) == self.chunk_size else b""
+            if not following:
+                self._execute(ctx, lambda: folder.upload_file(name, chunk), f"upload of {name}")
+                size = len(chunk)
+            else:
+                size = self._upload_session(ctx, folder, stream, name, chunk, following)
+        result = UploadResult(name, self.url_of(name), size, time.monotonic() - started)
+        logger.info(
+            "Uploaded %s to SharePoint (%d bytes) in %.2fs, %.2f MB/s.",
+            name, result.size, result.seconds, result.throughput / 1e6,
+        )
+        return result
+
+    def _upload_session(self, ctx: ClientContext, folder, stream: IO[bytes], name: str, chunk: bytes, following: bytes) -> int:
+        self._execute(ctx, lambda: folder.files.add(name, None, True), f"creation of {name}")
+        file = ctx.web.get_file_by_server_relative_url(f"{self.folder_url}/{name}")
+        upload_id = str(uuid.uuid4())
+        offset = 0
+        try:
+            self._execute(ctx, lambda: file.start_upload(upload_id, chunk), f"chunk 0 of {name}")
+            offset += len(chunk)
+            # The chunk read ahead tells whether the current one is the last
+            while True:
+                chunk, following = following, _read_chunk(stream, self.chunk_size)
+                if not following:
+                    self._execute(ctx, lambda: file.finish_upload(upload_id, offset, chunk), f"last chunk of {name}")
+                    return offset + len(chunk)
+                self._execute(ctx, lambda: file.continue_upload(upload_id, offset, chunk), f"chunk at {offset} of {name}")
+                offset += len(chunk)
+        except BaseException:
+            try:
+                file.cancel_upload(upload_id)
+                ctx.execute_query()
+            except RequestException as e:
+                logger.warning("Failed to cancel the SharePoint upload of %s: %s", name, e)
+            raise
+
+    def upload_file(self, path: str, name: Optional[str] = None) -> UploadResult:
+        """
+        Uploads a local file, under its own name unless another is given.
+        """
+        with open(path, "rb") as stream:
+            return self.upload(stream, name or os.path.basename(path))
+
+    def put(self, stream: IO[bytes], key: str) -> None:
+        self.upload(stream, key)
+
+    def put_file(self, path: str, key: str) -> None:
+        self.upload_file(path, key)
+
+    def _get_file(self, key: str):
+        with self.context() as ctx:
+            file = ctx.web.get_file_by_server_relative_url(f"{self.folder_url}/{key}").get()
+            ctx.execute_query()
+            return file
+
+    def exists(self, key: str) -> bool:
+        try:
+            self._get_file(key)
+            return True
+        except RequestException as e:
+            if getattr(e.response, "status_code", None) == 404:
+                return False
+            raise
+
+    def size(self, key: str) -> int:
+        return self._get_file(key).length
+
+    def url(self, key: str, expires_in: int = 3600) -> Optional[str]:
+        # Opened with the user's own SharePoint sign-in, so the link does not expire
+        return self.url_of(key)
+
+    def stream(self, key: str, start: int = 0, end: Optional[int] = None, chunk_size: int = cfg.STORAGE_CHUNK_SIZE) -> Iterator[bytes]:
+        if end is not None and end <= start:
+            return
+        with self.context() as ctx:
+            path = f"{self.folder_url}/{key}".replace("'", "''")
+            request = RequestOptions(f"{ctx.service_root_url}/web/getFileByServerRelativePath(DecodedUrl='{quote(path)}')/$value")
+            request.stream = True
+            if start or end is not None:
+                # HTTP byte ranges are inclusive
+                request.set_header("Range", f"bytes={start}-{'' if end is None else end - 1}")
+            response = ctx.pending_request().execute_request_direct(request)
+        # The response holds its own connection, so the context and its slot are back in the pool
+        # while the caller reads the body, however slowly
+        try:
+            yield from response.iter_content(chunk_size)
+        finally:
+            response.close()
+
+    def upload_many(self, items: Iterable[Tuple[Union[str, IO[bytes]], str]]) -> List[Optional[UploadResult]]:
+        """
+        Uploads (path or stream, name) pairs concurrently.
+
+        Returns:
+            List[Optional[UploadResult]]: The result of each upload, None for the failed ones.
+        """
+        def _upload(item: Tuple[Union[str, IO[bytes]], str]) -> Optional[UploadResult]:
+            source, name = item
+            try:
+                return self.upload_file(source, name) if isinstance(source, str) else self.upload(source, name)
+            except Exception as e:
+                logger.error("Failed to upload %s to SharePoint: %s", name, e)
+                return None
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="sharepoint-upload") as executor:
+            results = list(executor.map(_upload, items))
+        uploaded = [result for result in results if result]
+        seconds = time.monotonic() - started
+        total = sum(result.size for result in uploaded)
+        logger.info(
+            "Uploaded %d of %d files to SharePoint (%d bytes) in %.2fs, %.2f MB/s.",
+            len(uploaded), len(results), total, seconds, total / seconds / 1e6 if seconds > 0 else 0.0,
+        )
+        return results
+
+
+@lru_cache(maxsize=None)
+def get_sharepoint_storage() -> SharePointStorage:
+    """
+    Returns the process-wide storage for the configured site and folder.
+    """
+    return SharePointStorage()
+
+
 def upload_to_sharepoint(file: Union[bytes, IO], file_name: str) -> Optional[str]:
     """
     Uploads a file to SharePoint.
-    
+
     :param file: The file to upload (bytes or file-like object).
     :param file_name: The name of the file to be saved as in SharePoint.
     :return: The URL of the uploaded file.
     """
-    ctx: ClientContext = ClientContext(SHAREPOINT_SITE_URL).with_credentials(SHAREPOINT_USERNAME, SHAREPOINT_PASSWORD)
-
     try:
-        target_folder = ctx.web.get_folder_by_server_relative_url("/sites/yoursite/Documents")
-        target_folder.upload_file(file_name, file.read()).execute_query()
-        file_url: str = f"{SHAREPOINT_SITE_URL}/sites/yoursite/Documents/{file_name}"
-        return file_url
+        stream = BytesIO(file) if isinstance(file, (bytes, bytearray)) else file
+        return get_sharepoint_storage().upload(stream, file_name).url
     except Exception as e:
-        st.error(f"Failed to upload file to SharePoint: {e}")
+        logger.error("Failed to upload file to SharePoint: %s", e)
         return None
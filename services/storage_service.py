@@ -0,0 +1,170 @@
+"""
+This module stores the files of documents in a blob storage selected by
+STORAGE_BACKEND:
+
+    local       a directory (STORAGE_DIR), LocalStorage below
+    s3          an S3 bucket or S3-compatible server, services.aws_service.S3Storage
+    sharepoint  a SharePoint folder, services.sharepoint_service.SharePointStorage
+
+Objects are content-addressed: the key of a file is its SHA-256 plus its
+extension, and Document.file_path holds that key. Storing a file whose key exists
+is a no-op, so re-uploads and retried jobs never transfer the file again, and
+moving to another backend is a matter of copying the objects.
+
+Reads are streamed in STORAGE_CHUNK_SIZE chunks and may be limited to a byte
+range. Backends that can hand out a direct link (S3 presigned URLs, SharePoint
+file URLs) return it from url(); the search page offers downloads through it only,
+so files never pass through the app:
+
+    storage = get_storage()
+    key = storage.store_file("invoices/2026-001.pdf", content_hash)
+    header = storage.read_range(key, 0, 1024)
+    for chunk in storage.stream(key):
+        ...
+"""
+
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import IO, Iterator, Optional
+import config.config as cfg
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def object_key(content_hash: str, file_name: str) -> str:
+    """
+    Returns the content-addressed key of a file: its SHA-256 plus its lower-case extension.
+    """
+    return content_hash + os.path.splitext(file_name)[1].lower()
+
+
+class BlobStorage(ABC):
+    """
+    Stores and streams objects by key. Backends implement put, exists, size and stream, and url if they can.
+    """
+
+    @abstractmethod
+    def put(self, stream: IO[bytes], key: str) -> None:
+        """
+        Stores the stream, read from its current position, under the key.
+        """
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        """
+        Returns whether an object is stored under the key.
+        """
+
+    @abstractmethod
+    def size(self, key: str) -> int:
+        """
+        Returns the size of the object in bytes.
+        """
+
+    @abstractmethod
+    def stream(self, key: str, start: int = 0, end: Optional[int] = None, chunk_size: int = cfg.STORAGE_CHUNK_SIZE) -> Iterator[bytes]:
+        """
+        Yields the bytes [start, end) of the object in chunks of at most chunk_size; to the end if end is None.
+        """
+
+    def url(self, key: str, expires_in: int = 3600) -> Optional[str]:
+        """
+        Returns a URL clients can download the object from directly, or None if the backend has none.
+        """
+        return None
+
+    def read_range(self, key: str, start: int, end: int) -> bytes:
+        """
+        Returns the bytes [start, end) of the object.
+        """
+        return b"".join(self.stream(key, start, end))
+
+    def put_file(self, path: str, key: str) -> None:
+        with open(path, "rb") as stream:
+            self.put(stream, key)
+
+    def store_file(self, path: str, content_hash: str, file_name: Optional[str] = None) -> str:
+        """
+        Stores a local file under its content-addressed key unless the key exists.
+
+        Args:
+            path (str): The file to store.
+            content_hash (str): The SHA-256 of the file.
+            file_name (Optional[str]): The name whose extension the key takes; the path's by default.
+
+        Returns:
+            str: The key of the object, for Document.file_path.
+        """
+        key = object_key(content_hash, file_name or path)
+        if self.exists(key):
+            logger.debug("Object %s already stored.", key)
+        else:
+            self.put_file(path, key)
+            logger.info("Stored %s as %s.", path, key)
+        return key
+
+
+class LocalStorage(BlobStorage):
+    """
+    Stores objects as files of a directory.
+    """
+
+    def __init__(self, root: str = cfg.STORAGE_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path_of(self, key: str) -> str:
+        # File paths stored before the storage existed are absolute, which os.path.join keeps as they are
+        return os.path.join(self.root, key)
+
+    def put(self, stream: IO[bytes], key: str) -> None:
+        # Written to a temporary file and renamed, so readers never see a partial object
+        descriptor, temporary = tempfile.mkstemp(prefix=".upload-", dir=self.root)
+        try:
+            with os.fdopen(descriptor, "wb") as target:
+                while True:
+                    chunk = stream.read(cfg.STORAGE_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    target.write(chunk)
+            os.replace(temporary, self.path_of(key))
+        except BaseException:
+            os.remove(temporary)
+            raise
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self.path_of(key))
+
+    def size(self, key: str) -> int:
+        return os.path.getsize(self.path_of(key))
+
+    def stream(self, key: str, start: int = 0, end: Optional[int] = None, chunk_size: int = cfg.STORAGE_CHUNK_SIZE) -> Iterator[bytes]:
+        with open(self.path_of(key), "rb") as source:
+            source.seek(start)
+            remaining = None if end is None else end - start
+            while remaining is None or remaining > 0:
+                chunk = source.read(chunk_size if remaining is None else min(chunk_size, remaining))
+                if not chunk:
+                    return
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+
+@lru_cache(maxsize=None)
+def get_storage(backend: str = cfg.STORAGE_BACKEND) -> BlobStorage:
+    """
+    Returns the process-wide storage of the backend.
+    """
+    if backend == "local":
+        return LocalStorage()
+    if backend == "s3":
+        from services.aws_service import S3Storage
+        return S3Storage()
+    if backend == "sharepoint":
+        from services.sharepoint_service import get_sharepoint_storage
+        return get_sharepoint_storage()
+    raise ValueError(f"Unknown storage backend '{backend}'.")
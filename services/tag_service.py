@@ -1,7 +1,9 @@
 from typing import List, Optional
 from uuid import UUID
-from database.models import Tag
+from sqlalchemy import delete, exists
+from database.models import Tag, document_tags
 from database.session import get_db
+from services.reference_cache import get_reference_cache
 
 class TagService:
     @staticmethod
@@ -28,7 +30,8 @@ class TagService:
             db.add(new_tag)
             db.commit()
             db.refresh(new_tag)
-            return new_tag
+        get_reference_cache().invalidate("tags", "user_groups")
+        return new_tag
 
     @staticmethod
     def get_all_tags() -> List[Tag]:
@@ -38,8 +41,11 @@ class TagService:
         Returns:
             List[Tag]: A list of all Tag objects.
         """
-        with get_db() as db:
-            return db.query(Tag).order_by(Tag.tag_name).all()
+        def load() -> List[Tag]:
+            with get_db() as db:
+                return db.query(Tag).order_by(Tag.tag_name).all()
+
+        return get_reference_cache().get("tags", "all", load)
 
     @staticmethod
     def get_tag_by_id(tag_id: UUID) -> Optional[Tag]:
@@ -52,8 +58,11 @@ class TagService:
         Returns:
             Optional[Tag]: The Tag object if found, otherwise None.
         """
-        with get_db() as db:
-            return db.query(Tag).filter(Tag.id == tag_id).first()
+        def load() -> Optional[Tag]:
+            with get_db() as db:
+                return db.query(Tag).filter(Tag.id == tag_id).first()
+
+        return get_reference_cache().get("tags", ("id", tag_id), load)
 
     @staticmethod
     def delete_tag(tag_id: UUID) -> bool:
@@ -67,12 +76,14 @@ class TagService:
             bool: True if the tag was deleted, False otherwise.
         """
         with get_db() as db:
-            tag = db.query(Tag).filter(Tag.id == tag_id).first()
-            if tag and not tag.documents:
-                db.delete(tag)
-                db.commit()
-                return True
-            return False
+            # One statement: the tag's group and visibility links go with it through ON DELETE CASCADE
+            result = db.execute(
+                delete(Tag).where(Tag.id == tag_id, ~exists().where(document_tags.c.tag_id == Tag.id))
+            )
+            db.commit()
+        if result.rowcount:
+            get_reference_cache().invalidate("tags", "user_groups")
+        return result.rowcount > 0
 
     @staticmethod
     def can_be_deleted(tag: Tag) -> bool:
@@ -85,7 +96,8 @@ class TagService:
         Returns:
             bool: True if the tag can be deleted, False otherwise.
         """
-        return len(tag.documents) == 0
+        with get_db() as db:
+            return not db.query(exists().where(document_tags.c.tag_id == tag.id)).scalar()
 
     @staticmethod
     def update_tag(tag_id: UUID, new_name: str, notify: Optional[bool] = None, notification_days_before_expiry: Optional[int] = None, notification_frequency: Optional[int] = None) -> Optional[Tag]:
@@ -114,5 +126,6 @@ class TagService:
                     tag.notification_frequency = notification_frequency
                 db.commit()
                 db.refresh(tag)
+                get_reference_cache().invalidate("tags", "user_groups")
                 return tag
             return None
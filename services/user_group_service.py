@@ -4,8 +4,11 @@ including creating, fetching, updating, and deleting user group records in the d
 """
 
 from typing import List, Optional
-from database.models import UserGroup, Tag
+from sqlalchemy import delete, exists
+from sqlalchemy.orm import selectinload
+from database.models import User, UserGroup, Tag
 from database.session import get_db
+from services.reference_cache import get_reference_cache
 from uuid import UUID
 
 class UserGroupService:
@@ -32,7 +35,8 @@ class UserGroupService:
             db.add(new_group)
             db.commit()
             db.refresh(new_group)
-            return new_group
+        get_reference_cache().invalidate("user_groups")
+        return new_group
 
     @staticmethod
     def fetch_all_user_groups() -> List[UserGroup]:
@@ -42,8 +46,12 @@ class UserGroupService:
         Returns:
         List[UserGroup]: A list of UserGroup objects.
         """
-        with get_db() as db:
-            return db.query(UserGroup).order_by(UserGroup.group_name).all()
+        def load() -> List[UserGroup]:
+            with get_db() as db:
+                # Tags are loaded with one extra query for all groups, so pages can read group.tags
+                return db.query(UserGroup).options(selectinload(UserGroup.tags)).order_by(UserGroup.group_name).all()
+
+        return get_reference_cache().get("user_groups", "all", load)
 
     @staticmethod
     def get_user_group_by_id(group_id: UUID) -> Optional[UserGroup]:
@@ -56,8 +64,11 @@ class UserGroupService:
         Returns:
         Optional[UserGroup]: The UserGroup object if found, otherwise None.
         """
-        with get_db() as db:
-            return db.query(UserGroup).filter(UserGroup.id == group_id).first()
+        def load() -> Optional[UserGroup]:
+            with get_db() as db:
+                return db.query(UserGroup).options(selectinload(UserGroup.tags)).filter(UserGroup.id == group_id).first()
+
+        return get_reference_cache().get("user_groups", ("id", group_id), load)
 
     @staticmethod
     def get_tags_for_group(group_id: UUID) -> List[Tag]:
@@ -70,8 +81,12 @@ class UserGroupService:
         Returns:
         List[Tag]: A list of Tag objects associated with the user group.
         """
-        with get_db() as db:
-            return db.query(Tag).join(UserGroup.tags).filter(UserGroup.id == group_id).all()
+        def load() -> List[Tag]:
+            with get_db() as db:
+                return db.query(Tag).join(UserGroup.tags).filter(UserGroup.id == group_id).all()
+
+        # Tag writes invalidate the user_groups namespace too, so this stays fresh
+        return get_reference_cache().get("user_groups", ("tags", group_id), load)
 
     @staticmethod
     def update_user_group(group_id: UUID, group_name: Optional[str] = None, tag_ids: Optional[List[UUID]] = None) -> Optional[UserGroup]:
@@ -87,7 +102,7 @@ class UserGroupService:
         Optional[UserGroup]: The updated UserGroup object if the group was found and updated, otherwise None.
         """
         with get_db() as db:
-            group = db.query(UserGroup).filter(UserGroup.id == group_id).first()
+            group = db.query(UserGroup).options(selectinload(UserGroup.tags)).filter(UserGroup.id == group_id).first()
             if group:
                 if group_name:
                     group.group_name = group_name
@@ -101,6 +116,7 @@ class UserGroupService:
                         group.tags = []
                 db.commit()
                 db.refresh(group)
+                get_reference_cache().invalidate("user_groups", "users")
             return group
 
     @staticmethod
@@ -115,16 +131,14 @@ class UserGroupService:
         bool: True if the user group was deleted, otherwise False.
         """
         with get_db() as db:
-            group = db.query(UserGroup).filter(UserGroup.id == group_id).first()
-            if group:
-                if group.can_be_deleted():
-                    db.delete(group)
-                    db.commit()
-                    return True
-                else:
-                    # Log or handle the case where the group cannot be deleted
-                    print(f"Cannot delete UserGroup '{group.group_name}' because it has associated users.")
-            return False
+            # One statement instead of loading the group and its users; tag links cascade
+            result = db.execute(
+                delete(UserGroup).where(UserGroup.id == group_id, ~exists().where(User.user_group_id == UserGroup.id))
+            )
+            db.commit()
+        if result.rowcount:
+            get_reference_cache().invalidate("user_groups", "users")
+        return result.rowcount > 0
 
     @staticmethod
     def update_user_group_tags(group_id: UUID, tag_ids: List[UUID]) -> Optional[UserGroup]:
@@ -139,7 +153,7 @@ class UserGroupService:
         Optional[UserGroup]: The updated UserGroup object if the group was found and updated, otherwise None.
         """
         with get_db() as db:
-            group = db.query(UserGroup).filter(UserGroup.id == group_id).first()
+            group = db.query(UserGroup).options(selectinload(UserGroup.tags)).filter(UserGroup.id == group_id).first()
             if group:
                 # Fetch the tags by their UUIDs
                 tags = db.query(Tag).filter(Tag.id.in_(tag_ids)).all()
@@ -147,4 +161,5 @@ class UserGroupService:
                 group.tags = tags
                 db.commit()
                 db.refresh(group)
+                get_reference_cache().invalidate("user_groups")
             return group
@@ -3,12 +3,81 @@ This module provides functions for user management in a Streamlit application,
 including creating, fetching, updating, and deleting user records in the database.
 """
 
-from typing import List, Optional
-from database.models import User
+import csv
+import io
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Dict, IO, List, Optional, Union
+from sqlalchemy import or_, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import joinedload
+import bcrypt
+import config.config as cfg
+from database.models import User, UserGroup
 from database.session import get_db
-import streamlit_authenticator as stauth
+from services.reference_cache import get_reference_cache
+from utils.logger import get_logger
 from uuid import UUID
 
+logger = get_logger(__name__)
+
+# Columns expected in bulk import files; group is the user group name
+IMPORT_FIELDS = ("username", "email", "password", "group")
+
+
+def hash_password(password: str, rounds: int = cfg.BCRYPT_ROUNDS) -> str:
+    """
+    Hashes a password with bcrypt at the configured work factor. The hashes are compatible
+    with streamlit_authenticator's. Module-level so it can run in a process pool.
+    """
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds)).decode()
+
+
+def hash_passwords(passwords: List[str]) -> List[str]:
+    """
+    Hashes a batch of passwords; one task of the process pool.
+    """
+    return [hash_password(password) for password in passwords]
+
+
+@lru_cache(maxsize=None)
+def _hash_pool() -> ProcessPoolExecutor:
+    """
+    Returns the process-wide pool of PASSWORD_HASH_WORKERS processes hashing passwords, started
+    on first use and then kept, so bcrypt never holds the GIL of the Streamlit server and single
+    users don't pay for a pool start.
+    """
+    return ProcessPoolExecutor(max_workers=cfg.PASSWORD_HASH_WORKERS)
+
+
+# A forked child cannot use its parent's pool
+os.register_at_fork(after_in_child=_hash_pool.cache_clear)
+
+
+def _hash_in_pool(password: str) -> str:
+    return _hash_pool().submit(hash_password, password).result()
+
+
+def load_user_records(fileobj: Union[IO, bytes, str], file_name: str) -> List[Dict[str, str]]:
+    """
+    Reads user records from a CSV file (with a header row) or a JSON array of objects.
+
+    :param fileobj: The file contents or a file-like object.
+    :param file_name: The file name; its extension selects the format.
+    :return: One dict per user with the IMPORT_FIELDS keys.
+    """
+    content = fileobj if isinstance(fileobj, (bytes, str)) else fileobj.read()
+    if isinstance(content, bytes):
+        content = content.decode("utf-8-sig")
+    if file_name.lower().endswith(".json"):
+        rows = json.loads(content)
+    else:
+        rows = list(csv.DictReader(io.StringIO(content)))
+    return [{field: str(row.get(field) or "").strip() for field in IMPORT_FIELDS} for row in rows]
+
 class UserService:
     @staticmethod
     def create_user(
@@ -28,8 +97,8 @@ class UserService:
         Returns:
         User: The created User object.
         """
+        hashed_password = _hash_in_pool(password)
         with get_db() as db:
-            hashed_password = stauth.Hasher([password]).generate()[0]
             new_user = User(
                 username=username,
                 email=email, 
@@ -39,7 +108,8 @@ class UserService:
             db.add(new_user)
             db.commit()
             db.refresh(new_user)
-            return new_user
+        get_reference_cache().invalidate("users")
+        return new_user
 
     @staticmethod
     def fetch_all_users() -> List[User]:
@@ -49,8 +119,12 @@ class UserService:
         Returns:
         List[User]: A list of User objects.
         """
-        with get_db() as db:
-            return db.query(User).order_by(User.username).all()
+        def load() -> List[User]:
+            with get_db() as db:
+                # Many-to-one, so the group is joined into the same query
+                return db.query(User).options(joinedload(User.user_group)).order_by(User.username).all()
+
+        return get_reference_cache().get("users", "all", load)
 
     @staticmethod
     def get_user_by_id(user_id: UUID) -> Optional[User]:
@@ -60,11 +134,29 @@ class UserService:
         Parameters:
         user_id (UUID): The ID of the user to retrieve.
 
+        Returns:
+        Optional[User]: The User object if found, otherwise None.
+        """
+        def load() -> Optional[User]:
+            with get_db() as db:
+                return db.query(User).options(joinedload(User.user_group)).filter(User.id == user_id).first()
+
+        return get_reference_cache().get("users", ("id", user_id), load)
+
+    @staticmethod
+    def get_user_by_email(email: str) -> Optional[User]:
+        """
+        Retrieves a user by their email address (unique, so served by its index).
+        Not cached, so logins always see the current password hash.
+
+        Parameters:
+        email (str): The email address of the user to retrieve.
+
         Returns:
         Optional[User]: The User object if found, otherwise None.
         """
         with get_db() as db:
-            return db.query(User).filter(User.id == user_id).first()
+            return db.query(User).filter(User.email == email).first()
 
     @staticmethod
     def update_user(
@@ -86,6 +178,8 @@ class UserService:
         Returns:
         Optional[User]: The updated User object if the user was found and updated, otherwise None.
         """
+        # Hashed before the session opens, so no connection is held meanwhile
+        hashed_password = _hash_in_pool(password) if password else None
         with get_db() as db:
             user = db.query(User).filter(User.id == user_id).first()
             if user:
@@ -93,13 +187,13 @@ class UserService:
                     user.username = username
                 if email:
                     user.email = email
-                if password:
-                    hashed_password = stauth.Hasher([password]).generate()[0]
+                if hashed_password:
                     user.password = hashed_password
                 if user_group_id is not None:
                     user.user_group_id = user_group_id
                 db.commit()
                 db.refresh(user)
+                get_reference_cache().invalidate("users")
             return user
 
     @staticmethod
@@ -118,6 +212,7 @@ class UserService:
             if user:
                 db.delete(user)
                 db.commit()
+                get_reference_cache().invalidate("users")
                 return True
             return False
 
@@ -132,5 +227,81 @@ class UserService:
         Returns:
         List[User]: A list of User objects belonging to the specified group.
         """
+        def load() -> List[User]:
+            with get_db() as db:
+                return db.query(User).filter(User.user_group_id == user_group_id).all()
+
+        return get_reference_cache().get("users", ("group", user_group_id), load)
+
+    @staticmethod
+    def import_users(records: List[Dict[str, str]], workers: int = cfg.PASSWORD_HASH_WORKERS) -> Dict[str, Union[int, float, List[str]]]:
+        """
+        Creates many users at once. Group names are resolved in one query, users whose
+        username or email already exists are skipped before hashing, passwords are hashed
+        in the process pool shared with create_user and update_user, and all users are
+        inserted with a single executemany.
+
+        Parameters:
+        records (List[Dict[str, str]]): Users with username, email, password and group (name) keys.
+        workers (int): At most this many processes of the shared pool hash the passwords.
+
+        Returns:
+        dict: The number of users imported and skipped, the invalid rows and the seconds taken.
+        """
+        started = time.monotonic()
+        errors: List[str] = []
+        valid: List[Dict[str, str]] = []
+        seen = set()
+        for number, record in enumerate(records, start=1):
+            missing = [field for field in IMPORT_FIELDS if not record.get(field)]
+            if missing:
+                errors.append(f"Row {number}: missing {', '.join(missing)}.")
+            elif record["username"] in seen or record["email"] in seen:
+                errors.append(f"Row {number}: duplicate username or email in the file.")
+            else:
+                seen.update((record["username"], record["email"]))
+                valid.append(record)
+
         with get_db() as db:
-            return db.query(User).filter(User.user_group_id == user_group_id).all()
+            group_names = {record["group"] for record in valid}
+            group_ids = dict(db.execute(select(UserGroup.group_name, UserGroup.id).where(UserGroup.group_name.in_(group_names))).all())
+            existing = set()
+            for username, email in db.execute(
+                select(User.username, User.email).where(or_(
+                    User.username.in_([record["username"] for record in valid]),
+                    User.email.in_([record["email"] for record in valid]),
+                ))
+            ):
+                existing.update((username, email))
+
+        pending = []
+        skipped = 0
+        for record in valid:
+            if record["group"] not in group_ids:
+                errors.append(f"User '{record['username']}': unknown group '{record['group']}'.")
+            elif record["username"] in existing or record["email"] in existing:
+                skipped += 1
+            else:
+                pending.append(record)
+
+        imported = 0
+        if pending:
+            passwords = [record["password"] for record in pending]
+            # One batch per process used, so a smaller workers leaves the rest of the pool free
+            batch_size = -(-len(passwords) // max(1, min(workers, cfg.PASSWORD_HASH_WORKERS)))
+            batches = [passwords[start:start + batch_size] for start in range(0, len(passwords), batch_size)]
+            hashes = [hashed for batch in _hash_pool().map(hash_passwords, batches) for hashed in batch]
+            rows = [
+                {"username": record["username"], "email": record["email"], "password": hashed, "user_group_id": group_ids[record["group"]]}
+                for record, hashed in zip(pending, hashes)
+            ]
+            with get_db() as db:
+                # Users created concurrently since the check above are skipped rather than failing the batch
+                imported = len(db.execute(insert(User).on_conflict_do_nothing().returning(User.id), rows).all())
+                db.commit()
+            skipped += len(rows) - imported
+            get_reference_cache().invalidate("users")
+
+        seconds = time.monotonic() - started
+        logger.info("Imported %s users (%s skipped, %s invalid) in %.1fs.", imported, skipped, len(errors), seconds)
+        return {"imported": imported, "skipped": skipped, "errors": errors, "seconds": seconds}
@@ -0,0 +1,166 @@
+"""
+Shared fixtures of the test suite.
+
+Database tests run against a throwaway Postgres with pgvector: TEST_DATABASE_URL
+if it is set (the database is wiped), otherwise a server started with pgserver
+(pip install -r requirements-dev.txt). Without either they are skipped. The schema
+is created from the models, plus the triggers of the migrations the services rely
+on.
+
+The make_* fixtures create rows for a test and return them detached, the way the
+services return them; their ids are all a test usually needs.
+"""
+
+import importlib.util
+import itertools
+import os
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, List, Sequence, Union
+import pytest
+from sqlalchemy import text
+import config.config as cfg
+from database import models
+from database.models import Base, Document, DocumentContent, Tag, User, UserGroup
+from database.session import get_db
+from services.reference_cache import NAMESPACES, get_reference_cache
+
+MIGRATIONS = Path(__file__).resolve().parent.parent / "alembic" / "versions"
+
+# The start date of the documents made by make_documents unless given
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+# Keeps the pgserver instance alive for the session; it stops when released
+_servers = []
+
+
+def _migration(file_name: str):
+    spec = importlib.util.spec_from_file_location(file_name, MIGRATIONS / file_name)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _start_server() -> str:
+    url = os.getenv("TEST_DATABASE_URL")
+    if url:
+        return url
+    try:
+        import pgserver
+    except ImportError:
+        pytest.skip("set TEST_DATABASE_URL or install pgserver to run the database tests")
+    server = pgserver.get_server(tempfile.mkdtemp(prefix="intellidocs-test-"), cleanup_mode="delete")
+    _servers.append(server)
+    return server.get_uri().replace("postgresql://", "postgresql+psycopg2://", 1)
+
+
+@pytest.fixture(scope="session")
+def database():
+    """
+    Points the application at an empty test database with the full schema and returns its engine.
+    """
+    cfg.DATABASE_URL = _start_server()
+    # Tests run in one process, so there are no invalidations of other processes to listen for
+    cfg.REFERENCE_CACHE_LISTEN = False
+    models.get_engine.cache_clear()
+    engine = models.get_engine()
+    with engine.begin() as connection:
+        connection.execute(text("DROP SCHEMA public CASCADE; CREATE SCHEMA public; CREATE EXTENSION IF NOT EXISTS vector"))
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(text(_migration("2026_10_18_1030-3d59abc6a976_add_user_visible_tags.py").TRIGGERS_SQL))
+    yield engine
+    engine.dispose()
+    models.get_engine.cache_clear()
+
+
+@pytest.fixture
+def db(database):
+    """
+    An empty database; every table is truncated, and the reference cache emptied, after the test.
+    """
+    yield database
+    tables = ", ".join(table.name for table in Base.metadata.sorted_tables)
+    with database.begin() as connection:
+        connection.execute(text(f"TRUNCATE {tables} CASCADE"))
+    get_reference_cache().invalidate(*NAMESPACES, broadcast=False)
+
+
+@pytest.fixture
+def make_tag(db):
+    """
+    Creates a tag: make_tag("contract", notify=True, ...).
+    """
+    def make(tag_name: str, **values) -> Tag:
+        with get_db() as session:
+            tag = Tag(tag_name=tag_name, **values)
+            session.add(tag)
+            session.commit()
+            return tag
+    return make
+
+
+@pytest.fixture
+def make_group(db):
+    """
+    Creates a user group that sees the given tags: make_group("legal", [tag]).
+    """
+    def make(group_name: str = "staff", tags: Sequence[Tag] = ()) -> UserGroup:
+        with get_db() as session:
+            group = UserGroup(group_name=group_name, tags=[session.merge(tag) for tag in tags])
+            session.add(group)
+            session.commit()
+            return group
+    return make
+
+
+@pytest.fixture
+def make_user(db):
+    """
+    Creates a user of a group, with an unusable password: make_user(group, "ada").
+    """
+    def make(group: UserGroup, username: str = "ada") -> User:
+        with get_db() as session:
+            user = User(username=username, email=f"{username}@example.com", password="x", user_group_id=group.id)
+            session.add(user)
+            session.commit()
+            return user
+    return make
+
+
+@pytest.fixture
+def make_documents(db):
+    """
+    Creates count documents in one transaction and returns them in order. Any column may be
+    given as a value or as a function of the document's index; raw_content adds the contents
+    and tags the tags. Unless given, document i is named doc-<i>.pdf (zero-padded to the
+    count) and has the i-th content hash, so successive calls must not reuse an index.
+
+        make_documents(3, description=lambda i: f"Document {i}", tags=[public])
+    """
+    indexes = itertools.count()
+
+    def make(count: int = 1, raw_content: Union[str, Callable[[int], str], None] = None, tags: Any = (), **columns) -> List[Document]:
+        width = len(str(count - 1))
+        with get_db() as session:
+            rows = []
+            for _ in range(count):
+                index = next(indexes)
+                values = {column: given(index) if callable(given) else given for column, given in columns.items()}
+                document_tags = tags(index) if callable(tags) else tags
+                document = Document(**{
+                    "file_name": f"doc-{index:0{width}d}.pdf", "start_date": START, "description": f"Document {index}",
+                    "file_path": f"{index:064x}.pdf", "content_hash": f"{index:064x}", **values,
+                })
+                document.tags = [session.merge(tag) for tag in document_tags]
+                rows.append((document, raw_content(index) if callable(raw_content) else raw_content))
+            session.add_all(document for document, _ in rows)
+            session.flush()
+            session.add_all(
+                DocumentContent(document_id=document.id, raw_content=content, file_extension="pdf")
+                for document, content in rows if content is not None
+            )
+            session.commit()
+            return [document for document, _ in rows]
+    return make
@@ -0,0 +1,17 @@
+from sqlalchemy import select
+from database.models import DocumentChunk
+from database.session import get_db
+from services.chunk_service import ChunkService
+from utils.file_utils import PAGE_SEPARATOR
+
+
+def test_chunks_are_stored_before_they_are_embedded(make_documents):
+    [document] = make_documents(raw_content=PAGE_SEPARATOR.join(["The lease of the office.", "Signed by both parties."]))
+
+    assert ChunkService.chunk_documents([document.id]) == 1
+
+    with get_db() as db:
+        chunks = db.execute(select(DocumentChunk.page_start, DocumentChunk.page_end, DocumentChunk.vector)).all()
+    assert chunks == [(1, 2, None)]
+    # Documents with chunks are not chunked again by the backfill
+    assert ChunkService.backfill() == 0
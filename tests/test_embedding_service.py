@@ -0,0 +1,26 @@
+from sqlalchemy import select
+from database.models import Document
+from database.session import get_db
+from services.embedding_service import EmbeddingService
+from services.openai_service import AsyncOpenAIClient
+
+
+def test_backfill_embeds_through_the_async_client_and_skips_blank_texts(make_documents, monkeypatch):
+    requests = []
+
+    async def get_text_embeddings(self, texts):
+        requests.append(texts)
+        return [[1.0] + [0.0] * 1535 for _ in texts]
+
+    monkeypatch.setattr(AsyncOpenAIClient, "get_text_embeddings", get_text_embeddings)
+    [embedded] = make_documents(description="Office lease", raw_content="The lease of the office.")
+    [blank] = make_documents(description="  ", raw_content="\n")
+
+    assert EmbeddingService.backfill() == 2
+    with get_db() as db_session:
+        vectors = dict(db_session.execute(select(Document.id, Document.description_vector.is_not(None))).all())
+    assert vectors == {embedded.id: True, blank.id: False}
+
+    requests.clear()
+    assert EmbeddingService.backfill() == 0
+    assert requests == []
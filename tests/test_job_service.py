@@ -0,0 +1,140 @@
+import os
+import time
+from datetime import timedelta
+import pytest
+from sqlalchemy import func, update
+import config.config as cfg
+from database.models import Job
+from database.session import get_db
+from services import job_service
+from services.document_service import DocumentService
+from services.job_service import JobService
+from services.storage_service import LocalStorage
+
+HASH = "c" * 64
+
+
+def test_enqueue_returns_the_existing_job(db):
+    job = JobService.enqueue(HASH, "lease.pdf", "/spool/lease.pdf")
+
+    assert (job.stage, job.status) == ("extract", "queued")
+    assert JobService.enqueue(HASH, "lease (1).pdf", "/spool/other.pdf").id == job.id
+
+
+def test_enqueue_starts_over_when_the_document_was_deleted(make_documents):
+    job = JobService.enqueue(HASH, "lease.pdf", "/spool/old.pdf")
+    [document] = make_documents(content_hash=HASH)
+    JobService._transition(job.id, ["queued"], stage="embed", status="done", result={"description": "x"}, document_id=document.id)
+    assert JobService.enqueue(HASH, "lease.pdf", "/spool/new.pdf").status == "done"
+
+    DocumentService.bulk_delete_documents([document.id])
+    requeued = JobService.enqueue(HASH, "lease.pdf", "/spool/new.pdf", review=True)
+
+    assert requeued.id == job.id
+    assert (requeued.stage, requeued.status, requeued.source_path, requeued.review) == ("extract", "queued", "/spool/new.pdf", True)
+    assert requeued.result is None and requeued.document_id is None
+
+
+def _spool(directory, content: bytes = b"%PDF-1.4 lease") -> str:
+    directory.mkdir(exist_ok=True)
+    path = directory / f"{HASH}.pdf"
+    path.write_bytes(content)
+    return str(path)
+
+
+def _claim_store(job_id):
+    JobService._transition(job_id, ["queued"], stage="store", text="The lease of the office.", result={"filename": "Lease", "description": "Office lease"})
+    return JobService.claim("test", ["store"])
+
+
+@pytest.fixture
+def spool_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(cfg, "JOB_SPOOL_DIR", str(tmp_path / "spool"))
+    monkeypatch.setattr(job_service, "get_storage", lambda: LocalStorage(str(tmp_path / "storage")))
+    return tmp_path / "spool"
+
+
+def test_store_removes_the_spooled_file(db, spool_dir):
+    source_path = _spool(spool_dir)
+    job = _claim_store(JobService.enqueue(HASH, "lease.pdf", source_path).id)
+
+    JobService.run_job(job)
+
+    job = JobService.get_job(job.id)
+    assert (job.stage, job.status) == ("embed", "queued") and job.document_id is not None
+    assert job_service.get_storage().exists(f"{HASH}.pdf")
+    assert not os.path.exists(source_path)
+
+
+def test_store_fails_for_good_without_the_file_and_resumes_on_retry(db, spool_dir):
+    source_path = _spool(spool_dir)
+    job = _claim_store(JobService.enqueue(HASH, "lease.pdf", source_path).id)
+    os.remove(source_path)
+
+    JobService.run_job(job)
+
+    job = JobService.get_job(job.id)
+    assert job.status == "failed" and "upload it again" in job.error
+    assert JobService.retry(job.id, _spool(spool_dir))
+    JobService.run_job(JobService.claim("test", ["store"]))
+    assert JobService.get_job(job.id).status == "queued"
+
+
+def test_remove_abandoned_files(db, spool_dir, tmp_path):
+    waiting = JobService.enqueue(HASH, "lease.pdf", _spool(spool_dir))
+    JobService._transition(waiting.id, ["queued"], status="awaiting_review")
+    elsewhere = tmp_path / "inbox.pdf"
+    elsewhere.write_bytes(b"%PDF-1.4 inbox")
+    queued_elsewhere = JobService.enqueue("d" * 64, "inbox.pdf", str(elsewhere))
+    JobService._transition(queued_elsewhere.id, ["queued"], status="failed")
+
+    assert JobService.remove_abandoned_files(max_age_seconds=3600) == 0
+    with get_db() as db_session:
+        db_session.execute(update(Job).values(updated_at=func.now() - timedelta(hours=2)))
+        db_session.commit()
+    assert JobService.remove_abandoned_files(max_age_seconds=3600) == 1
+    assert not os.path.exists(waiting.source_path) and elsewhere.exists()
+
+
+def _make_stale(job_id):
+    with get_db() as db_session:
+        db_session.execute(update(Job).where(Job.id == job_id).values(locked_at=func.now() - timedelta(hours=1)))
+        db_session.commit()
+
+
+def test_stale_jobs_are_requeued_until_they_run_out_of_attempts(db, spool_dir, monkeypatch):
+    monkeypatch.setattr(cfg, "JOB_MAX_ATTEMPTS", 2)
+    source_path = _spool(spool_dir)
+    job = JobService.enqueue(HASH, "lease.pdf", source_path)
+
+    # The worker dies during each attempt
+    for attempt in (1, 2):
+        assert JobService.claim("test").attempts == attempt
+        _make_stale(job.id)
+        assert JobService.requeue_stale(timeout_seconds=60) == (1 if attempt == 1 else 0)
+
+    job = JobService.get_job(job.id)
+    assert (job.status, job.worker, job.error) == ("failed", None, "The worker died on every attempt.")
+    assert not os.path.exists(source_path)
+
+
+def test_running_stages_keep_their_lock(db, monkeypatch):
+    monkeypatch.setattr(cfg, "JOB_HEARTBEAT_INTERVAL", 0.05)
+    job = JobService.enqueue(HASH, "lease.pdf", "/spool/lease.pdf")
+    outcome = []
+
+    def slow_extract(job):
+        _make_stale(job.id)
+        time.sleep(0.3)
+        outcome.append(JobService.requeue_stale(timeout_seconds=60))
+        JobService._finish_stage(job, text="The lease of the office.")
+
+    monkeypatch.setattr(JobService, "_extract", staticmethod(slow_extract))
+    JobService.run_job(JobService.claim("test"))
+
+    assert outcome == [0]
+    assert JobService.get_job(job.id).stage == "metadata"
+    # Only the worker holding the job refreshes its lock
+    JobService.claim("other")
+    assert not JobService.heartbeat(job.id, "test")
+    assert JobService.heartbeat(job.id, "other")
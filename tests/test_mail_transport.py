@@ -0,0 +1,86 @@
+import smtplib
+from email.message import EmailMessage
+import pytest
+from utils import mail_transport
+from utils.mail_transport import SmtpTransport
+
+
+class FakeSMTP:
+    """
+    An SMTP connection whose server answers send_message with the next scripted error, if any.
+    """
+
+    script = []
+    connections = []
+
+    def __init__(self, host, port, timeout=None):
+        self.sent, self.quit_called = [], False
+        FakeSMTP.connections.append(self)
+
+    def starttls(self):
+        pass
+
+    def login(self, username, password):
+        pass
+
+    def noop(self):
+        return 250, b"OK"
+
+    def send_message(self, message):
+        error = FakeSMTP.script.pop(0) if FakeSMTP.script else None
+        if error is not None:
+            raise error
+        self.sent.append(message["To"])
+
+    def quit(self):
+        self.quit_called = True
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def transport(monkeypatch):
+    monkeypatch.setattr(mail_transport.smtplib, "SMTP", FakeSMTP)
+    FakeSMTP.script, FakeSMTP.connections = [], []
+    return SmtpTransport("smtp.example.com", 587, "user", "secret")
+
+
+def _messages(count: int):
+    messages = []
+    for index in range(count):
+        message = EmailMessage()
+        message["To"] = f"user{index}@example.com"
+        messages.append(message)
+    return messages
+
+
+def test_421_is_retried_once_on_a_fresh_connection(transport):
+    FakeSMTP.script = [None, smtplib.SMTPDataError(421, b"Service not available, closing channel")]
+
+    assert transport.send_many(_messages(3)) == [True, True, True]
+    first, second = FakeSMTP.connections
+    assert first.sent == ["user0@example.com"] and first.quit_called
+    assert second.sent == ["user1@example.com", "user2@example.com"]
+
+
+def test_421_on_the_fresh_connection_gives_up(transport):
+    FakeSMTP.script = [smtplib.SMTPResponseException(421, b"closing"), smtplib.SMTPSenderRefused(421, b"closing", "noreply@example.com")]
+
+    assert transport.send_many(_messages(2)) == [False, False]
+    assert len(FakeSMTP.connections) == 2
+
+
+def test_other_message_errors_fail_that_message_only(transport):
+    FakeSMTP.script = [smtplib.SMTPDataError(550, b"Message rejected")]
+
+    assert transport.send_many(_messages(2)) == [False, True]
+    assert len(FakeSMTP.connections) == 1
+
+
+def test_send_retries_a_421_once(transport):
+    FakeSMTP.script = [smtplib.SMTPResponseException(421, b"closing")]
+
+    transport.send(_messages(1)[0])
+
+    assert [connection.sent for connection in FakeSMTP.connections] == [[], ["user0@example.com"]]
@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from sqlalchemy import select
+from database.models import DocumentNotification
+from database.session import get_db
+from services import notification_service
+from services.notification_service import NotificationService
+
+NOW = datetime(2026, 10, 18, 9, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def contract(make_tag, make_group, make_user):
+    """
+    A tag reminding the legal group 30 days before expiry, every 7 days.
+    """
+    tag = make_tag("contract", notify=True, notification_days_before_expiry=30, notification_frequency=7)
+    group = make_group("legal", [tag])
+    make_user(group, "ada")
+    return tag, group
+
+
+def _lease(make_documents, tag, expires_in_days: int = 10):
+    [document] = make_documents(
+        file_name="lease.pdf", start_date=NOW - timedelta(days=300), end_date=NOW + timedelta(days=expires_in_days),
+        description="Office lease", tags=[tag],
+    )
+    return document
+
+
+def test_find_due_and_recipients(contract, make_documents):
+    tag, group = contract
+    document = _lease(make_documents, tag)
+
+    due = NotificationService.find_due(NOW)
+
+    assert [(reminder.document_id, reminder.tag_id, reminder.tag_name) for reminder in due] == [(document.id, tag.id, "contract")]
+    assert NotificationService.find_recipients({tag.id}) == {group.id: ("legal", {tag.id}, ["ada@example.com"])}
+
+
+def test_find_due_skips_documents_outside_the_window(contract, make_documents):
+    _lease(make_documents, contract[0], expires_in_days=45)
+
+    assert NotificationService.find_due(NOW) == []
+
+
+def test_run_once_sends_and_records(contract, make_documents, monkeypatch):
+    tag, _ = contract
+    document = _lease(make_documents, tag)
+    sent = []
+    monkeypatch.setattr(notification_service, "send_emails", lambda emails: [sent.append(email) or True for email in emails])
+
+    stats = NotificationService.run_once(NOW)
+
+    assert stats == {"due": 1, "sent": 1, "failed": 0, "recorded": 1}
+    assert [(recipient, "lease.pdf" in body) for recipient, _, body in sent] == [("ada@example.com", True)]
+    with get_db() as db_session:
+        assert db_session.execute(select(DocumentNotification.document_id, DocumentNotification.tag_id)).all() == [(document.id, tag.id)]
+    # Reminded within the tag's frequency, so not due again
+    assert NotificationService.run_once(NOW + timedelta(days=1))["due"] == 0
+    assert NotificationService.run_once(NOW + timedelta(days=8))["due"] == 1
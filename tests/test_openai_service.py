@@ -0,0 +1,17 @@
+import asyncio
+from services import openai_service
+from services.openai_service import close_loop_client
+
+
+def test_the_client_of_a_loop_is_closed_with_it():
+    async def run():
+        state = openai_service._get_loop_state()
+        assert openai_service._get_loop_state() is state
+        await close_loop_client()
+        return state
+
+    state = asyncio.run(run())
+
+    assert state.client.is_closed() and not openai_service._loop_states
+    # A loop that never made a request has nothing to close
+    asyncio.run(close_loop_client())
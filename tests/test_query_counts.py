@@ -0,0 +1,67 @@
+import pytest
+from services.document_service import DocumentService
+from services.tag_service import TagService
+from utils.query_counter import assert_max_queries
+
+
+@pytest.fixture
+def seeded(make_tag, make_group, make_user, make_documents):
+    """
+    30 documents alternately tagged private and public; the user's group sees the public tag only.
+    """
+    public, private = make_tag("public"), make_tag("private")
+    user = make_user(make_group("staff", [public]))
+    documents = make_documents(30, tags=lambda i: [public if i % 2 else private])
+    return user.id, public.id, [document.id for document in documents]
+
+
+def test_document_list_pages_take_one_query(seeded):
+    user_id, public_id, _ = seeded
+
+    with assert_max_queries(1):
+        first = DocumentService.list_documents("file_name", limit=10, user_id=user_id)
+    with assert_max_queries(1):
+        second = DocumentService.list_documents("file_name", after=first.next_cursor, limit=10, user_id=user_id, tag_ids=[public_id])
+
+    assert [document.file_name for document in first.documents] == [f"doc-{index:02d}.pdf" for index in range(1, 20, 2)]
+    assert [document.file_name for document in second.documents] == [f"doc-{index:02d}.pdf" for index in range(21, 30, 2)]
+    assert second.next_cursor is None
+
+
+def test_streaming_all_documents_takes_one_query(seeded):
+
+    with assert_max_queries(1):
+        documents = list(DocumentService.iter_documents("file_name", batch_size=7))
+    assert [document.id for document in documents] == seeded[2]
+
+
+def test_tag_lookups_are_served_from_the_cache(seeded):
+    _, public_id, _ = seeded
+
+    with assert_max_queries(2):
+        assert [tag.tag_name for tag in TagService.get_all_tags()] == ["private", "public"]
+        assert TagService.get_tag_by_id(public_id).tag_name == "public"
+    with assert_max_queries(0):
+        TagService.get_all_tags()
+        TagService.get_tag_by_id(public_id)
+
+
+def test_visibility_checks(seeded):
+    user_id, _, document_ids = seeded
+    private_id, public_id = document_ids[:2]
+
+    # The document and, if it is visible, its tags
+    with assert_max_queries(2):
+        document = DocumentService.get_document_by_id(public_id, user_id=user_id)
+    assert [tag.tag_name for tag in document.tags] == ["public"]
+    with assert_max_queries(1):
+        assert DocumentService.get_document_by_id(private_id, user_id=user_id) is None
+
+
+def test_group_deletion_check_of_a_detached_group(make_group, make_user):
+    used, unused = make_group("staff"), make_group("guests")
+    make_user(used)
+
+    with assert_max_queries(2):
+        assert not used.can_be_deleted()
+        assert unused.can_be_deleted()
@@ -0,0 +1,69 @@
+import math
+import pytest
+from services.search_service import MAX_EF_SEARCH, SearchService
+
+# Enough documents for the deepest index page, and a few beyond it
+DEEP = MAX_EF_SEARCH + 10
+
+
+def _vector(*weights: float):
+    """
+    A unit vector whose leading components are proportional to the weights.
+    """
+    norm = math.sqrt(sum(weight * weight for weight in weights))
+    return [weight / norm for weight in weights] + [0.0] * (1536 - len(weights))
+
+
+@pytest.fixture
+def many_documents(make_documents):
+    # Each document is a little further from _vector(1) than the one before
+    return make_documents(DEEP, description_vector=lambda i: _vector(1, i / DEEP))
+
+
+def test_semantic_search_pages(make_documents):
+    make_documents(3, description_vector=lambda i: _vector(1, i))
+
+    first = SearchService.semantic_search(_vector(1), k=2)
+    assert [(document.file_name, round(score, 6)) for document, score in first] == [("doc-0.pdf", 1.0), ("doc-1.pdf", round(1 / math.sqrt(2), 6))]
+    assert [document.file_name for document, _ in SearchService.semantic_search(_vector(1), k=2, page=2)] == ["doc-2.pdf"]
+
+
+def test_semantic_search_pages_up_to_the_largest_ef_search(many_documents):
+    # pgvector rejects an ef_search above MAX_EF_SEARCH, so index searches page no deeper
+    last_page = SearchService.semantic_search(_vector(1), k=10, page=MAX_EF_SEARCH // 10)
+    assert [document.file_name for document, _ in last_page] == [f"doc-{index:04d}.pdf" for index in range(MAX_EF_SEARCH - 10, MAX_EF_SEARCH)]
+    assert SearchService.semantic_search(_vector(1), k=10, page=MAX_EF_SEARCH // 10 + 1) == []
+    # A page straddling the limit is cut at it
+    assert len(SearchService.semantic_search(_vector(1), k=7, page=MAX_EF_SEARCH // 7 + 1)) == MAX_EF_SEARCH % 7
+    # Exact searches are not limited
+    beyond = SearchService.semantic_search(_vector(1), k=10, page=MAX_EF_SEARCH // 10 + 1, exact=True)
+    assert [document.file_name for document, _ in beyond] == [f"doc-{index:04d}.pdf" for index in range(MAX_EF_SEARCH, DEEP)]
+
+
+def test_hybrid_search_fuses_text_and_vector_rankings(make_documents, monkeypatch):
+    # By vector: nearby, aside, lease. By text: lease (three matches), nearby (one). aside has no text match.
+    make_documents(
+        3,
+        file_name=lambda i: ["nearby.pdf", "lease.pdf", "aside.pdf"][i],
+        description=lambda i: ["Office lease", "Lease, lease and lease", "Parking permit"][i],
+        description_vector=lambda i: [_vector(1), _vector(0, 1), _vector(1, 1)][i],
+    )
+    monkeypatch.setattr(SearchService, "embed_query", staticmethod(lambda query: _vector(1)))
+
+    results = SearchService.hybrid_search("lease", k=3, rrf_k=60)
+
+    assert [(document.file_name, round(score, 6)) for document, score in results] == [
+        ("nearby.pdf", round(1 / 61 + 1 / 62, 6)),
+        ("lease.pdf", round(1 / 63 + 1 / 61, 6)),
+        ("aside.pdf", round(1 / 62, 6)),
+    ]
+
+
+def test_hybrid_search_pages_up_to_the_largest_ef_search(many_documents, monkeypatch):
+    monkeypatch.setattr(SearchService, "embed_query", staticmethod(lambda query: _vector(1)))
+
+    # Without a text match, the fused order is the vector order
+    last_page = SearchService.hybrid_search("nothing", k=10, page=MAX_EF_SEARCH // 10, candidates=5000)
+    assert [document.file_name for document, _ in last_page] == [f"doc-{index:04d}.pdf" for index in range(MAX_EF_SEARCH - 10, MAX_EF_SEARCH)]
+    assert SearchService.hybrid_search("nothing", k=10, page=MAX_EF_SEARCH // 10 + 1) == []
+    assert len(SearchService.hybrid_search("document", k=7, page=MAX_EF_SEARCH // 7 + 1, candidates=5000)) == MAX_EF_SEARCH % 7
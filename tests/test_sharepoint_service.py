@@ -0,0 +1,193 @@
+import re
+from io import BytesIO
+from urllib.parse import unquote
+import pytest
+from requests import RequestException, Response
+from services import sharepoint_service
+from services.sharepoint_service import SharePointStorage
+
+SITE_URL = "https://example.sharepoint.com/sites/docs"
+
+
+class StubFile:
+    def __init__(self, ctx, url):
+        self.ctx, self.url = ctx, url
+
+    def start_upload(self, upload_id, chunk):
+        self.ctx.queue("start_upload", self.url, 0, chunk)
+
+    def continue_upload(self, upload_id, offset, chunk):
+        self.ctx.queue("continue_upload", self.url, offset, chunk)
+
+    def finish_upload(self, upload_id, offset, chunk):
+        self.ctx.queue("finish_upload", self.url, offset, chunk)
+
+    def cancel_upload(self, upload_id):
+        self.ctx.queue("cancel_upload", self.url)
+
+    def get(self):
+        self.ctx.queue("get", self.url, 0, self)
+        return self
+
+
+class StubFolder:
+    def __init__(self, ctx, url):
+        self.ctx, self.url = ctx, url
+        self.files = self
+
+    def add(self, name, content, overwrite):
+        self.ctx.queue("add", f"{self.url}/{name}")
+
+    def upload_file(self, name, content):
+        self.ctx.queue("upload_file", f"{self.url}/{name}", 0, content)
+
+
+class StubResponse:
+    def __init__(self, data):
+        self.data, self.closed = data, False
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.data), chunk_size):
+            yield self.data[start:start + chunk_size]
+
+    def close(self):
+        self.closed = True
+
+
+class StubContext:
+    """
+    Records the queries a ClientContext would send; failures maps an operation to how many
+    of its executions fail.
+    """
+
+    service_root_url = f"{SITE_URL}/_api"
+
+    def __init__(self, server):
+        self.server = server
+        self.web = self
+        self.pending = []
+
+    def get_folder_by_server_relative_url(self, url):
+        return StubFolder(self, url)
+
+    def get_file_by_server_relative_url(self, url):
+        return StubFile(self, url)
+
+    def queue(self, *operation):
+        self.pending.append(operation)
+
+    def execute_query(self):
+        pending, self.pending = self.pending, []
+        for operation in pending:
+            self.server.log.append(operation[:3])
+            if self.server.failures.get(operation[0], 0):
+                self.server.failures[operation[0]] -= 1
+                raise RequestException(f"{operation[0]} failed")
+            self.server.apply(operation)
+
+    def pending_request(self):
+        return self
+
+    def execute_request_direct(self, request):
+        start, end = re.fullmatch(r"bytes=(\d+)-(\d*)", request.headers.get("Range", "bytes=0-")).groups()
+        data = self.server.files[unquote(request.url.split("'")[1])]
+        self.server.responses.append(StubResponse(data[int(start):int(end) + 1 if end else None]))
+        return self.server.responses[-1]
+
+
+class StubServer:
+    def __init__(self):
+        self.files, self.log, self.failures, self.responses, self.contexts = {}, [], {}, [], 0
+
+    def context(self):
+        self.contexts += 1
+        return StubContext(self)
+
+    def apply(self, operation):
+        name, url = operation[:2]
+        if name in ("upload_file", "start_upload"):
+            self.files[url] = bytes(operation[3])
+        elif name in ("continue_upload", "finish_upload"):
+            assert len(self.files[url]) == operation[2], "chunk sent at the wrong offset"
+            self.files[url] += operation[3]
+        elif name == "add":
+            self.files[url] = b""
+        elif name == "cancel_upload":
+            self.files.pop(url, None)
+        elif name == "get":
+            if url not in self.files:
+                response = Response()
+                response.status_code = 404
+                raise RequestException("file not found", response=response)
+            operation[3].length = len(self.files[url])
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(sharepoint_service.time, "sleep", lambda seconds: None)
+    return StubServer()
+
+
+def _storage(server, **options) -> SharePointStorage:
+    return SharePointStorage(SITE_URL, "Shared Documents", chunk_size=10, context_factory=server.context, **options)
+
+
+def test_upload_of_one_chunk_is_a_single_request(server):
+    result = _storage(server).upload(BytesIO(b"0123456789"), "a.pdf")
+
+    assert server.log == [("upload_file", "/sites/docs/Shared Documents/a.pdf", 0)]
+    assert (result.size, result.url) == (10, "https://example.sharepoint.com/sites/docs/Shared%20Documents/a.pdf")
+
+
+def test_larger_uploads_go_through_a_session(server):
+    content = bytes(range(25))
+
+    result = _storage(server).upload(BytesIO(content), "a.pdf")
+
+    assert [(name, offset) for name, _, offset in server.log[1:]] == [("start_upload", 0), ("continue_upload", 10), ("finish_upload", 20)]
+    assert result.size == 25 and server.files["/sites/docs/Shared Documents/a.pdf"] == content
+
+
+def test_a_failed_chunk_is_resent_at_the_same_offset(server):
+    content = bytes(range(25))
+    server.failures["continue_upload"] = 1
+
+    _storage(server).upload(BytesIO(content), "a.pdf")
+
+    assert [(name, offset) for name, _, offset in server.log[1:]] == [
+        ("start_upload", 0), ("continue_upload", 10), ("continue_upload", 10), ("finish_upload", 20),
+    ]
+    assert server.files["/sites/docs/Shared Documents/a.pdf"] == content
+
+
+def test_a_session_that_keeps_failing_is_cancelled(server):
+    storage = _storage(server, chunk_retries=1)
+    server.failures["continue_upload"] = 2
+
+    with pytest.raises(RequestException):
+        storage.upload(BytesIO(bytes(range(25))), "a.pdf")
+
+    assert server.log[-1][0] == "cancel_upload"
+    assert "/sites/docs/Shared Documents/a.pdf" not in server.files
+    # The context whose request failed is not reused
+    storage.upload(BytesIO(b"0"), "b.pdf")
+    assert server.contexts == 2
+
+
+def test_stream_returns_the_context_before_the_body_is_read(server):
+    storage = _storage(server, concurrency=1)
+    storage.upload(BytesIO(bytes(range(25))), "a.pdf")
+
+    chunks = storage.stream("a.pdf", 3, 20, chunk_size=8)
+    assert next(chunks) == bytes(range(3, 11))
+    # The only slot is free while the body is read, so other requests are not blocked
+    assert storage._slots.acquire(blocking=False)
+    storage._slots.release()
+    assert storage.size("a.pdf") == 25 and not storage.exists("b.pdf")
+    assert b"".join(chunks) == bytes(range(11, 20))
+    assert server.responses[-1].closed and server.contexts == 1
+
+
+def test_url_links_to_the_file_in_the_library(server):
+    assert _storage(server).url("a b.pdf") == "https://example.sharepoint.com/sites/docs/Shared%20Documents/a%20b.pdf"
+    assert server.contexts == 0
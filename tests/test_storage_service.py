@@ -0,0 +1,76 @@
+import boto3
+import pytest
+from moto import mock_aws
+from services.aws_service import S3Storage
+from services.storage_service import BlobStorage, LocalStorage, object_key
+
+HASH = "e" * 64
+CONTENT = bytes(range(256)) * 40
+
+
+@pytest.fixture
+def local_storage(tmp_path):
+    return LocalStorage(str(tmp_path / "storage"))
+
+
+@pytest.fixture
+def s3_storage():
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket="documents")
+        yield S3Storage("documents", client)
+
+
+@pytest.fixture(params=["local_storage", "s3_storage"])
+def storage(request):
+    return request.getfixturevalue(request.param)
+
+
+def test_store_file_puts_once_under_the_content_key(storage, tmp_path):
+    source = tmp_path / "Lease.PDF"
+    source.write_bytes(CONTENT)
+
+    assert not storage.exists(object_key(HASH, "Lease.PDF"))
+    key = storage.store_file(str(source), HASH)
+    assert key == f"{HASH}.pdf"
+    assert storage.exists(key) and storage.size(key) == len(CONTENT)
+
+    source.unlink()
+    # The object exists, so the missing source is never read
+    assert storage.store_file(str(source), HASH) == key
+
+
+def test_stream_and_read_range(storage):
+    with open(__file__, "rb") as stream:
+        storage.put(stream, "self.py")
+    with open(__file__, "rb") as stream:
+        expected = stream.read()
+
+    chunks = list(storage.stream("self.py", chunk_size=100))
+    assert b"".join(chunks) == expected and max(map(len, chunks)) <= 100
+    assert b"".join(storage.stream("self.py", 10)) == expected[10:]
+    assert storage.read_range("self.py", 5, 25) == expected[5:25]
+    assert storage.read_range("self.py", 25, 25) == b""
+
+
+def test_empty_object(storage, tmp_path):
+    source = tmp_path / "empty.pdf"
+    source.write_bytes(b"")
+
+    key = storage.store_file(str(source), HASH)
+
+    assert storage.size(key) == 0 and b"".join(storage.stream(key)) == b""
+
+
+def test_url(local_storage, s3_storage):
+    assert local_storage.url("a.pdf") is None
+    assert s3_storage.url("a.pdf", expires_in=60).startswith("https://documents.s3.amazonaws.com/a.pdf?")
+
+
+def test_a_backend_missing_a_method_cannot_be_created():
+    class WriteOnlyStorage(BlobStorage):
+        def put(self, stream, key):
+            pass
+
+    with pytest.raises(TypeError, match="abstract"):
+        WriteOnlyStorage()
@@ -0,0 +1,31 @@
+import bcrypt
+from services import user_service
+from services.user_service import UserService
+
+
+def test_passwords_are_hashed_in_the_shared_pool(make_group):
+    user = UserService.create_user("ada", "ada@example.com", "first secret", make_group().id)
+    pool = user_service._hash_pool()
+
+    assert bcrypt.checkpw(b"first secret", user.password.encode())
+    user = UserService.update_user(user.id, password="second secret")
+    assert bcrypt.checkpw(b"second secret", user.password.encode())
+    assert UserService.update_user(user.id, username="ada lovelace").password == user.password
+    assert user_service._hash_pool() is pool and pool._processes
+
+
+def test_import_users_hashes_in_the_same_pool(make_group, monkeypatch):
+    make_group("staff")
+    monkeypatch.setattr(user_service.cfg, "PASSWORD_HASH_WORKERS", 4)
+    batches = []
+    monkeypatch.setattr(user_service, "hash_passwords", lambda passwords: batches.append(passwords) or [f"hash of {password}" for password in passwords])
+    pool = user_service._hash_pool()
+    monkeypatch.setattr(pool, "map", lambda function, items: map(function, items))
+    records = [{"username": f"user{index}", "email": f"user{index}@example.com", "password": f"secret{index}", "group": "staff"} for index in range(5)]
+
+    assert UserService.import_users(records, workers=2)["imported"] == 5
+    assert UserService.import_users(records, workers=64)["skipped"] == 5
+
+    # Two batches, one per process used; the pool is the same whatever workers is
+    assert batches == [["secret0", "secret1", "secret2"], ["secret3", "secret4"]]
+    assert user_service._hash_pool() is pool and user_service._hash_pool.cache_info().currsize == 1
@@ -0,0 +1,166 @@
+"""
+This module provides token counting and token-bounded text splitting used to fit
+document text into the embedding model's context window, and a page- and
+layout-aware chunker that turns extracted PDF pages into retrieval chunks.
+
+tiktoken is used when it is installed; otherwise token counts are approximated
+at four characters per token.
+"""
+
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List
+import config.config as cfg
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - optional dependency
+    tiktoken = None
+
+# Characters per token used when tiktoken is not available
+APPROX_CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(model: str):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str, model: str = cfg.EMBEDDING_MODEL) -> int:
+    """
+    Counts the tokens of a text for the given model.
+
+    :param text: The text to count.
+    :param model: The model whose tokenizer should be used.
+    :return: The number of tokens.
+    """
+    if tiktoken is None:
+        return (len(text) + APPROX_CHARS_PER_TOKEN - 1) // APPROX_CHARS_PER_TOKEN
+    return len(_get_encoding(model).encode(text, disallowed_special=()))
+
+
+def split_by_tokens(text: str, max_tokens: int = cfg.EMBEDDING_MAX_TOKENS, overlap: int = 0, model: str = cfg.EMBEDDING_MODEL) -> List[str]:
+    """
+    Splits a text into pieces of at most max_tokens tokens.
+
+    :param text: The text to split.
+    :param max_tokens: The maximum number of tokens per piece.
+    :param overlap: The number of tokens repeated at the start of each following piece.
+    :param model: The model whose tokenizer should be used.
+    :return: The pieces in order; an empty list for blank text.
+    """
+    if not text.strip():
+        return []
+    step = max(1, max_tokens - overlap)
+    if tiktoken is None:
+        size, stride = max_tokens * APPROX_CHARS_PER_TOKEN, step * APPROX_CHARS_PER_TOKEN
+        return [text[start:start + size] for start in range(0, max(1, len(text) - overlap * APPROX_CHARS_PER_TOKEN), stride) if text[start:start + size].strip()]
+
+    encoding = _get_encoding(model)
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return [text]
+    return [encoding.decode(tokens[start:start + max_tokens]) for start in range(0, len(tokens) - overlap, step)]
+
+
+@dataclass
+class TextChunk:
+    """
+    A retrieval chunk of a document.
+
+    Attributes:
+        - ordinal: Position of the chunk within the document, starting at 0.
+        - text: The chunk text.
+        - token_count: Number of tokens in the text.
+        - page_start: First page (1-based) the chunk covers.
+        - page_end: Last page (1-based) the chunk covers.
+    """
+    ordinal: int
+    text: str
+    token_count: int
+    page_start: int
+    page_end: int
+
+
+# A line that looks like a heading: short, and either numbered, all caps or ending in a colon
+_HEADING_PATTERN = re.compile(r"^(\d+(\.\d+)*\.?\s+\S.{0,80}|[A-Z0-9][A-Z0-9 ,&/()-]{2,80}|.{1,80}:)$")
+
+
+def _page_blocks(page_text: str) -> List[str]:
+    """
+    Splits a page into layout blocks: paragraphs separated by blank lines, with a new
+    block started at every heading-like line. Words hyphenated across lines are rejoined.
+    """
+    page_text = re.sub(r"(\w)-\n(\w)", r"\1\2", page_text)
+    blocks = []
+    current: List[str] = []
+    for line in page_text.splitlines():
+        stripped = line.strip()
+        if not stripped or (_HEADING_PATTERN.match(stripped) and current):
+            if current:
+                blocks.append(" ".join(current))
+                current = []
+            if not stripped:
+                continue
+        current.append(stripped)
+    if current:
+        blocks.append(" ".join(current))
+    return blocks
+
+
+def chunk_pages(pages: List[str], max_tokens: int = cfg.CHUNK_MAX_TOKENS, overlap_tokens: int = cfg.CHUNK_OVERLAP_TOKENS) -> List[TextChunk]:
+    """
+    Groups the layout blocks of consecutive pages into chunks of at most max_tokens tokens.
+
+    Blocks are never split unless a single block exceeds max_tokens, and the trailing
+    blocks of each chunk (up to overlap_tokens) are repeated at the start of the next one
+    so context is not lost at chunk boundaries.
+
+    :param pages: The text of each page, in page order.
+    :param max_tokens: The maximum number of tokens per chunk.
+    :param overlap_tokens: The number of tokens carried over between consecutive chunks.
+    :return: The chunks in document order.
+    """
+    blocks = []  # (page number, text, token count)
+    for page_number, page_text in enumerate(pages, start=1):
+        for block in _page_blocks(page_text):
+            tokens = count_tokens(block)
+            if tokens > max_tokens:
+                for piece in split_by_tokens(block, max_tokens):
+                    blocks.append((page_number, piece, count_tokens(piece)))
+            else:
+                blocks.append((page_number, block, tokens))
+
+    chunks: List[TextChunk] = []
+    current = []
+    current_tokens = 0
+
+    def emit() -> None:
+        chunks.append(TextChunk(
+            ordinal=len(chunks),
+            text="\n\n".join(text for _, text, _ in current),
+            token_count=current_tokens,
+            page_start=current[0][0],
+            page_end=current[-1][0],
+        ))
+
+    for block in blocks:
+        if current and current_tokens + block[2] > max_tokens:
+            emit()
+            carried = []
+            carried_tokens = 0
+            for previous in reversed(current):
+                if carried_tokens + previous[2] > overlap_tokens or carried_tokens + previous[2] + block[2] > max_tokens:
+                    break
+                carried.insert(0, previous)
+                carried_tokens += previous[2]
+            current, current_tokens = carried, carried_tokens
+        current.append(block)
+        current_tokens += block[2]
+    if current:
+        emit()
+    return chunks
@@ -0,0 +1,69 @@
+"""
+A paged document multi-select for Streamlit pages, backed by the keyset listing in
+DocumentService. Only one page of documents is loaded per render; the cursors of
+the pages visited are kept in session_state so Previous works without offsets.
+"""
+
+from typing import List
+from uuid import UUID
+import streamlit as st
+import config.config as cfg
+from services.auth_service import get_current_user_id
+from services.document_service import DocumentService
+
+
+def document_picker(key: str, label: str = "Documents", page_size: int = cfg.DOCUMENT_PAGE_SIZE) -> List[UUID]:
+    """
+    Renders a filterable, paged document multi-select and returns the selected document ids.
+    Selections are kept while paging.
+
+    :param key: A key unique to the page, prefixing the widget and session_state keys.
+    :param label: The label of the multi-select.
+    :param page_size: The number of documents per page.
+    :return: The ids of all selected documents, across pages.
+    """
+    cursors_key, selected_key = f"{key}_cursors", f"{key}_selected"
+    st.session_state.setdefault(cursors_key, [None])
+    st.session_state.setdefault(selected_key, {})
+
+    order = st.radio("Order", options=["Newest First", "Oldest First", "File Name"], horizontal=True, key=f"{key}_order")
+    order_by, descending = {"Newest First": ("created_at", True), "Oldest First": ("created_at", False), "File Name": ("file_name", False)}[order]
+    if st.session_state.get(f"{key}_last_order") != order:
+        st.session_state[cursors_key] = [None]
+        st.session_state[f"{key}_last_order"] = order
+
+    cursors = st.session_state[cursors_key]
+    page = DocumentService.list_documents(
+        order_by=order_by,
+        descending=descending,
+        after=cursors[-1],
+        limit=page_size,
+        user_id=get_current_user_id() if cfg.ACCESS_CONTROL_ENABLED else None,
+    )
+    selected = st.session_state[selected_key]
+    labels = {document.id: f"{document.file_name} ({document.start_date:%Y-%m-%d})" for document in page.documents}
+    labels.update(selected)
+
+    chosen = st.multiselect(label, options=list(labels.keys()), default=list(selected.keys()), format_func=labels.get, key=f"{key}_multiselect")
+    st.session_state[selected_key] = {document_id: labels[document_id] for document_id in chosen}
+
+    col1, col2, col3 = st.columns([1, 1, 4])
+    with col1:
+        if st.button("Previous", key=f"{key}_previous", disabled=len(cursors) == 1):
+            cursors.pop()
+            st.rerun()
+    with col2:
+        if st.button("Next", key=f"{key}_next", disabled=page.next_cursor is None):
+            cursors.append(page.next_cursor)
+            st.rerun()
+    with col3:
+        st.caption(f"Page {len(cursors)} · {len(chosen)} selected")
+    return chosen
+
+
+def reset_document_picker(key: str) -> None:
+    """
+    Clears the selection and paging state of a document picker, e.g. after a bulk operation.
+    """
+    for suffix in ("cursors", "selected", "multiselect"):
+        st.session_state.pop(f"{key}_{suffix}", None)
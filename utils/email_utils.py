@@ -1,25 +1,32 @@
 """
 This module provides functionality for sending emails using Office365 SMTP
 within a Streamlit application. It includes functions to fetch secrets from
-environment variables, create email content, and send emails. Logging is used 
-to track the success or failure of email transmissions.
+environment variables, create email content, and send emails. Messages go
+through the pooled transport of utils.mail_transport, so consecutive emails
+reuse one logged-in connection. Logging is used to track the success or
+failure of email transmissions.
 
 Functions:
 - fetch_secret: Retrieves secret values from environment variables.
 - create_email_body: Constructs the body of the email based on the subject and data.
+- build_message: Builds the MIME message for a receiver, subject and data.
 - send_email: Sends an email to a specified receiver with a given subject and data.
+- send_emails: Sends several emails over one SMTP session.
+- queue_email: Sends an email from the background mail queue, without waiting.
 """
 
-import logging
 import os
 import smtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
+from typing import Iterable, List, Tuple
+from utils.logger import get_logger
+from utils.mail_transport import MailTransport, get_mail_queue, get_transport
 
-# Setting up logging configuration
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
-)
+logger = get_logger(__name__)
+
+OFFICE365_SMTP_HOST = "smtp.office365.com"
+OFFICE365_SMTP_PORT = 587
 
 
 def fetch_secret(key):
@@ -63,51 +70,86 @@ def create_email_body(subject, data):
     """
 
 
-def send_email(receiver, subject, data) -> None:
+def office365_transport() -> MailTransport:
     """
-    Send an email to the specified receiver with the given subject and data.
+    Returns the pooled transport of the Office365 account.
+    """
+    return get_transport(OFFICE365_SMTP_HOST, OFFICE365_SMTP_PORT, fetch_secret("OFFICE_USN"), fetch_secret("OFFICE_PSW"))
+
+
+def build_message(receiver, subject, data) -> MIMEMultipart:
+    """
+    Build the email message for the given receiver, subject and data.
 
     Parameters:
-    - receiver (str): The email address of the receiver.
+    - receiver (str): The email address of the receiver, or several separated by commas.
     - subject (str): The subject of the email.
     - data (str or pandas.DataFrame): The content of the email.
-        This will be formatted into the email body.
 
-    Logs:
-    - Logs an info message if the email is sent successfully.
-    - Logs an error message if sending the email fails.
+    Returns:
+    - MIMEMultipart: The message, sent from the Office365 account.
     """
-    # Create email message
     mimemsg = MIMEMultipart()
     mimemsg["From"] = fetch_secret("OFFICE_USN")
     mimemsg["To"] = receiver
     mimemsg["Subject"] = subject
+    mimemsg.attach(MIMEText(create_email_body(subject, data), "html"))
+    return mimemsg
+
+
+def send_email(receiver, subject, data) -> bool:
+    """
+    Send an email to the specified receiver with the given subject and data.
 
-    # Attach the body
-    body = create_email_body(subject, data)
-    mimemsg.attach(MIMEText(body, "html"))
+    Parameters:
+    - receiver (str): The email address of the receiver, or several separated by commas.
+    - subject (str): The subject of the email.
+    - data (str or pandas.DataFrame): The content of the email.
+        This will be formatted into the email body.
 
-    # Establish connection and send the email
+    Returns:
+    - bool: True if the email was sent.
+
+    Logs:
+    - Logs an info message if the email is sent successfully.
+    - Logs an error message if sending the email fails.
+    """
     try:
-        connection = smtplib.SMTP(host="smtp.office365.com", port=587)
-        connection.starttls()
-        connection.login(fetch_secret("OFFICE_USN"), fetch_secret("OFFICE_PSW"))
-        connection.send_message(mimemsg)
-        connection.quit()
-        logging.info(
-            "Email sent successfully to %s with subject: %s", receiver, subject
-        )
+        office365_transport().send(build_message(receiver, subject, data))
+        logger.info("Email sent successfully to %s with subject: %s", receiver, subject)
+        return True
     except smtplib.SMTPAuthenticationError as e:
-        logging.error(
-            "SMTP authentication failed for user %s. Error: %s",
-            fetch_secret("OFFICE_USN"),
-            e,
-        )
+        logger.error("SMTP authentication failed for user %s. Error: %s", fetch_secret("OFFICE_USN"), e)
     except smtplib.SMTPRecipientsRefused as e:
-        logging.error(
-            "The server refused the email recipients %s. Error: %s", receiver, e
-        )
+        logger.error("The server refused the email recipients %s. Error: %s", receiver, e)
     except smtplib.SMTPException as e:
-        logging.error("Failed to send email due to an SMTP error. Error: %s", e)
+        logger.error("Failed to send email due to an SMTP error. Error: %s", e)
     except Exception as e:
-        logging.error("An unexpected error occurred. Error: %s", e)
\ No newline at end of file
+        logger.error("An unexpected error occurred. Error: %s", e)
+    return False
+
+
+def send_emails(emails: Iterable[Tuple[str, str, object]]) -> List[bool]:
+    """
+    Send several emails over one pooled SMTP session instead of one connection each.
+
+    Parameters:
+    - emails (Iterable[Tuple[str, str, object]]): (receiver, subject, data) per email.
+
+    Returns:
+    - List[bool]: Whether each email was sent, in order.
+    """
+    emails = list(emails)
+    results = office365_transport().send_many([build_message(*email) for email in emails])
+    logger.info("Sent %d of %d emails.", sum(results), len(emails))
+    return results
+
+
+def queue_email(receiver, subject, data) -> bool:
+    """
+    Queue an email for background delivery with retries; returns immediately.
+
+    Returns:
+    - bool: False if the mail queue was full and the email was dropped.
+    """
+    return get_mail_queue(office365_transport()).enqueue(build_message(receiver, subject, data))
@@ -1,8 +1,8 @@
-from PyPDF2 import PdfReader
-from typing import IO
+from typing import IO, List, Optional
 import base64
 import hashlib
 from utils.logger import get_logger
+from utils.pdf_engine import PdfSource, extract_pdf_pages
 
 logger = get_logger(__name__)
 
@@ -14,29 +14,46 @@ def encode_image(image_path):
         with open(image_path, "rb") as image_file:
             return base64.b64encode(image_file.read()).decode("utf-8")
     except Exception as e:
-        logger.error(f"Error encoding image: {e}")
+        logger.error("Error encoding image: %s", e)
         return None
 
-def extract_text_from_pdf(file: IO) -> str:
+# Separator between pages in extracted text, so page boundaries survive in DocumentContent.raw_content
+PAGE_SEPARATOR = "\f"
+
+def extract_pages_from_pdf(file: PdfSource, workers: Optional[int] = None) -> List[str]:
     """
-    Extracts text from a PDF file using PyMuPDF.
+    Extracts the text of each page of a PDF file with the configured engine (PyMuPDF by default).
+
+    :param file: A file path, bytes or binary file-like object of the PDF.
+    :param workers: The number of processes used for large PDFs given by path; pass 1 from worker processes.
+    :return: One string per page, in page order.
     """
-    text_data = ""
-    try:
-        if file is not None:
-            pdf_reader = PdfReader(file)
-            for page in pdf_reader.pages:
-                text_data += page.extract_text()
-    except Exception as e:
-        logger.error(f"Error reading PDF: {e}")
-    return text_data
+    return [page.text for page in extract_pdf_pages(file, workers=workers)]
+
+def extract_text_from_pdf(file: PdfSource, workers: Optional[int] = None) -> str:
+    """
+    Extracts text from a PDF file, with pages separated by PAGE_SEPARATOR.
+    """
+    return PAGE_SEPARATOR.join(extract_pages_from_pdf(file, workers))
+
+def split_pages(text: str) -> List[str]:
+    """
+    Splits text produced by extract_text_from_pdf back into pages.
+    """
+    return text.split(PAGE_SEPARATOR)
 
 def generate_hash_from_bytes(fileobj: IO) -> str:
     """
     Generates a SHA-256 hash from the given file-like object.
 
+    The object is read from the start and rewound afterwards, so it can be read again.
+
     :param fileobj: A file-like object opened for reading in binary mode.
     :return: A SHA-256 hash string.
     """
+    if fileobj.seekable():
+        fileobj.seek(0)
     digest = hashlib.file_digest(fileobj, "sha256")
+    if fileobj.seekable():
+        fileobj.seek(0)
     return digest.hexdigest()
@@ -1,6 +1,28 @@
+"""
+Logging for the application. get_logger returns loggers that only put records on
+an in-memory queue; a single QueueListener thread formats them and writes them to
+the console (as text or JSON lines) and, for critical errors, to email. Logging
+calls therefore never wait on I/O. Records below WARNING of high-frequency
+loggers can be sampled with LOG_SAMPLE_RATES.
+
+Pass arguments %-style (logger.info("Loaded %d rows", count)) so that the message
+is only formatted for records that are actually emitted.
+"""
+
+import atexit
+import copy
+import itertools
+import json
 import logging
-from logging.handlers import SMTPHandler
+import os
+import queue
+from datetime import datetime, timezone
+from email.message import EmailMessage
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
 import config.config as cfg
+from utils.mail_transport import get_mail_queue, get_transport
 
 # Email settings
 SMTP_SERVER = cfg.SMTP_SERVER
@@ -14,10 +36,173 @@ EMAIL_SUBJECT = cfg.EMAIL_SUBJECT
 # Log level
 LOG_LEVEL = cfg.LOG_LEVEL.upper()
 
+# Attributes every LogRecord has; anything else was passed with extra= and goes into the JSON output
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class TransportHandler(logging.Handler):
+    """
+    Emails log records through the pooled mail transport. Records are handed to the
+    background mail queue, so logging never waits on the SMTP server.
+    """
+
+    def __init__(self, fromaddr: str, toaddrs: list, subject: str):
+        super().__init__()
+        self.fromaddr = fromaddr
+        self.toaddrs = toaddrs
+        self.subject = subject
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            message = EmailMessage()
+            message["From"] = self.fromaddr
+            message["To"] = ",".join(self.toaddrs)
+            message["Subject"] = self.subject
+            message.set_content(self.format(record))
+            get_mail_queue(get_transport(SMTP_SERVER, SMTP_PORT, SMTP_USERNAME, SMTP_PASSWORD)).enqueue(message)
+        except Exception:
+            self.handleError(record)
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats records as one JSON object per line, including the fields passed with extra=.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES})
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = record.stack_info
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps one in every 1/rate DEBUG and INFO records per logger and message template; the
+    rate of a logger is that of its longest configured prefix. WARNING and above are never sampled.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._counters: Dict[tuple, itertools.count] = {}
+
+    def _rate(self, name: str) -> float:
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition(".")[0]
+        return 1.0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate(record.name)
+        if rate >= 1.0:
+            return True
+        if rate <= 0.0:
+            return False
+        template = record.msg if isinstance(record.msg, str) else None
+        counter = self._counters.setdefault((record.name, template), itertools.count())
+        if next(counter) % round(1 / rate):
+            return False
+        record.sample_rate = rate
+        return True
+
+
+class DeferredFormatQueueHandler(QueueHandler):
+    """
+    A QueueHandler that leaves formatting to the listener thread. Only the message arguments
+    are merged (they may be mutated after the call) and the traceback rendered, since
+    neither can be done later.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def parse_sample_rates(value: str) -> Dict[str, float]:
+    """
+    Parses "logger=rate,..." into a dict, ignoring malformed entries.
+    """
+    rates = {}
+    for item in value.split(","):
+        name, _, rate = item.partition("=")
+        try:
+            rates[name.strip()] = float(rate)
+        except ValueError:
+            continue
+    return rates
+
+
+@lru_cache(maxsize=None)
+def _queue_handler() -> QueueHandler:
+    """
+    Returns the queue handler shared by all loggers, starting the listener thread that
+    writes the queued records on first use.
+    """
+    if cfg.LOG_FORMAT == "json":
+        console_formatter = JsonFormatter()
+    else:
+        console_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(console_formatter)
+    handlers = [console_handler]
+
+    # Email handler for critical errors
+    if LOG_LEVEL == 'ERROR' or LOG_LEVEL == 'CRITICAL':
+        email_handler = TransportHandler(
+            fromaddr=EMAIL_FROM,
+            toaddrs=EMAIL_TO.split(','),
+            subject=EMAIL_SUBJECT,
+        )
+        email_handler.setLevel(logging.CRITICAL)
+        email_formatter = logging.Formatter(
+            'Timestamp: %(asctime)s\nLogger: %(name)s\nLevel: %(levelname)s\n\nMessage:\n%(message)s'
+        )
+        email_handler.setFormatter(email_formatter)
+        handlers.append(email_handler)
+
+    handler = DeferredFormatQueueHandler(queue.SimpleQueue())
+    handler.addFilter(SamplingFilter(parse_sample_rates(cfg.LOG_SAMPLE_RATES)))
+    _start_listener(handler, handlers)
+    # Forked worker processes (PDF extraction, ingest) do not inherit the listener thread
+    os.register_at_fork(after_in_child=lambda: _start_listener(handler, handlers, queue.SimpleQueue()))
+    return handler
+
+
+def _start_listener(handler: QueueHandler, handlers: list, records: Optional[queue.SimpleQueue] = None) -> None:
+    if records is not None:
+        handler.queue = records
+    listener = QueueListener(handler.queue, *handlers, respect_handler_level=True)
+    listener.start()
+    # Writes out the records still queued when the process exits
+    atexit.register(listener.stop)
+
+
 def get_logger(name: str) -> logging.Logger:
     """
-    Returns a logger configured with console output and email notification on critical errors.
-    
+    Returns a logger writing through the shared logging queue, with console output and
+    email notification on critical errors.
+
     :param name: The name of the logger.
     :return: Configured logger instance.
     """
@@ -25,28 +210,6 @@ def get_logger(name: str) -> logging.Logger:
 
     if not logger.hasHandlers():
         logger.setLevel(LOG_LEVEL)
-        
-        # Console handler
-        console_handler = logging.StreamHandler()
-        console_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        console_handler.setFormatter(console_formatter)
-        logger.addHandler(console_handler)
-
-        # Email handler for critical errors
-        if LOG_LEVEL == 'ERROR' or LOG_LEVEL == 'CRITICAL':
-            email_handler = SMTPHandler(
-                mailhost=(SMTP_SERVER, SMTP_PORT),
-                fromaddr=EMAIL_FROM,
-                toaddrs=EMAIL_TO.split(','),
-                subject=EMAIL_SUBJECT,
-                credentials=(SMTP_USERNAME, SMTP_PASSWORD),
-                secure=()
-            )
-            email_handler.setLevel(logging.CRITICAL)
-            email_formatter = logging.Formatter(
-                'Timestamp: %(asctime)s\nLogger: %(name)s\nLevel: %(levelname)s\n\nMessage:\n%(message)s'
-            )
-            email_handler.setFormatter(email_formatter)
-            logger.addHandler(email_handler)
+        logger.addHandler(_queue_handler())
 
     return logger
@@ -0,0 +1,374 @@
+"""
+Mail transports shared by utils.email_utils and the error emails of utils.logger.
+
+SmtpTransport keeps a small pool of logged-in SMTP connections, so the STARTTLS
+and login handshake is paid once per connection rather than once per message,
+and sends batches of messages over one session. Idle connections are checked
+with NOOP before reuse and replaced when the server dropped them.
+MemoryTransport and FileTransport stand in for the server in tests and local
+runs. QueuedTransport sends from a background thread with retry and backoff,
+so callers never wait on the network.
+
+    transport = get_transport("smtp.office365.com", 587, username, password)
+    transport.send_many(messages)
+    get_mail_queue(transport).enqueue(message)
+"""
+
+import heapq
+import itertools
+import logging
+import os
+import queue
+import smtplib
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from email.message import Message
+from functools import lru_cache
+from typing import Iterator, List, Optional
+import config.config as cfg
+
+# A plain module logger: utils.logger sends its error emails through this module, so
+# logging through get_logger here could feed delivery failures back into the mail queue
+logger = logging.getLogger(__name__)
+
+
+def _session_lost(error: Exception) -> bool:
+    """
+    Whether an SMTP error means the session is gone: the connection dropped or failed, or the
+    server is closing it (421, which may answer any command, e.g. as an SMTPDataError).
+    """
+    return isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)) or getattr(error, "smtp_code", None) == 421
+
+
+class MailTransport:
+    """
+    Delivers email messages. send raises on failure; send_many reports failures per message.
+    """
+
+    def send(self, message: Message) -> None:
+        raise NotImplementedError
+
+    def send_many(self, messages: List[Message]) -> List[bool]:
+        """
+        Sends the messages and returns whether each one was delivered.
+        """
+        results = []
+        for message in messages:
+            try:
+                self.send(message)
+                results.append(True)
+            except Exception as e:
+                logger.error("Failed to send email to %s: %s", message["To"], e)
+                results.append(False)
+        return results
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryTransport(MailTransport):
+    """
+    Keeps sent messages in memory, in outbox.
+    """
+
+    def __init__(self):
+        self.outbox: List[Message] = []
+        self._lock = threading.Lock()
+
+    def send(self, message: Message) -> None:
+        with self._lock:
+            self.outbox.append(message)
+
+
+class FileTransport(MailTransport):
+    """
+    Writes each message to an .eml file in a directory.
+    """
+
+    def __init__(self, directory: str = cfg.MAIL_FILE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def send(self, message: Message) -> None:
+        file_name = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.eml"
+        with open(os.path.join(self.directory, file_name), "wb") as f:
+            f.write(message.as_bytes())
+
+
+class SmtpTransport(MailTransport):
+    """
+    Sends over a pool of persistent, logged-in SMTP connections.
+    """
+
+    # Connections idle for longer than this are checked with NOOP before reuse
+    HEALTH_CHECK_AFTER_SECONDS = 30.0
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        starttls: bool = True,
+        pool_size: int = cfg.MAIL_POOL_SIZE,
+        timeout: float = cfg.MAIL_TIMEOUT,
+        max_messages_per_connection: int = cfg.MAIL_MAX_MESSAGES_PER_CONNECTION):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self.max_messages_per_connection = max_messages_per_connection
+        # Idle connections as [connection, messages sent, last used]; the most recently used is reused first
+        self._idle: "queue.LifoQueue[list]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(pool_size)
+
+    def _connect(self) -> list:
+        connection = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                connection.starttls()
+            if self.username:
+                connection.login(self.username, self.password)
+        except Exception:
+            self._quit(connection)
+            raise
+        logger.debug("Opened SMTP connection to %s:%s.", self.host, self.port)
+        return [connection, 0, time.monotonic()]
+
+    @staticmethod
+    def _quit(connection: smtplib.SMTP) -> None:
+        try:
+            connection.quit()
+        except Exception:
+            connection.close()
+
+    def _is_healthy(self, entry: list) -> bool:
+        if entry[1] >= self.max_messages_per_connection:
+            return False
+        if time.monotonic() - entry[2] < self.HEALTH_CHECK_AFTER_SECONDS:
+            return True
+        try:
+            return entry[0].noop()[0] == 250
+        except OSError:
+            return False
+
+    def _checkout(self) -> list:
+        while True:
+            try:
+                entry = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            if self._is_healthy(entry):
+                return entry
+            self._quit(entry[0])
+
+    @contextmanager
+    def session(self) -> Iterator[list]:
+        """
+        Holds one pooled connection, as [connection, messages sent, last used], for the block.
+        The connection returns to the pool unless the block raised an SMTP or socket error.
+        """
+        with self._slots:
+            entry = self._checkout()
+            try:
+                yield entry
+            except smtplib.SMTPServerDisconnected:
+                entry[0].close()
+                raise
+            except smtplib.SMTPResponseException as e:
+                # 421: the server is closing the session; other errors concern one message only
+                if e.smtp_code == 421:
+                    self._quit(entry[0])
+                else:
+                    self._release(entry)
+                raise
+            except smtplib.SMTPException:
+                self._release(entry)
+                raise
+            except OSError:
+                entry[0].close()
+                raise
+            except Exception:
+                self._release(entry)
+                raise
+            else:
+                self._release(entry)
+
+    def _release(self, entry: list) -> None:
+        entry[2] = time.monotonic()
+        self._idle.put(entry)
+
+    def _send_on(self, entry: list, message: Message) -> None:
+        entry[0].send_message(message)
+        entry[1] += 1
+
+    def send(self, message: Message) -> None:
+        try:
+            with self.session() as entry:
+                self._send_on(entry, message)
+        except smtplib.SMTPException as e:
+            if not _session_lost(e):
+                raise
+            # A pooled connection may have been dropped or closed by the server since the health check
+            with self.session() as entry:
+                self._send_on(entry, message)
+
+    def send_many(self, messages: List[Message]) -> List[bool]:
+        """
+        Sends the messages over as few sessions as possible, reconnecting when the server
+        drops the connection or the per-connection message limit is reached.
+        """
+        results: List[bool] = []
+        remaining = list(messages)
+        reconnects = 0
+        while remaining:
+            try:
+                with self.session() as entry:
+                    while remaining and entry[1] < self.max_messages_per_connection:
+                        try:
+                            self._send_on(entry, remaining[0])
+                            results.append(True)
+                        except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as e:
+                            if _session_lost(e):
+                                raise
+                            logger.error("Failed to send email to %s: %s", remaining[0]["To"], e)
+                            results.append(False)
+                        remaining.pop(0)
+                # The limit was reached; the next session opens a fresh connection
+                reconnects = 0
+            except OSError as e:
+                if not _session_lost(e):
+                    # Other SMTP errors (authentication, ...) and socket errors
+                    logger.error("SMTP error on %s, %d emails not sent: %s", self.host, len(remaining), e)
+                elif reconnects == 0:
+                    # A pooled connection may have been dropped or closed by the server (421); one fresh connection is attempted
+                    reconnects += 1
+                    continue
+                else:
+                    logger.error("SMTP connection to %s failed, %d emails not sent: %s", self.host, len(remaining), e)
+                results.extend([False] * len(remaining))
+                break
+        return results
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._quit(self._idle.get_nowait()[0])
+            except queue.Empty:
+                return
+
+
+class QueuedTransport:
+    """
+    Sends messages from a daemon thread, batching whatever is queued into one session and
+    retrying failed messages with exponential backoff. enqueue never blocks.
+    """
+
+    def __init__(
+        self,
+        transport: MailTransport,
+        max_retries: int = cfg.MAIL_MAX_RETRIES,
+        backoff_seconds: float = cfg.MAIL_RETRY_BACKOFF,
+        max_queued: int = cfg.MAIL_QUEUE_SIZE,
+        batch_size: int = 50):
+        self.transport = transport
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.batch_size = batch_size
+        self._queue: "queue.Queue[Message]" = queue.Queue(maxsize=max_queued)
+        self._pending = 0
+        self._idle = threading.Condition()
+        self._sequence = itertools.count()
+        self._thread = threading.Thread(target=self._run, name="mail-queue", daemon=True)
+        self._thread.start()
+
+    def enqueue(self, message: Message) -> bool:
+        """
+        Queues the message for delivery. Returns False if the queue is full and the message was dropped.
+        """
+        with self._idle:
+            self._pending += 1
+        try:
+            self._queue.put_nowait(message)
+            return True
+        except queue.Full:
+            self._done(1)
+            logger.warning("Mail queue full, dropping email to %s.", message["To"])
+            return False
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Waits until every queued message was delivered or given up on. Returns False on timeout.
+        """
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+    def _done(self, count: int) -> None:
+        with self._idle:
+            self._pending -= count
+            if self._pending == 0:
+                self._idle.notify_all()
+
+    def _run(self) -> None:
+        # Messages waiting for a retry, as (due time, sequence, attempt, message)
+        retries: list = []
+        while True:
+            timeout = max(0.0, retries[0][0] - time.monotonic()) if retries else None
+            batch = []
+            try:
+                batch.append((0, self._queue.get(timeout=timeout)))
+                while len(batch) < self.batch_size:
+                    batch.append((0, self._queue.get_nowait()))
+            except queue.Empty:
+                pass
+            while retries and retries[0][0] <= time.monotonic() and len(batch) < self.batch_size:
+                _, _, attempt, message = heapq.heappop(retries)
+                batch.append((attempt, message))
+            if not batch:
+                continue
+
+            try:
+                results = self.transport.send_many([message for _, message in batch])
+            except Exception as e:
+                logger.error("Mail transport failed: %s", e)
+                results = [False] * len(batch)
+
+            finished = 0
+            for (attempt, message), sent in zip(batch, results):
+                if sent:
+                    finished += 1
+                elif attempt < self.max_retries:
+                    due = time.monotonic() + self.backoff_seconds * 2 ** attempt
+                    heapq.heappush(retries, (due, next(self._sequence), attempt + 1, message))
+                else:
+                    logger.error("Giving up on email to %s after %d attempts.", message["To"], attempt + 1)
+                    finished += 1
+            if finished:
+                self._done(finished)
+
+
+@lru_cache(maxsize=None)
+def get_transport(host: str, port: int, username: Optional[str] = None, password: Optional[str] = None) -> MailTransport:
+    """
+    Returns the process-wide transport for an SMTP account; a memory or file sink instead
+    when MAIL_TRANSPORT says so.
+    """
+    if cfg.MAIL_TRANSPORT == "memory":
+        return MemoryTransport()
+    if cfg.MAIL_TRANSPORT == "file":
+        return FileTransport()
+    if cfg.MAIL_TRANSPORT != "smtp":
+        raise ValueError(f"Unknown mail transport '{cfg.MAIL_TRANSPORT}', expected 'smtp', 'memory' or 'file'")
+    return SmtpTransport(host, port, username, password)
+
+
+@lru_cache(maxsize=None)
+def get_mail_queue(transport: MailTransport) -> QueuedTransport:
+    """
+    Returns the process-wide background queue sending through the transport.
+    """
+    return QueuedTransport(transport)
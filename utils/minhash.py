@@ -0,0 +1,81 @@
+"""
+MinHash signatures and LSH band keys for near-duplicate detection of extracted text.
+
+Text is normalised (lower case, punctuation removed) and split into overlapping word
+shingles. The signature holds, for each of a fixed set of hash permutations, the
+minimum permuted shingle hash; the share of equal positions between two signatures
+estimates the Jaccard similarity of their shingle sets. Signatures are split into
+bands whose hashes serve as LSH buckets: documents sharing a bucket in any band are
+candidates, and only candidates are compared.
+
+The permutations are derived from MINHASH_SEED and must not change once signatures
+are stored.
+"""
+
+import hashlib
+import re
+from typing import List, Optional, Sequence
+import numpy as np
+import config.config as cfg
+
+# Mersenne prime of the universal hash family; signature values fit in a Postgres integer
+MERSENNE_PRIME = (1 << 31) - 1
+MINHASH_SEED = 20261018
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+
+def _permutations(count: int):
+    rng = np.random.default_rng(MINHASH_SEED)
+    a = rng.integers(1, MERSENNE_PRIME, size=count, dtype=np.uint64)
+    b = rng.integers(0, MERSENNE_PRIME, size=count, dtype=np.uint64)
+    return a[:, None], b[:, None]
+
+
+_A, _B = _permutations(cfg.MINHASH_PERMUTATIONS)
+
+
+def shingles(text: str, size: int = cfg.MINHASH_SHINGLE_SIZE) -> List[str]:
+    """
+    Returns the distinct word shingles of the normalised text; a text shorter than one
+    shingle is a single shingle.
+    """
+    words = _NON_WORD.sub(" ", text.lower()).split()
+    if len(words) <= size:
+        return [" ".join(words)] if words else []
+    return list({" ".join(words[index:index + size]) for index in range(len(words) - size + 1)})
+
+
+def signature(text: str) -> Optional[List[int]]:
+    """
+    Returns the MinHash signature of the text, or None if it has no words.
+    """
+    items = shingles(text)
+    if not items:
+        return None
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(item.encode(), digest_size=8).digest(), "little") % MERSENNE_PRIME for item in items),
+        dtype=np.uint64,
+        count=len(items),
+    )
+    # a * x + b stays below 2**62, so uint64 arithmetic does not overflow
+    return ((_A * hashes + _B) % MERSENNE_PRIME).min(axis=1).astype(np.int64).tolist()
+
+
+def band_keys(values: Sequence[int], bands: int = cfg.MINHASH_BANDS) -> List[int]:
+    """
+    Returns one signed 64-bit bucket key per band of the signature.
+    """
+    rows = len(values) // bands
+    array = np.asarray(values, dtype=np.int32)
+    return [
+        int.from_bytes(hashlib.blake2b(array[band * rows:(band + 1) * rows].tobytes(), digest_size=8).digest(), "little", signed=True)
+        for band in range(bands)
+    ]
+
+
+def similarity(first: Sequence[int], second: Sequence[int]) -> float:
+    """
+    Estimates the Jaccard similarity of the texts of two signatures.
+    """
+    return float(np.mean(np.asarray(first) == np.asarray(second)))
@@ -0,0 +1,289 @@
+"""
+Pluggable PDF text extraction engines.
+
+The default engine is PyMuPDF (fitz); PyPDF2 is kept as an alternative. Pages are
+yielded one at a time together with their extraction time and character count, so
+callers never need to hold more than one page in memory. Large PDFs given by path
+can be split into page ranges that are extracted in parallel by a process pool.
+
+Pages can also be rendered to JPEG images in memory (always with PyMuPDF) for the
+OCR fallback of scanned documents.
+"""
+
+import hashlib
+import io
+import logging
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import IO, Dict, Iterator, List, Optional, Type, Union
+import config.config as cfg
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# A PDF given as a file path, raw bytes or a binary file-like object
+PdfSource = Union[str, os.PathLike, bytes, bytearray, memoryview, IO[bytes]]
+
+
+@dataclass
+class PageResult:
+    """
+    The extracted text of one PDF page.
+
+    page_number is 1-based; seconds is the time spent extracting the page. If the page
+    could not be extracted, text is empty and error holds the reason.
+    """
+    page_number: int
+    text: str
+    seconds: float
+    error: Optional[str] = None
+
+    @property
+    def char_count(self) -> int:
+        return len(self.text)
+
+
+def _read_source(source: PdfSource) -> Union[str, bytes]:
+    """
+    Normalises a PDF source to a path or bytes. File-like objects are read from the start.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        return os.fspath(source)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source)
+    if source.seekable():
+        source.seek(0)
+    return source.read()
+
+
+class PdfEngine:
+    """
+    Base class of the extraction engines.
+    """
+    name = ""
+
+    def page_count(self, source: PdfSource) -> int:
+        raise NotImplementedError
+
+    def iter_pages(self, source: PdfSource, start: int = 0, stop: Optional[int] = None) -> Iterator[PageResult]:
+        """
+        Yields the pages in [start, stop) of a PDF, in order.
+
+        :param source: A file path, bytes or binary file-like object of the PDF.
+        :param start: The 0-based index of the first page.
+        :param stop: The 0-based index after the last page; None means the end of the document.
+        """
+        raise NotImplementedError
+
+
+class PyMuPDFEngine(PdfEngine):
+    name = "pymupdf"
+
+    @staticmethod
+    def _open(source: PdfSource):
+        import fitz
+
+        data = _read_source(source)
+        if isinstance(data, str):
+            return fitz.open(data)
+        return fitz.open(stream=data, filetype="pdf")
+
+    def page_count(self, source: PdfSource) -> int:
+        with self._open(source) as document:
+            return document.page_count
+
+    def iter_pages(self, source: PdfSource, start: int = 0, stop: Optional[int] = None) -> Iterator[PageResult]:
+        with self._open(source) as document:
+            stop = document.page_count if stop is None else min(stop, document.page_count)
+            for index in range(start, stop):
+                started = time.perf_counter()
+                try:
+                    text = document.load_page(index).get_text("text")
+                    error = None
+                except Exception as e:
+                    text, error = "", str(e)
+                    logger.warning("Error extracting page %s: %s", index + 1, e)
+                yield PageResult(index + 1, text, time.perf_counter() - started, error)
+
+
+class PyPDF2Engine(PdfEngine):
+    name = "pypdf2"
+
+    @staticmethod
+    def _open(source: PdfSource):
+        from PyPDF2 import PdfReader
+
+        data = _read_source(source)
+        return PdfReader(data if isinstance(data, str) else io.BytesIO(data))
+
+    def page_count(self, source: PdfSource) -> int:
+        return len(self._open(source).pages)
+
+    def iter_pages(self, source: PdfSource, start: int = 0, stop: Optional[int] = None) -> Iterator[PageResult]:
+        reader = self._open(source)
+        stop = len(reader.pages) if stop is None else min(stop, len(reader.pages))
+        for index in range(start, stop):
+            started = time.perf_counter()
+            try:
+                text = reader.pages[index].extract_text() or ""
+                error = None
+            except Exception as e:
+                text, error = "", str(e)
+                logger.warning("Error extracting page %s: %s", index + 1, e)
+            yield PageResult(index + 1, text, time.perf_counter() - started, error)
+
+
+ENGINES: Dict[str, Type[PdfEngine]] = {
+    PyMuPDFEngine.name: PyMuPDFEngine,
+    PyPDF2Engine.name: PyPDF2Engine,
+}
+
+
+def get_engine(name: Optional[str] = None) -> PdfEngine:
+    """
+    Returns the extraction engine with the given name, or the configured default.
+    """
+    name = name or cfg.PDF_ENGINE
+    if name not in ENGINES:
+        raise ValueError(f"Unknown PDF engine '{name}', expected one of {sorted(ENGINES)}.")
+    return ENGINES[name]()
+
+
+def iter_pdf_pages(source: PdfSource, engine: Optional[str] = None) -> Iterator[PageResult]:
+    """
+    Yields the pages of a PDF one at a time.
+
+    :param source: A file path, bytes or binary file-like object of the PDF.
+    :param engine: The engine name; defaults to cfg.PDF_ENGINE.
+    """
+    return get_engine(engine).iter_pages(source)
+
+
+def _extract_range(engine: str, path: str, start: int, stop: int) -> List[PageResult]:
+    """
+    Extracts a page range of a PDF file. Runs in a worker process.
+    """
+    return list(get_engine(engine).iter_pages(path, start, stop))
+
+
+def extract_pdf_pages(
+    source: PdfSource,
+    engine: Optional[str] = None,
+    workers: Optional[int] = None,
+    pages_per_task: int = cfg.PDF_PAGES_PER_TASK) -> List[PageResult]:
+    """
+    Extracts all pages of a PDF, fanning page ranges out to a process pool for large files.
+
+    Only PDFs given by path are split: each worker opens the file itself, so the document
+    is never copied between processes. Smaller files, bytes and file-like objects are
+    extracted in the calling process.
+
+    :param source: A file path, bytes or binary file-like object of the PDF.
+    :param engine: The engine name; defaults to cfg.PDF_ENGINE.
+    :param workers: The number of worker processes; defaults to cfg.PDF_WORKERS. Use 1 when
+        already running inside a worker process.
+    :param pages_per_task: The number of pages extracted per worker task.
+    :return: One PageResult per page, in page order.
+    """
+    engine = engine or cfg.PDF_ENGINE
+    workers = workers or cfg.PDF_WORKERS
+    started = time.perf_counter()
+
+    ranges = []
+    if isinstance(source, (str, os.PathLike)) and workers > 1:
+        source = os.fspath(source)
+        page_count = get_engine(engine).page_count(source)
+        if page_count >= cfg.PDF_PARALLEL_MIN_PAGES:
+            ranges = [(start, min(start + pages_per_task, page_count)) for start in range(0, page_count, pages_per_task)]
+
+    if ranges:
+        pages: List[PageResult] = []
+        with ProcessPoolExecutor(max_workers=min(workers, len(ranges))) as pool:
+            futures = [pool.submit(_extract_range, engine, source, start, stop) for start, stop in ranges]
+            for future in futures:
+                pages.extend(future.result())
+    else:
+        pages = list(iter_pdf_pages(source, engine))
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "Extracted %d pages (%d characters) with %s in %.2fs; slowest page %.3fs.",
+            len(pages), sum(page.char_count for page in pages), engine,
+            time.perf_counter() - started, max((page.seconds for page in pages), default=0.0),
+        )
+    return pages
+
+
+@dataclass
+class RenderedPage:
+    """
+    A PDF page rendered to a grayscale JPEG image. page_hash is the SHA-256 of the image.
+    """
+    page_number: int
+    image: bytes
+    dpi: int
+    page_hash: str
+
+
+def adaptive_dpi(width_points: float, height_points: float) -> int:
+    """
+    Picks the highest DPI (within OCR_MIN_DPI..OCR_MAX_DPI) at which a page of the given
+    size stays within OCR_MAX_PIXELS, so small receipts get sharp images and large
+    drawings do not produce huge ones.
+    """
+    area_square_inches = max(width_points / 72.0 * height_points / 72.0, 1e-6)
+    dpi = int(math.sqrt(cfg.OCR_MAX_PIXELS / area_square_inches))
+    return max(cfg.OCR_MIN_DPI, min(cfg.OCR_MAX_DPI, dpi))
+
+
+def render_pages(source: PdfSource, page_numbers: List[int]) -> List[RenderedPage]:
+    """
+    Renders the given pages of a PDF to JPEG images in memory.
+
+    :param source: A file path, bytes or binary file-like object of the PDF.
+    :param page_numbers: The 1-based numbers of the pages to render.
+    :return: One RenderedPage per page number, in the given order.
+    """
+    import fitz
+
+    rendered = []
+    with PyMuPDFEngine._open(source) as document:
+        for page_number in page_numbers:
+            page = document.load_page(page_number - 1)
+            dpi = adaptive_dpi(page.rect.width, page.rect.height)
+            image = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY).tobytes("jpeg", jpg_quality=cfg.OCR_JPEG_QUALITY)
+            rendered.append(RenderedPage(page_number, image, dpi, hashlib.sha256(image).hexdigest()))
+    return rendered
+
+
+def render_pdf_pages(source: PdfSource, page_numbers: List[int], workers: Optional[int] = None) -> List[RenderedPage]:
+    """
+    Renders the given pages of a PDF, splitting them across a process pool for PDFs given by path.
+
+    :param source: A file path, bytes or binary file-like object of the PDF.
+    :param page_numbers: The 1-based numbers of the pages to render.
+    :param workers: The number of worker processes; defaults to cfg.PDF_WORKERS. Use 1 when
+        already running inside a worker process.
+    :return: One RenderedPage per page number, in the given order.
+    """
+    workers = min(workers or cfg.PDF_WORKERS, len(page_numbers))
+    started = time.perf_counter()
+    if isinstance(source, (str, os.PathLike)) and workers > 1:
+        per_task = math.ceil(len(page_numbers) / workers)
+        groups = [page_numbers[start:start + per_task] for start in range(0, len(page_numbers), per_task)]
+        rendered: List[RenderedPage] = []
+        with ProcessPoolExecutor(max_workers=len(groups)) as pool:
+            for result in pool.map(render_pages, [os.fspath(source)] * len(groups), groups):
+                rendered.extend(result)
+    else:
+        rendered = render_pages(source, page_numbers)
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "Rendered %d pages (%d bytes) in %.2fs.",
+            len(rendered), sum(len(page.image) for page in rendered), time.perf_counter() - started,
+        )
+    return rendered
@@ -0,0 +1,63 @@
+"""
+Counts the SQL statements executed on the database engine, to keep the number of
+queries per page render or service call bounded and known.
+
+    with count_queries() as counter:
+        TagService.get_all_tags()
+    print(counter.count, counter.statements)
+
+    with assert_max_queries(2):
+        UserGroupService.fetch_all_user_groups()
+"""
+
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from database.models import get_engine
+
+
+class QueryCounter:
+    """
+    The statements executed by the current thread while the counter is active.
+    """
+
+    def __init__(self):
+        self.statements: List[str] = []
+        self._thread_id = threading.get_ident()
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        # Streamlit serves sessions from several threads; only count our own
+        if threading.get_ident() == self._thread_id:
+            self.statements.append(statement)
+
+
+@contextmanager
+def count_queries(engine: Optional[Engine] = None) -> Iterator[QueryCounter]:
+    """
+    Counts the statements executed on the engine (default: the application engine) by this thread.
+    """
+    engine = engine or get_engine()
+    counter = QueryCounter()
+    event.listen(engine, "before_cursor_execute", counter._before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", counter._before_cursor_execute)
+
+
+@contextmanager
+def assert_max_queries(limit: int, engine: Optional[Engine] = None) -> Iterator[QueryCounter]:
+    """
+    Raises AssertionError if the block executes more than limit statements.
+    """
+    with count_queries(engine) as counter:
+        yield counter
+    if counter.count > limit:
+        statements = "\n".join(f"  {index}. {statement}" for index, statement in enumerate(counter.statements, start=1))
+        raise AssertionError(f"Expected at most {limit} queries, got {counter.count}:\n{statements}")
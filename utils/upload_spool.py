@@ -0,0 +1,144 @@
+"""
+Spools uploaded files to disk in a single pass.
+
+The upload stream is copied in fixed-size chunks to a temporary file while its
+SHA-256 is computed, so the content is read once and never held in memory as a
+whole. Consumers then work from the file by path: the PDF extractor and the job
+workers open it (which also lets large documents be extracted by the process
+pool), and the storage backends upload it from disk in chunks.
+
+    with SpooledUpload.from_stream(uploaded_file, uploaded_file.name) as upload:
+        if not DocumentService.document_exists_by_hash(upload.content_hash):
+            pages = extract_pages_from_pdf(upload.path)
+"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+import weakref
+from typing import IO, Optional
+import config.config as cfg
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class UploadTooLarge(ValueError):
+    """
+    Raised when an upload exceeds the configured maximum size.
+    """
+
+
+class SpooledUpload:
+    """
+    An uploaded file spooled to a temporary file, with its size and SHA-256. Unless persisted,
+    the file is deleted by close(), on leaving the with block, or when the object is garbage collected.
+    """
+
+    def __init__(self, path: str, name: str, size: int, content_hash: str):
+        self.path = path
+        self.name = name
+        self.size = size
+        self.content_hash = content_hash
+        # Streamlit keeps the object in session state, which has no close hook
+        self._finalizer = weakref.finalize(self, _remove, path)
+
+    @classmethod
+    def from_stream(
+        cls,
+        stream: IO[bytes],
+        name: str,
+        chunk_size: int = cfg.UPLOAD_CHUNK_SIZE,
+        max_bytes: int = cfg.UPLOAD_MAX_BYTES,
+        directory: Optional[str] = cfg.UPLOAD_SPOOL_DIR) -> "SpooledUpload":
+        """
+        Copies a binary stream to a temporary file, hashing it on the way.
+
+        Args:
+            stream (IO[bytes]): The upload, read from the start if seekable.
+            name (str): The original file name.
+            chunk_size (int): The size of the reused copy buffer.
+            max_bytes (int): Uploads larger than this raise UploadTooLarge.
+            directory (Optional[str]): Where to create the temporary file.
+
+        Returns:
+            SpooledUpload: The spooled upload.
+        """
+        if stream.seekable():
+            stream.seek(0)
+        digest = hashlib.sha256()
+        buffer = bytearray(chunk_size)
+        view = memoryview(buffer)
+        size = 0
+        suffix = os.path.splitext(name)[1]
+        descriptor, path = tempfile.mkstemp(prefix="upload-", suffix=suffix, dir=directory)
+        try:
+            with os.fdopen(descriptor, "wb") as spool:
+                while True:
+                    if hasattr(stream, "readinto"):
+                        read = stream.readinto(view)
+                    else:
+                        chunk = stream.read(chunk_size)
+                        read = len(chunk)
+                        view[:read] = chunk
+                    if not read:
+                        break
+                    size += read
+                    if size > max_bytes:
+                        raise UploadTooLarge(f"Upload '{name}' exceeds the maximum size of {max_bytes} bytes.")
+                    digest.update(view[:read])
+                    spool.write(view[:read])
+        except BaseException:
+            _remove(path)
+            raise
+        finally:
+            view.release()
+        logger.debug("Spooled upload '%s' (%d bytes) to %s.", name, size, path)
+        return cls(path, name, size, digest.hexdigest())
+
+    def open(self) -> IO[bytes]:
+        """
+        Opens the spooled file for reading.
+        """
+        return open(self.path, "rb")
+
+    def persist(self, directory: str) -> str:
+        """
+        Moves the spooled file to <directory>/<content_hash><extension>, where it is no longer
+        deleted automatically, and returns the new path. Content-addressed, so persisting the
+        same content twice keeps a single file.
+        """
+        os.makedirs(directory, exist_ok=True)
+        target = os.path.join(directory, self.content_hash + os.path.splitext(self.name)[1].lower())
+        if os.path.exists(target):
+            self._finalizer()
+        else:
+            try:
+                os.replace(self.path, target)
+            except OSError:
+                # Another file system: copy, then drop the temporary file
+                shutil.copyfile(self.path, target)
+                self._finalizer()
+            self._finalizer.detach()
+        self.path = target
+        return target
+
+    def close(self) -> None:
+        """
+        Deletes the spooled file.
+        """
+        self._finalizer()
+
+    def __enter__(self) -> "SpooledUpload":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
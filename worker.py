@@ -0,0 +1,51 @@
+"""
+Document pipeline worker entry point.
+
+Starts worker processes that claim jobs from the Postgres job queue and run their
+stages (see services/job_service.py). Any number of workers may run on any number
+of nodes, as long as they reach the database and JOB_SPOOL_DIR.
+
+Usage:
+    python worker.py --processes 4
+    python worker.py --processes 1 --stages metadata
+"""
+
+import argparse
+import multiprocessing
+import signal
+import threading
+import config.config as cfg
+from services.job_service import STAGES, JobService
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run IntelliDocs document pipeline workers.")
+    parser.add_argument("--processes", type=int, default=cfg.JOB_WORKER_PROCESSES, help="Number of worker processes.")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES), help="Pipeline stages run by these workers.")
+    parser.add_argument("--poll-interval", type=float, default=cfg.JOB_POLL_INTERVAL, help="Seconds between polls of an empty queue.")
+    return parser.parse_args()
+
+
+def run(stages, poll_interval: float) -> None:
+    """
+    Runs one worker until SIGTERM or SIGINT, finishing the current job first.
+    """
+    stop_event = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: stop_event.set())
+    JobService.run_worker(stages, poll_interval, stop_event)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    processes = [
+        multiprocessing.Process(target=run, args=(args.stages, args.poll_interval), name=f"job-worker-{index}")
+        for index in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    # Pass stop requests on to the workers, which exit after their current job
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: [process.terminate() for process in processes if process.is_alive()])
+    for process in processes:
+        process.join()